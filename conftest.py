@@ -0,0 +1,9 @@
+import pytest
+from src.cache import RESULT_CACHE
+
+
+@pytest.fixture(autouse=True)
+def result_cache(tmp_path, monkeypatch):
+    # each test starts with an empty result cache, results of other runs are never reused
+    monkeypatch.setattr(RESULT_CACHE, 'directory', str(tmp_path / "cache"))
+    return RESULT_CACHE
@@ -0,0 +1,248 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import struct
+import threading
+import numpy as np
+from src import MAIN_DIR, DEFAULT
+from src.memory import MEMORY_TRACKER
+
+
+# file layout: magic, number of buffers, payload size, (offset, size) of each
+# buffer, pickled payload, then the out-of-band buffers aligned on 64 bytes
+_MAGIC = b'RESCACHE'
+_HEADER = struct.Struct('<8sQQ')
+_ENTRY = struct.Struct('<QQ')
+_ALIGNMENT = 64
+_SUFFIX = '.res'
+
+
+def cache_key(module_type, function, parameters, upstream):
+    """
+    hash of what a result depends on
+
+    Parameters
+    ----------
+    module_type: str
+    function: function
+        model function, its code is part of the key (see code_fingerprint)
+    parameters: dict
+        function arguments, files given by path are identified by their
+        modification time and size
+    upstream: list of str
+        keys of the parent results
+
+    Return
+    ------
+    key: str
+
+    """
+    description = [module_type,
+                   code_fingerprint(function),
+                   {name: _fingerprint(value) for name, value in parameters.items()},
+                   upstream]
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+def _fingerprint(value):
+    if isinstance(value, str) and value and os.path.isfile(value):
+        stat = os.stat(value)
+        return [value, stat.st_mtime_ns, stat.st_size]
+    if callable(value):
+        # functions given as arguments (sweeps) are identified by their code
+        return code_fingerprint(value)
+    return value
+
+
+def code_fingerprint(function):
+    """
+    identify the code of a function: its bytecode alone does not change when
+    only a constant, a called name or a nested function is edited
+
+    Parameters
+    ----------
+    function: function
+
+    Return
+    ------
+    fingerprint: list
+        [qualified name, hash of the code and of the default arguments]
+    """
+    function = inspect.unwrap(function)
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return [getattr(function, '__qualname__', None), None]
+    digest = hashlib.sha256()
+    _hash_code(code, digest)
+    digest.update(repr(function.__defaults__).encode())
+    digest.update(repr(sorted((function.__kwdefaults__ or {}).items())).encode())
+    return [function.__qualname__, digest.hexdigest()]
+
+
+def _hash_code(code, digest):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for constant in code.co_consts:
+        # nested functions, lambdas and comprehensions
+        if inspect.iscode(constant):
+            _hash_code(constant, digest)
+        else:
+            digest.update(repr(constant).encode())
+
+
+class ResultCache():
+    """
+    results persisted on disk between sessions, one file per key
+
+    Results are pickled with their numpy buffers out-of-band: loading a result
+    maps its file and rebuilds the arrays on the mapping without copy (they are
+    read-only). Files are written aside then renamed and readers tolerate
+    missing files, so that several application instances can share the cache.
+    Hits refresh the modification time of the file, and the least recently used
+    files are removed when the cache exceeds its size limit.
+
+    Parameters
+    ----------
+    directory: str, default=DEFAULT['cache_dir']
+        relative to the main directory
+    size_limit: float, default=DEFAULT['cache_size_limit']
+        in MB
+
+    """
+    def __init__(self, directory=DEFAULT['cache_dir'], size_limit=DEFAULT['cache_size_limit']):
+        self.directory = os.path.join(MAIN_DIR, directory)
+        self.size_limit = size_limit * 2**20
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    @staticmethod
+    def cacheable(result):
+        """
+        False for errors and for results mapped from files (they are already fast to load)
+        """
+        if result is None or isinstance(result, Exception):
+            return False
+        return not MEMORY_TRACKER.estimate(result).mapped
+
+    def load(self, key):
+        """
+        get a cached result
+
+        Parameters
+        ----------
+        key: str
+
+        Return
+        ------
+        result: any type data or None
+            None if the key is not cached
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                magic, count, size = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    return None
+                table = [_ENTRY.unpack(f.read(_ENTRY.size)) for _ in range(count)]
+                payload = f.read(size)
+                # buffers are slices of one file mapping, seen as file-backed by the memory tracker
+                mapping = np.memmap(f, dtype=np.uint8, mode='r') if table else None
+            result = pickle.loads(payload, buffers=[mapping[offset:offset + length] for offset, length in table])
+            os.utime(path)
+        except (OSError, ValueError, struct.error, pickle.UnpicklingError, EOFError):
+            # missing, being evicted or corrupted
+            return None
+        return result
+
+    def store(self, key, result):
+        """
+        persist a result, errors and unpicklable results are not stored
+
+        Parameters
+        ----------
+        key: str
+        result: any type data
+
+        Return
+        ------
+        stored: bool
+        """
+        if not self.cacheable(result):
+            return False
+        buffers = []
+        try:
+            payload = pickle.dumps(result, protocol=5, buffer_callback=buffers.append)
+            raws = [buffer.raw() for buffer in buffers]
+        except (pickle.PicklingError, TypeError, AttributeError, BufferError):
+            return False
+
+        table, offset = [], _HEADER.size + len(raws) * _ENTRY.size + len(payload)
+        for data in raws:
+            offset += -offset % _ALIGNMENT
+            table.append((offset, data.nbytes))
+            offset += data.nbytes
+        if offset > self.size_limit:
+            return False
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # unique temporary name: concurrent writers never write the same file
+        tmp = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, len(raws), len(payload)))
+                for entry in table:
+                    f.write(_ENTRY.pack(*entry))
+                f.write(payload)
+                for (position, _), data in zip(table, raws):
+                    f.write(b'\0' * (position - f.tell()))
+                    f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        remove the least recently used files while the cache exceeds its size limit
+        """
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.name.endswith(_SUFFIX)]
+            except OSError:
+                return
+            files = []
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.size_limit:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    # removed by another instance, or mapped (windows)
+                    pass
+                total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory) if os.path.isdir(self.directory) else []:
+            if entry.name.endswith(_SUFFIX):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,97 @@
+import bisect
+import pandas as pd
+
+
+class ChunkedFrame():
+    """
+    DataFrame made of chunks appended one after the other (streamed results);
+    rows are never copied into a single frame unless to_frame is called
+
+    Parameters
+    ----------
+    chunks: iterable of pd.DataFrame, optional
+
+    """
+    def __init__(self, chunks=()):
+        self.chunks = []
+        self._offsets = [0]
+        for chunk in chunks:
+            self.append(chunk)
+
+    def append(self, chunk):
+        """
+        add rows at the end of the frame
+
+        Parameters
+        ----------
+        chunk: pd.DataFrame
+            must have the same columns as the first chunk
+
+        """
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.DataFrame(chunk)
+        if self.chunks and not chunk.columns.equals(self.columns):
+            raise ValueError("chunk columns differ from the first chunk columns")
+        # chunk must be appended before the offset so that readers never see a missing chunk
+        self.chunks.append(chunk)
+        self._offsets.append(self._offsets[-1] + len(chunk))
+
+    @property
+    def columns(self):
+        return self.chunks[0].columns if self.chunks else pd.Index([])
+
+    @property
+    def dtypes(self):
+        return self.chunks[0].dtypes if self.chunks else pd.Series([], dtype=object)
+
+    @property
+    def shape(self):
+        return self._offsets[-1], len(self.columns)
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def locate(self, row):
+        """
+        find the chunk containing a row
+
+        Parameters
+        ----------
+        row: int
+            position of the row in the whole frame
+
+        Return
+        ------
+        chunk: pd.DataFrame
+        position: int
+            position of the row inside the chunk
+
+        """
+        i = bisect.bisect_right(self._offsets, row) - 1
+        return self.chunks[i], row - self._offsets[i]
+
+    def iat(self, row, column):
+        chunk, position = self.locate(row)
+        return chunk.iat[position, column]
+
+    def index_at(self, row):
+        chunk, position = self.locate(row)
+        return chunk.index[position]
+
+    def head(self, n=5):
+        """
+        get the first n rows as a DataFrame, only the needed chunks are copied
+        """
+        chunks, size = [], 0
+        for chunk in self.chunks:
+            if size >= n:
+                break
+            chunks.append(chunk.iloc[:n - size])
+            size += len(chunks[-1])
+        return pd.concat(chunks) if chunks else pd.DataFrame()
+
+    def to_frame(self):
+        """
+        concatenate all chunks into a single DataFrame (copy)
+        """
+        return pd.concat(self.chunks) if self.chunks else pd.DataFrame()
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from src.chunked import ChunkedFrame
+
+
+class ColumnarFrame():
+    """
+    table stored as one 1D buffer per column (numpy arrays, or views of Arrow
+    buffers and memory maps); column selection and row slicing return views
+    sharing the same buffers, and all the buffers are read-only so that a frame
+    can be handed to any number of nodes without defensive copies.
+    Conversion to pandas only happens when to_pandas is called
+
+    Parameters
+    ----------
+    columns: dict
+        {column name: 1D array-like}, all of the same length
+    index: 1D array-like, optional
+        row labels, positions by default
+
+    """
+    def __init__(self, columns, index=None):
+        self._columns = {}
+        for name, values in columns.items():
+            self._columns[name] = _readonly(values)
+        lengths = {len(v) for v in self._columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("columns must have the same length")
+        self._length = lengths.pop() if lengths else 0
+        self._buffers = list(self._columns.values())  # buffers by position
+        self._index = None if index is None else _readonly(index)
+        if self._index is not None and len(self._index) != self._length:
+            raise ValueError("index and columns must have the same length")
+
+    @classmethod
+    def from_pandas(cls, df):
+        """
+        wrap the column buffers of a DataFrame, numeric columns are not copied
+        """
+        columns = {name: df.iloc[:, i].to_numpy() for i, name in enumerate(df.columns)}
+        index = None if isinstance(df.index, pd.RangeIndex) else df.index.to_numpy()
+        return cls(columns, index)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """
+        wrap the column buffers of a pyarrow Table, primitive columns without
+        nulls made of one chunk are not copied; the index columns stored by
+        pandas become the row labels
+        """
+        metadata = table.schema.pandas_metadata or {}
+        # a RangeIndex is stored as a description, not as a column
+        index_names = [name for name in metadata.get('index_columns', []) if isinstance(name, str)]
+        columns, index = {}, None
+        for name, column in zip(table.column_names, table.columns):
+            if column.num_chunks == 1:
+                values = column.chunk(0).to_numpy(zero_copy_only=False)
+            else:
+                values = column.to_numpy()
+            if name in index_names[:1]:
+                index = values
+            elif name not in index_names:
+                columns[name] = values
+        return cls(columns, index)
+
+    @property
+    def columns(self):
+        return pd.Index(list(self._columns))
+
+    @property
+    def dtypes(self):
+        return pd.Series([v.dtype for v in self._columns.values()], index=self.columns, dtype=object)
+
+    @property
+    def shape(self):
+        return self._length, len(self._columns)
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """
+        get the read-only buffer of a column
+        """
+        return self._columns[name]
+
+    def __getitem__(self, key):
+        if isinstance(key, list):
+            return ColumnarFrame({name: self._columns[name] for name in key}, self._index)
+        return self._columns[key]
+
+    def slice(self, start=None, stop=None, step=None):
+        """
+        get a view of some rows, the buffers are shared
+        """
+        rows = slice(start, stop, step)
+        if self._index is not None:
+            index = self._index[rows]
+        elif rows.indices(self._length)[::2] != (0, 1):
+            # keep the original positions as row labels
+            index = np.arange(*rows.indices(self._length))
+        else:
+            index = None
+        return ColumnarFrame({name: values[rows] for name, values in self._columns.items()}, index)
+
+    def iat(self, row, column):
+        return self._buffers[column][row]
+
+    def index_at(self, row):
+        return row if self._index is None else self._index[row]
+
+    @property
+    def index(self):
+        return pd.RangeIndex(self._length) if self._index is None else pd.Index(self._index)
+
+    def head(self, n=5):
+        """
+        get the first n rows as a DataFrame
+        """
+        return self.slice(0, n).to_pandas()
+
+    def to_pandas(self, copy=True):
+        """
+        convert into a DataFrame
+
+        Parameters
+        ----------
+        copy: bool, default=True
+            if False, the columns of the DataFrame are read-only views of the
+            buffers (pandas may still consolidate columns of the same type)
+
+        """
+        return pd.DataFrame(dict(self._columns), index=self._index, copy=copy)
+
+
+def _readonly(values):
+    """
+    read-only view of a 1D array, the source buffer stays writable for its owner
+    """
+    values = np.asarray(values)
+    if values.ndim != 1:
+        raise ValueError("columns must be 1D")
+    if values.flags.writeable:
+        values = values.view()
+        values.flags.writeable = False
+    return values
+
+
+def readonly_view(result):
+    """
+    get a read-only view of a result sharing its buffers, to be handed to
+    another node instead of a defensive copy (pandas objects are copied when
+    pandas is not copy-on-write, their buffers could be written through a view)
+
+    Parameters
+    ----------
+    result: any type data
+
+    Return
+    ------
+    view: any type data
+        read-only array view, shallow (copy-on-write) pandas copy, ChunkedFrame
+        of such copies, or the result itself for the other types (ColumnarFrame
+        are already read-only)
+
+    """
+    if isinstance(result, np.ndarray):
+        view = result.view()
+        view.flags.writeable = False
+        return view
+    elif isinstance(result, (pd.DataFrame, pd.Series)):
+        # the history module is imported at call time, it depends on this module
+        from src.history import copy_on_write
+        return result.copy(deep=not copy_on_write())
+    elif isinstance(result, ChunkedFrame):
+        return ChunkedFrame(readonly_view(chunk) for chunk in result.chunks)
+    return result
+
+
+def column_values(result, position, rows=None):
+    """
+    get the values of a table column as a 1D array, without copy for the
+    numeric columns of DataFrames and ColumnarFrames
+
+    Parameters
+    ----------
+    result: pd.DataFrame, ChunkedFrame or ColumnarFrame
+    position: int
+    rows: sorted 1D array of int, optional
+        positions of the rows to read, all rows by default
+
+    Return
+    ------
+    values: 1D np.ndarray
+
+    """
+    if isinstance(result, ColumnarFrame):
+        values = result.column(result.columns[position])
+        return values if rows is None else values[rows]
+    if isinstance(result, ChunkedFrame):
+        parts, offsets = [], result._offsets
+        for chunk, start, stop in zip(result.chunks, offsets, offsets[1:]):
+            column = chunk.iloc[:, position]
+            if rows is not None:
+                selected = rows[np.searchsorted(rows, start):np.searchsorted(rows, stop)] - start
+                column = column.take(selected)
+            parts.append(column.to_numpy())
+        return np.concatenate(parts) if parts else np.empty(0)
+    column = result.iloc[:, position]
+    return (column if rows is None else column.take(rows)).to_numpy()
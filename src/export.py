@@ -0,0 +1,217 @@
+import bz2
+import gzip
+import lzma
+import os
+import numpy as np
+import pandas as pd
+from src import DEFAULT
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+
+
+# {format: (file extension, compressions, the first one is the default)}
+FORMATS = {
+    'csv': ('.csv', [None, 'gzip', 'bz2', 'xz']),
+    'parquet': ('.parquet', ['snappy', 'zstd', 'gzip', None]),
+    'npy': ('.npy', [None]),
+}
+
+_TEXT_OPENERS = {None: open, 'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+# suffix of the files compressed as a whole (csv), after the format extension
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz'}
+
+
+def export_extension(format, compression=None):
+    """
+    get the file extension of an export, e.g. '.csv.gz' for gzip csv files
+    """
+    extension = FORMATS[format][0]
+    if format == 'csv' and compression is not None:
+        extension += COMPRESSION_SUFFIXES[compression]
+    return extension
+
+
+def export_format(path):
+    """
+    get the export format of a file from its extension, None if unknown
+    """
+    root, extension = os.path.splitext(path.lower())
+    if extension in COMPRESSION_SUFFIXES.values():
+        extension = os.path.splitext(root)[1]
+    return next((name for name, (ext, _) in FORMATS.items() if ext == extension), None)
+
+
+def iter_frames(result, rows):
+    """
+    cut a result into DataFrames of at most a number of rows, slices of
+    DataFrames and arrays are views so that only one chunk at a time is copied
+
+    Parameters
+    ----------
+    result: pd.DataFrame, pd.Series, ChunkedFrame, ColumnarFrame, 1D or 2D
+        np.ndarray, or a scalar
+    rows: int
+
+    Yield
+    -----
+    frame: pd.DataFrame
+
+    """
+    if isinstance(result, ChunkedFrame):
+        for chunk in result.chunks:
+            yield from iter_frames(chunk, rows)
+    elif isinstance(result, ColumnarFrame):
+        for start in range(0, len(result), rows):
+            yield result.slice(start, start + rows).to_pandas()
+    elif isinstance(result, pd.DataFrame):
+        for start in range(0, len(result), rows):
+            yield result.iloc[start:start + rows]
+    elif isinstance(result, pd.Series):
+        for start in range(0, len(result), rows):
+            yield result.iloc[start:start + rows].to_frame()
+    elif isinstance(result, np.ndarray) and result.ndim in (1, 2):
+        for start in range(0, len(result), rows):
+            yield pd.DataFrame(result[start:start + rows])
+    elif isinstance(result, (int, float, str, bool)):
+        yield pd.DataFrame({'value': [result]})
+    else:
+        raise TypeError("{} results cannot be exported as a table".format(type(result).__name__))
+
+
+def export_result(result, path, format=None, compression=None, chunk_rows=DEFAULT['export_chunk_rows'],
+                  progress=None):
+    """
+    write a result in a file by chunks of rows, so that the memory used is
+    about one chunk whatever the size of the result. The file is written
+    aside and renamed once complete
+
+    Parameters
+    ----------
+    result: any type data
+        tables, series, arrays, or scalars (csv and parquet)
+    path: str
+    format: {'csv', 'parquet', 'npy'}, optional
+        deduced from the file extension by default
+    compression: str, optional
+        one of FORMATS[format] compressions
+    chunk_rows: int, default=DEFAULT['export_chunk_rows']
+    progress: function, optional
+        called with the fraction of rows written, the export is cancelled if
+        it raises an exception
+
+    Return
+    ------
+    path: str
+
+    """
+    format = format or export_format(path)
+    if format not in FORMATS:
+        raise ValueError("unknown export format: {}".format(format))
+    if compression not in FORMATS[format][1]:
+        raise ValueError("{0} compression is not available for {1} files".format(compression, format))
+
+    rows = max(_length(result), 1)
+    written = 0
+
+    def report(frame_rows):
+        nonlocal written
+        written += frame_rows
+        if progress is not None:
+            progress(min(written / rows, 1))
+
+    tmp = path + '.part'
+    try:
+        if format == 'csv':
+            _write_csv(result, tmp, compression, chunk_rows, report)
+        elif format == 'parquet':
+            _write_parquet(result, tmp, compression, chunk_rows, report)
+        else:
+            _write_npy(result, tmp, chunk_rows, report)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def _length(result):
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+def _keep_index(result):
+    # row labels are written unless they are positions
+    if isinstance(result, ChunkedFrame):
+        result = result.chunks[0] if result.chunks else None
+    index = getattr(result, 'index', None)
+    return index is not None and not isinstance(index, pd.RangeIndex)
+
+
+def _write_csv(result, path, compression, chunk_rows, report):
+    index = _keep_index(result)
+    with _TEXT_OPENERS[compression](path, 'wt', newline='', encoding='utf-8') as f:
+        for i, frame in enumerate(iter_frames(result, chunk_rows)):
+            frame.to_csv(f, header=i == 0, index=index)
+            report(len(frame))
+
+
+def _write_parquet(result, path, compression, chunk_rows, report):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    index = _keep_index(result)
+    writer = None
+    try:
+        for frame in iter_frames(result, chunk_rows):
+            # each chunk is a row group
+            table = pa.Table.from_pandas(frame, preserve_index=index)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=compression or 'none')
+            writer.write_table(table)
+            report(len(frame))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+
+
+def _write_npy(result, path, chunk_rows, report):
+    if isinstance(result, (pd.Series, np.ndarray)):
+        # arrays are written in C order, by bands of rows
+        array = result.to_numpy() if isinstance(result, pd.Series) else result
+        if array.dtype.hasobject:
+            raise TypeError("arrays of python objects cannot be exported as npy")
+        dtype, shape = array.dtype, array.shape
+        if array.ndim == 0:
+            frames = [array.reshape(1)]
+        else:
+            frames = (np.ascontiguousarray(array[i:i + chunk_rows]) for i in range(0, len(array), chunk_rows))
+    else:
+        # tables are written as structured arrays, one field per column
+        columns = getattr(result, 'columns', None)
+        if columns is None:
+            raise TypeError("{} results cannot be exported as npy".format(type(result).__name__))
+        dtypes = list(result.dtypes)
+        if any(not isinstance(d, np.dtype) or d.hasobject for d in dtypes):
+            raise TypeError("tables with non-numeric columns cannot be exported as npy, use csv or parquet")
+        dtype = np.dtype([(str(name), d) for name, d in zip(columns, dtypes)])
+        shape = (len(result),)
+
+        def records():
+            for frame in iter_frames(result, chunk_rows):
+                chunk = np.empty(len(frame), dtype)
+                for position, name in enumerate(dtype.names):
+                    chunk[name] = frame.iloc[:, position].to_numpy()
+                yield chunk
+        frames = records()
+
+    with open(path, 'wb') as f:
+        np.lib.format.write_array_header_2_0(f, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                 'fortran_order': False, 'shape': shape})
+        for chunk in frames:
+            chunk.tofile(f)
+            report(len(chunk))
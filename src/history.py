@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+from src import RESULT_STACK, DEFAULT
+from src.chunked import ChunkedFrame
+from src.memory import MEMORY_TRACKER
+
+
+class HistoryEntry():
+    """
+    reversible edit of the application state
+
+    Parameters
+    ----------
+    description: str
+        shown in the Edit menu ("delete node_1", ...)
+    undo, redo: function
+        restore the state before/after the edit
+    results: list, optional
+        results referenced by the entry (see snapshot), they are accounted in
+        the memory budget
+    key: hashable, optional
+        consecutive entries with the same key are merged into one
+
+    """
+    def __init__(self, description, undo, redo, results=None, key=None):
+        self.description = description
+        self.undo = undo
+        self.redo = redo
+        self.results = results or []
+        self.key = key
+
+
+class History():
+    """
+    undo/redo stacks of HistoryEntry
+
+    Entries keep snapshots of the results instead of copies (see snapshot): the
+    buffers are shared by the result stack and all the entries using them, the
+    entries see them through read-only views so that a past state is never
+    modified through the history. When the memory held only by the history
+    exceeds the budget, the oldest entries are evicted.
+
+    Parameters
+    ----------
+    budget: float, default=DEFAULT['history_memory_budget']
+        memory budget of the results held only by the history, in MB
+
+    """
+    def __init__(self, budget=DEFAULT['history_memory_budget']):
+        self.budget = budget * 2**20
+        self.undo_stack = []
+        self.redo_stack = []
+        self.replaying = False
+
+    def push(self, entry):
+        """
+        record an edit which has just been done, edits done while undoing or
+        redoing are part of the replayed entry and are not recorded
+        """
+        if self.replaying:
+            return
+        if self.undo_stack and entry.key is not None and self.undo_stack[-1].key == entry.key:
+            # merge with the previous entry: undo its state, redo the new one
+            previous = self.undo_stack.pop()
+            entry = HistoryEntry(entry.description, previous.undo, entry.redo,
+                                 previous.results + entry.results, entry.key)
+        self.undo_stack.append(entry)
+        self.redo_stack = []
+        self.evict()
+
+    def canUndo(self):
+        return bool(self.undo_stack)
+
+    def canRedo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if self.undo_stack:
+            entry = self.undo_stack.pop()
+            self._replay(entry.undo)
+            self.redo_stack.append(entry)
+
+    def redo(self):
+        if self.redo_stack:
+            entry = self.redo_stack.pop()
+            self._replay(entry.redo)
+            self.undo_stack.append(entry)
+
+    def _replay(self, function):
+        self.replaying = True
+        try:
+            function()
+        finally:
+            self.replaying = False
+
+    def retained(self):
+        """
+        memory held only by the history: results and buffers which are not
+        used by the result stack, each counted once
+
+        Return
+        ------
+        nbytes: int
+        """
+        live = {id(r) for r in RESULT_STACK.values()}
+        live_buffers = set()
+        for result in RESULT_STACK.values():
+            live_buffers.update(MEMORY_TRACKER.estimate(result).buffers)
+
+        seen, nbytes = set(), 0
+        for entry in self.undo_stack + self.redo_stack:
+            for result in entry.results:
+                if id(result) in live or id(result) in seen:
+                    continue
+                seen.add(id(result))
+                estimate = MEMORY_TRACKER.estimate(result)
+                nbytes += estimate.own
+                for key, size in estimate.buffers.items():
+                    if key not in live_buffers:
+                        live_buffers.add(key)
+                        nbytes += size
+        return nbytes
+
+    def evict(self):
+        """
+        drop the oldest entries while the history is over its memory budget,
+        the last entry is always kept
+        """
+        while len(self.undo_stack) + len(self.redo_stack) > 1 and self.retained() > self.budget:
+            if self.undo_stack[:-1]:
+                self.undo_stack.pop(0)
+            elif self.redo_stack:
+                self.redo_stack.pop(-1)
+            else:
+                break
+
+    def clear(self):
+        self.undo_stack = []
+        self.redo_stack = []
+
+
+def copy_on_write():
+    """
+    True if pandas objects are copy-on-write: always from pandas 3, when the
+    mode.copy_on_write option is set from pandas 1.5 to 2.x
+    """
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return getattr(pd.options.mode, 'copy_on_write', False) is True
+
+
+def snapshot(result):
+    """
+    get the state of a result to record in the history: read-only views of
+    numpy arrays (the arrays of the caller stay writable), pandas objects as
+    they are when pandas is copy-on-write and deep copies otherwise
+    """
+    if isinstance(result, np.ndarray):
+        view = result.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(result, list):
+        return [snapshot(r) for r in result]
+    if type(result) is tuple:
+        return tuple(snapshot(r) for r in result)
+    if isinstance(result, dict):
+        return {key: snapshot(r) for key, r in result.items()}
+    if copy_on_write():
+        return result
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return result.copy(deep=True)
+    if isinstance(result, ChunkedFrame):
+        return ChunkedFrame(chunk.copy(deep=True) for chunk in result.chunks)
+    return result
@@ -0,0 +1,223 @@
+import collections
+import sys
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+
+
+class MemoryEstimate():
+    """
+    estimated memory footprint of a result
+
+    Attributes
+    ----------
+    own: int
+        bytes owned by the result only (python objects, headers, extension arrays, ...)
+    buffers: dict
+        numpy buffers used by the result {buffer key: bytes}, they can be shared
+        with other results (views) and must be counted once
+    mapped: dict
+        file-backed buffers (memory maps) {buffer key: bytes}, not counted as resident memory
+
+    """
+    def __init__(self):
+        self.own = 0
+        self.buffers = {}
+        self.mapped = {}
+
+    @property
+    def nbytes(self):
+        return self.own + sum(self.buffers.values())
+
+
+def estimate_memory(obj, sample_size=1000):
+    """
+    estimate the memory used by an object without walking every python object:
+    numpy buffers are read from their header, object arrays and large containers
+    are sampled
+
+    Parameters
+    ----------
+    obj: pd.DataFrame, pd.Series, np.ndarray, list, dict, ...
+    sample_size: int, default=1000
+        maximum number of python objects measured per column or container
+
+    Return
+    ------
+    estimate: MemoryEstimate
+
+    """
+    estimate = MemoryEstimate()
+    _visit(obj, estimate, sample_size, set())
+    return estimate
+
+
+def _visit(obj, estimate, sample_size, seen):
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        _add_array(obj, estimate, sample_size)
+    elif isinstance(obj, pd.DataFrame):
+        _add_pandas(obj.index, estimate, sample_size)
+        for i in range(obj.shape[1]):
+            _add_pandas(obj.iloc[:, i], estimate, sample_size)
+    elif isinstance(obj, ChunkedFrame):
+        for chunk in list(obj.chunks):
+            _visit(chunk, estimate, sample_size, seen)
+    elif isinstance(obj, ColumnarFrame):
+        # views of other results share their root buffers
+        for name in obj.columns:
+            _add_array(obj.column(name), estimate, sample_size)
+        if obj._index is not None:
+            _add_array(obj._index, estimate, sample_size)
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        if isinstance(obj, pd.Series):
+            _add_pandas(obj.index, estimate, sample_size)
+        _add_pandas(obj, estimate, sample_size)
+    elif isinstance(obj, (list, tuple, set, frozenset, dict)):
+        items = list(obj.items()) if isinstance(obj, dict) else list(obj)
+        estimate.own += sys.getsizeof(obj)
+        if len(items) <= sample_size:
+            for item in items:
+                _visit(item, estimate, sample_size, seen)
+        else:
+            # measure a sample of items and extrapolate their own size
+            own = estimate.own
+            for i in np.random.default_rng(0).integers(0, len(items), sample_size):
+                _visit(items[i], estimate, sample_size, seen)
+            estimate.own = own + int((estimate.own - own) * len(items) / sample_size)
+    else:
+        estimate.own += sys.getsizeof(obj)
+
+
+def _add_pandas(values, estimate, sample_size):
+    if isinstance(values, (pd.RangeIndex, pd.MultiIndex)):
+        estimate.own += int(values.memory_usage())
+    elif isinstance(values.dtype, np.dtype):
+        _add_array(values.to_numpy(), estimate, sample_size)
+    elif getattr(values.dtype, 'storage', None) == 'python':
+        # strings stored as python objects
+        _add_array(np.asarray(values.array, dtype=object), estimate, sample_size)
+    else:
+        # other extension arrays (categorical, arrow strings, ...) know their size
+        estimate.own += int(values.array.nbytes)
+
+
+def _add_array(array, estimate, sample_size):
+    if array.dtype == object:
+        estimate.own += array.nbytes + _sample_objects(array, sample_size)
+        return
+
+    # the whole root buffer is kept alive by any of its views
+    root = array
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    key = (root.__array_interface__['data'][0], root.nbytes)
+    if isinstance(root, np.memmap):
+        estimate.mapped[key] = root.nbytes
+    else:
+        estimate.buffers[key] = root.nbytes
+
+
+def _sample_objects(array, sample_size):
+    n = array.size
+    if n == 0:
+        return 0
+    if n > sample_size:
+        sample = array.flat[np.random.default_rng(0).integers(0, n, sample_size)]
+    else:
+        sample = array.flat
+    sizes = [sys.getsizeof(v) for v in sample]
+    return int(sum(sizes) * n / len(sizes))
+
+
+class MemoryTracker():
+    """
+    application-wide memory accounting of results; estimates are cached with
+    each result so that they are computed only once (usually in the worker)
+
+    Parameters
+    ----------
+    sample_size: int, default=1000
+        see estimate_memory
+
+    """
+    def __init__(self, sample_size=1000):
+        self.sample_size = sample_size
+        self._cache = {}  # id(result) -> (reference to result, estimate, version)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _reference(result):
+        try:
+            return weakref.ref(result)
+        except TypeError:
+            return lambda: result
+
+    def estimate(self, result):
+        """
+        get the cached estimate of a result, compute it if needed (thread-safe)
+
+        Parameters
+        ----------
+        result: any type data
+
+        Return
+        ------
+        estimate: MemoryEstimate
+
+        """
+        # growing results (streamed) must be estimated again when they change
+        version = len(result.chunks) if isinstance(result, ChunkedFrame) else None
+        with self._lock:
+            cached = self._cache.get(id(result))
+        if cached is not None and cached[0]() is result and cached[2] == version:
+            return cached[1]
+        estimate = estimate_memory(result, self.sample_size)
+        with self._lock:
+            self._cache[id(result)] = (self._reference(result), estimate, version)
+        return estimate
+
+    def usage(self, results):
+        """
+        compute the memory usage of each result, buffers shared by several
+        results are counted once in the total
+
+        Parameters
+        ----------
+        results: dict
+            {node name: result}, typically RESULT_STACK
+
+        Return
+        ------
+        usage: dict
+            {node name: (bytes, shared bytes)}
+        total: int
+            total bytes
+
+        """
+        # drop estimates of results that are not stored anymore
+        alive = {id(r) for r in results.values()}
+        with self._lock:
+            for key in [k for k in self._cache if k not in alive]:
+                del self._cache[key]
+
+        estimates = {name: self.estimate(result) for name, result in results.items()}
+        owners = collections.Counter(key for e in estimates.values() for key in e.buffers)
+
+        usage, buffers, total = {}, {}, 0
+        for name, e in estimates.items():
+            shared = sum(n for key, n in e.buffers.items() if owners[key] > 1)
+            usage[name] = (e.nbytes, shared)
+            buffers.update(e.buffers)
+            total += e.own
+        return usage, total + sum(buffers.values())
+
+
+# application-wide tracker of RESULT_STACK memory
+MEMORY_TRACKER = MemoryTracker()
@@ -0,0 +1,421 @@
+import collections
+import threading
+import numpy as np
+import pandas as pd
+from src import DEFAULT
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame, column_values, readonly_view
+
+
+HOWS = ('inner', 'left', 'outer')
+ALGORITHMS = ('auto', 'hash', 'sort')
+
+
+def as_table(result):
+    """
+    get a parent result as a table, without copying its columns
+
+    Parameters
+    ----------
+    result: pd.DataFrame, pd.Series, ChunkedFrame, ColumnarFrame, 1D or 2D np.ndarray
+
+    Return
+    ------
+    table: pd.DataFrame, ChunkedFrame or ColumnarFrame
+
+    """
+    if result is None or isinstance(result, Exception):
+        raise ValueError("a parent has no result")
+    if isinstance(result, (pd.DataFrame, ChunkedFrame, ColumnarFrame)):
+        return result
+    if isinstance(result, pd.Series):
+        return result.to_frame(result.name if result.name is not None else 'value')
+    if isinstance(result, np.ndarray) and result.ndim in (1, 2):
+        return pd.DataFrame(result, copy=False)
+    raise TypeError("{} results cannot be combined as tables".format(type(result).__name__))
+
+
+def _labels(table):
+    # row labels of a table, None for positions
+    if isinstance(table, ColumnarFrame):
+        return table._index
+    if isinstance(table, pd.DataFrame) and not isinstance(table.index, pd.RangeIndex):
+        return table.index.to_numpy()
+    return None
+
+
+def concat_results(inputs):
+    """
+    put the rows of several results one after the other. Tables with the same
+    columns are chained without copy (ChunkedFrame of read-only views of the
+    parent frames, see readonly_view), arrays are concatenated, tables with
+    different columns give the union of their columns
+
+    Parameters
+    ----------
+    inputs: list of any type data
+        parent results
+
+    Return
+    ------
+    result: ChunkedFrame, pd.DataFrame or np.ndarray
+
+    """
+    if not inputs:
+        raise ValueError("nothing to concatenate")
+    if all(isinstance(r, np.ndarray) for r in inputs):
+        return np.concatenate(inputs)
+    tables = [as_table(r) for r in inputs]
+    if all(t.columns.equals(tables[0].columns) for t in tables):
+        chunks = []
+        for table in tables:
+            if isinstance(table, ChunkedFrame):
+                chunks += [readonly_view(chunk) for chunk in table.chunks]
+            elif isinstance(table, ColumnarFrame):
+                chunks.append(table.to_pandas())
+            else:
+                chunks.append(readonly_view(table))
+        return ChunkedFrame(chunks)
+    frames = [t.to_frame() if isinstance(t, ChunkedFrame) else t.to_pandas() if isinstance(t, ColumnarFrame) else t
+              for t in tables]
+    return pd.concat(frames)
+
+
+def stack_columns(inputs):
+    """
+    put the columns of several results of the same length side by side, the
+    columns are shared without copy. Column names already taken get the
+    position of their parent as suffix
+
+    Parameters
+    ----------
+    inputs: list of any type data
+        parent results
+
+    Return
+    ------
+    result: ColumnarFrame
+        with the row labels of the first parent
+
+    """
+    tables = [as_table(r) for r in inputs]
+    if len({len(t) for t in tables}) > 1:
+        raise ValueError("results of different lengths cannot be stacked: {}".format([len(t) for t in tables]))
+    columns = {}
+    for i, table in enumerate(tables):
+        for position, name in enumerate(table.columns):
+            columns[_unique_name(str(name), i, columns)] = column_values(table, position)
+    return ColumnarFrame(columns, _labels(tables[0]) if tables else None)
+
+
+def _unique_name(name, i, taken):
+    if name not in taken:
+        return name
+    suffixed = "{0}_{1}".format(name, i)
+    while suffixed in taken:
+        suffixed += "_"
+    return suffixed
+
+
+def key_codes(left, right):
+    """
+    encode the keys of two tables as int64 codes with one hash table per key
+    column; equal keys get the same code, missing keys (NaN, None, NaT) get -1
+
+    Parameters
+    ----------
+    left, right: list of 1D np.ndarray
+        key columns of each table
+
+    Return
+    ------
+    left_codes, right_codes: 1D np.ndarray of int64
+    size: int
+        the codes are lower than size
+
+    """
+    codes, size = np.zeros(len(left[0]) + len(right[0]), dtype=np.int64), 1
+    for left_key, right_key in zip(left, right):
+        column, uniques = pd.factorize(np.concatenate([left_key, right_key]))
+        missing = (codes < 0) | (column < 0)
+        codes = codes * len(uniques) + column
+        size *= max(len(uniques), 1)
+        if size >= 2**31:
+            # renumber the combinations actually present
+            codes, uniques = pd.factorize(codes)
+            size = max(len(uniques), 1)
+        codes[missing] = -1
+    return codes[:len(left[0])], codes[len(left[0]):], size
+
+
+def _sorted(values):
+    return len(values) < 2 or bool(np.all(values[1:] >= values[:-1]))
+
+
+def join_indexes(left, right, how='inner', algorithm='auto'):
+    """
+    match the rows of two tables on key columns
+
+    The hash join builds a hash table of the right keys (see key_codes for
+    several key columns) probed by the left keys, then groups the right rows
+    by key; the sort-merge join sorts both keys (unless they are already
+    sorted) and searches the left keys in the right ones. 'auto' uses
+    sort-merge for single numeric or datetime keys of the same type, and hash
+    otherwise (strings, objects, several key columns)
+
+    Parameters
+    ----------
+    left, right: list of 1D np.ndarray
+        key columns of each table
+    how: {'inner', 'left', 'outer'}, default='inner'
+    algorithm: {'auto', 'hash', 'sort'}, default='auto'
+
+    Return
+    ------
+    left_rows, right_rows: 1D np.ndarray of int64
+        row positions of each match, in the order of the left rows (then the
+        unmatched right rows for outer joins); -1 for the rows without match
+
+    """
+    if how not in HOWS:
+        raise ValueError("unknown join: {}".format(how))
+    if algorithm not in ALGORITHMS:
+        raise ValueError("unknown join algorithm: {}".format(algorithm))
+    single = len(left) == 1 and left[0].dtype == right[0].dtype and left[0].dtype.kind in 'iumMf'
+    if algorithm == 'auto':
+        algorithm = 'sort' if single else 'hash'
+
+    if algorithm == 'sort':
+        if single:
+            left_key, right_key = left[0], right[0]
+            kind = left_key.dtype.kind
+            missing = np.isnan(left_key) if kind == 'f' else np.isnat(left_key) if kind in 'mM' else None
+        else:
+            left_key, right_key, _ = key_codes(left, right)
+            missing = left_key < 0
+        order = None if _sorted(right_key) else np.argsort(right_key, kind='stable')
+        ordered = right_key if order is None else right_key[order]
+        if _sorted(left_key):
+            starts = np.searchsorted(ordered, left_key, 'left')
+            matches = np.searchsorted(ordered, left_key, 'right') - starts
+        else:
+            # sorted left keys are searched in sequence (cache friendly)
+            left_order = np.argsort(left_key)
+            starts, matches = np.empty(len(left_key), dtype=np.int64), np.empty(len(left_key), dtype=np.int64)
+            starts[left_order] = np.searchsorted(ordered, left_key[left_order], 'left')
+            matches[left_order] = np.searchsorted(ordered, left_key[left_order], 'right')
+            matches -= starts
+        if missing is not None:
+            matches[missing] = 0
+        if how == 'outer':
+            matched = np.isin(right_key, left_key[matches > 0])
+    else:
+        if len(left) == 1:
+            # hash table built on the right keys, probed by the left ones
+            right_key, uniques = pd.factorize(right[0])
+            left_key = pd.Index(uniques).get_indexer(left[0]).astype(np.int64)
+            size = max(len(uniques), 1)
+        else:
+            left_key, right_key, size = key_codes(left, right)
+        valid = right_key >= 0
+        if np.count_nonzero(valid) == size:
+            # unique right keys, the rows are placed by code without sorting
+            counts = np.ones(size, dtype=np.int64)
+            order = np.empty(size, dtype=np.int64)
+            order[right_key[valid]] = np.flatnonzero(valid)
+        else:
+            counts = np.bincount(right_key[valid], minlength=size)
+            order = np.flatnonzero(valid)[np.argsort(right_key[valid], kind='stable')]
+        first = np.cumsum(counts) - counts
+        known = left_key >= 0
+        matches = np.where(known, counts[np.where(known, left_key, 0)], 0)
+        starts = np.where(known, first[np.where(known, left_key, 0)], 0)
+        if how == 'outer':
+            matched = valid & (np.bincount(left_key[known], minlength=size)[np.where(valid, right_key, 0)] > 0)
+
+    # each left row is repeated once per match (at least once for left and outer joins)
+    repeats = matches if how == 'inner' else np.maximum(matches, 1)
+    total = int(repeats.sum())
+    left_rows = np.repeat(np.arange(len(left_key), dtype=np.int64), repeats)
+    positions = np.repeat(starts, repeats) + (np.arange(total) - np.repeat(np.cumsum(repeats) - repeats, repeats))
+    found = np.repeat(matches > 0, repeats)
+    right_rows = np.full(total, -1, dtype=np.int64)
+    right_rows[found] = positions[found] if order is None else order[positions[found]]
+    if how == 'outer':
+        unmatched = np.flatnonzero(~matched)
+        left_rows = np.concatenate([left_rows, np.full(len(unmatched), -1, dtype=np.int64)])
+        right_rows = np.concatenate([right_rows, unmatched])
+    return left_rows, right_rows
+
+
+class JoinIndexCache():
+    """
+    last join indexes computed, so that a join run again on the same keys
+    (e.g. with another column selection) does not hash nor sort them again.
+    Entries are identified by the buffers of the key columns, and keep them
+    alive so that their memory cannot be reused by other arrays meanwhile;
+    only the keys read in the parent buffers are cached (see _parent_buffers),
+    keys built for each run (concatenated chunks, converted columns) would
+    never be found again
+
+    Parameters
+    ----------
+    size: int, default=DEFAULT['join_index_cache']
+        number of joins kept
+
+    """
+    def __init__(self, size=DEFAULT['join_index_cache']):
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(keys, how, algorithm):
+        buffers = tuple((k.__array_interface__['data'][0], k.shape, k.strides, k.dtype.str)
+                        for columns in keys for k in columns)
+        return buffers, how, algorithm
+
+    def get(self, keys, how, algorithm):
+        with self._lock:
+            entry = self._entries.get(self.key(keys, how, algorithm))
+            if entry is None:
+                return None
+            self._entries.move_to_end(self.key(keys, how, algorithm))
+            return entry[0]
+
+    def put(self, keys, how, algorithm, value):
+        with self._lock:
+            self._entries[self.key(keys, how, algorithm)] = (value, keys)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+JOIN_INDEXES = JoinIndexCache()
+
+
+def _parent_buffers(table, keys):
+    # True if the key columns are the buffers of the table, not arrays built for this run
+    if isinstance(table, ColumnarFrame):
+        return True
+    return isinstance(table, pd.DataFrame) and not any(k.flags.owndata for k in keys)
+
+
+def _fill(values, rows):
+    """
+    take rows of a column, -1 rows are missing values (integers become floats
+    and booleans objects when rows are missing)
+    """
+    missing = rows < 0
+    if not missing.any():
+        return values[rows]
+    kind = values.dtype.kind
+    dtype = np.float64 if kind in 'iu' else object if kind == 'b' else values.dtype
+    out = values[np.where(missing, 0, rows)] if len(values) else np.empty(len(rows), dtype)
+    out = out.astype(dtype, copy=False)
+    out[missing] = np.datetime64('NaT') if kind == 'M' else np.timedelta64('NaT') if kind == 'm' else np.nan
+    return out
+
+
+def _coalesce(left, left_rows, right, right_rows):
+    # keys of the joined rows, taken from the right table for the unmatched right rows
+    missing = left_rows < 0
+    if not missing.any():
+        return left[left_rows]
+    dtype = np.result_type(left.dtype, right.dtype) if left.dtype.kind in 'biufmM' and \
+        right.dtype.kind in 'biufmM' else object
+    out = np.empty(len(left_rows), dtype)
+    out[~missing] = left[left_rows[~missing]]
+    out[missing] = right[right_rows[missing]]
+    return out
+
+
+def join_results(inputs, on, how='inner', columns=None, algorithm='auto', memory_budget=DEFAULT['join_memory_budget'],
+                 progress=None):
+    """
+    join several results on key columns, the first with the second, then the
+    result with the third, ...
+
+    Only the key columns are read to match the rows (see join_indexes), the
+    other columns are gathered by chunks of rows directly from the parent
+    buffers, so that the memory used is about the output size of memory_budget
+    whatever the size of the join. The matched rows are kept by JOIN_INDEXES
+
+    Parameters
+    ----------
+    inputs: list of any type data
+        parent results, at least two
+    on: list of str
+        key columns, they must be in each parent
+    how: {'inner', 'left', 'outer'}, default='inner'
+    columns: list of str, optional
+        other columns to keep, all by default; names taken by a previous
+        parent get the position of their parent as suffix
+    algorithm: {'auto', 'hash', 'sort'}, default='auto'
+    memory_budget: int, default=DEFAULT['join_memory_budget']
+        size of the chunks, in MB
+    progress: function, optional
+        called with the fraction of the rows written
+
+    Yield
+    -----
+    chunk: pd.DataFrame
+        key columns first, then the other columns of each parent
+
+    """
+    if len(inputs) < 2:
+        raise ValueError("a join needs at least two parents")
+    if not on:
+        raise ValueError("no key column given")
+    tables = [as_table(r) for r in inputs]
+    names = [[str(c) for c in t.columns] for t in tables]
+    for i, table_names in enumerate(names):
+        absent = [k for k in on if k not in table_names]
+        if absent:
+            raise KeyError("parent {0} has no column {1}".format(i, absent))
+    keys = [[column_values(t, n.index(k)) for k in on] for t, n in zip(tables, names)]
+
+    cached = all(_parent_buffers(t, k) for t, k in zip(tables, keys))
+    joined = JOIN_INDEXES.get(keys, how, algorithm) if cached else None
+    if joined is None:
+        rows, key_values = [np.arange(len(tables[0]), dtype=np.int64)], keys[0]
+        for i in range(1, len(tables)):
+            left_rows, right_rows = join_indexes(key_values, keys[i], how, algorithm)
+            rows = [np.where(left_rows < 0, -1, r[np.maximum(left_rows, 0)]) if len(r) else
+                    np.full(len(left_rows), -1, dtype=np.int64) for r in rows] + [right_rows]
+            key_values = [_coalesce(k, left_rows, right, right_rows) for k, right in zip(key_values, keys[i])]
+        joined = rows, key_values
+        if cached:
+            JOIN_INDEXES.put(keys, how, algorithm, joined)
+    rows, key_values = joined
+
+    # output columns: [(name, parent, position)]
+    outputs, taken = [], set(on)
+    for i, table_names in enumerate(names):
+        for position, name in enumerate(table_names):
+            if name in on:
+                continue
+            output_name = _unique_name(name, i, taken)
+            taken.add(output_name)
+            outputs.append((output_name, i, position))
+    if columns is not None:
+        unknown = set(columns).difference(name for name, _, _ in outputs)
+        if unknown:
+            raise KeyError("unknown columns: {}".format(sorted(unknown)))
+        outputs = [o for o in outputs if o[0] in columns]
+    values = [(name, column_values(tables[i], position), rows[i]) for name, i, position in outputs]
+
+    row_size = sum(k.dtype.itemsize for k in key_values) + sum(v.dtype.itemsize for _, v, _ in values)
+    chunk_rows = max(1, int(memory_budget * 2**20 // max(row_size, 1)))
+    total = len(rows[0])
+    for start in range(0, max(total, 1), chunk_rows):
+        stop = min(start + chunk_rows, total)
+        chunk = {name: k[start:stop] for name, k in zip(on, key_values)}
+        for name, column, column_rows in values:
+            chunk[name] = _fill(column, column_rows[start:stop])
+        yield pd.DataFrame(chunk)
+        if progress is not None:
+            progress(stop / total if total else 1)
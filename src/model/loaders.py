@@ -0,0 +1,304 @@
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+from src.columnar import ColumnarFrame
+
+
+SIDECAR_EXTENSION = '.cache'
+
+
+class Sidecar():
+    """
+    binary copy of a text file, one raw file per column, written while the
+    text file is read for the first time so that later loads are memory-mapped
+
+    Parameters
+    ----------
+    path: str
+        path of the source file, the sidecar is the directory path + SIDECAR_EXTENSION
+
+    """
+    def __init__(self, path):
+        self.source = path
+        self.path = path + SIDECAR_EXTENSION
+        self._files = None
+        self._meta = None
+
+    def _signature(self):
+        stat = os.stat(self.source)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def isValid(self):
+        """
+        True if the sidecar is complete and the source file did not change
+        """
+        try:
+            with open(os.path.join(self.path, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta.get('source') == self._signature()
+
+    def read(self, columns=None):
+        """
+        load the sidecar, numeric columns are memory-mapped and only the
+        requested columns are opened
+
+        Parameters
+        ----------
+        columns: list of str, optional
+            columns to load, all columns if None
+
+        Return
+        ------
+        df: pd.DataFrame
+
+        """
+        with open(os.path.join(self.path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        names = meta['columns']
+        selected = range(len(names)) if columns is None else [names.index(c) for c in columns]
+
+        data = {}
+        for i in selected:
+            filename = os.path.join(self.path, 'col_{}'.format(i))
+            if meta['dtypes'][i] is None:
+                with open(filename, 'rb') as f:
+                    chunks = []
+                    while True:
+                        try:
+                            chunks.append(pickle.load(f))
+                        except EOFError:
+                            break
+                data[i] = pd.concat(chunks, ignore_index=True) if chunks else pd.Series([], dtype=object)
+            elif meta['rows'] == 0:
+                data[i] = np.empty(0, dtype=meta['dtypes'][i])
+            else:
+                data[i] = np.memmap(filename, dtype=meta['dtypes'][i], mode='r', shape=(meta['rows'],))
+        df = pd.DataFrame(data, index=pd.RangeIndex(meta['rows']), copy=False)
+        df.columns = [names[i] for i in selected]
+        return df
+
+    def open(self, columns):
+        """
+        start writing a new sidecar
+
+        Parameters
+        ----------
+        columns: list of str
+            all columns of the source file
+
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+        try:
+            os.makedirs(self.path)
+        except OSError:
+            # read-only location, the file will not be cached
+            return
+        self._meta = {'columns': [str(c) for c in columns], 'dtypes': None, 'rows': 0}
+        self._files = [open(os.path.join(self.path, 'col_{}'.format(i)), 'wb') for i in range(len(columns))]
+
+    def _convert(self, i, dtype):
+        """
+        rewrite the rows already written in column i with a new type, None
+        turns the column into pickled chunks
+        """
+        filename = os.path.join(self.path, 'col_{}'.format(i))
+        self._files[i].close()
+        if self._meta['rows']:
+            written = np.fromfile(filename, dtype=self._meta['dtypes'][i])
+        else:
+            written = np.empty(0, dtype=self._meta['dtypes'][i])
+        with open(filename, 'wb') as f:
+            if dtype is None:
+                pickle.dump(pd.Series(written), f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                f.write(written.astype(dtype).tobytes())
+        self._files[i] = open(filename, 'ab')
+        self._meta['dtypes'][i] = dtype
+
+    def append(self, chunk):
+        """
+        write the rows of a chunk; when the type of a column changes between
+        chunks (e.g. integers followed by a missing value), the column is widened
+        to the common type, or pickled if there is none
+
+        Parameters
+        ----------
+        chunk: pd.DataFrame
+
+        """
+        if self._files is None:
+            return
+        dtypes = [d.str if isinstance(d, np.dtype) and d.kind in 'biufcmM' else None for d in chunk.dtypes]
+        if self._meta['dtypes'] is None:
+            self._meta['dtypes'] = list(dtypes)
+        for i, (written, dtype) in enumerate(zip(self._meta['dtypes'], dtypes)):
+            if written == dtype or written is None:
+                continue
+            common = None
+            if dtype is not None:
+                try:
+                    common = np.result_type(written, dtype)
+                except TypeError:
+                    pass
+            # datetimes and integers have a common type but do not mix
+            if common is not None and common.kind in 'biufc':
+                common = common.str
+            else:
+                common = None
+            if common != written:
+                self._convert(i, common)
+
+        for i, f in enumerate(self._files):
+            if self._meta['dtypes'][i] is None:
+                pickle.dump(chunk.iloc[:, i].reset_index(drop=True), f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                f.write(np.ascontiguousarray(chunk.iloc[:, i].to_numpy(dtype=self._meta['dtypes'][i])).tobytes())
+        self._meta['rows'] += len(chunk)
+
+    def close(self, complete=True):
+        """
+        finish the sidecar, it is only valid if complete is True
+
+        Parameters
+        ----------
+        complete: bool, default=True
+            False if the source was not entirely read
+
+        """
+        if self._files is None:
+            return
+        for f in self._files:
+            f.close()
+        self._files = None
+        if complete and self._meta['dtypes'] is not None:
+            self._meta['source'] = self._signature()
+            # meta.json is written last: an incomplete sidecar is never valid
+            with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+                json.dump(self._meta, f)
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+def read_csv(path, columns=None, chunksize=100000, progress=None, **kwargs):
+    """
+    read a csv file by chunks; the first read converts the file into a binary
+    sidecar, next reads are memory-mapped from it
+
+    Parameters
+    ----------
+    path: str
+    columns: list of str, optional
+        columns to read, all columns if None
+    chunksize: int, default=100000
+        number of rows per chunk
+    progress: function, optional
+        called with the fraction of the file already read
+    **kwargs: pd.read_csv arguments
+
+    Yield
+    -----
+    chunk: pd.DataFrame
+
+    """
+    sidecar = Sidecar(path)
+    if not kwargs and sidecar.isValid():
+        yield sidecar.read(columns)
+        if progress is not None:
+            progress(1)
+        return
+
+    # the whole file is converted, only requested columns are yielded
+    size = max(os.path.getsize(path), 1)
+    with open(path, 'rb') as f:
+        complete = False
+        try:
+            for i, chunk in enumerate(pd.read_csv(f, chunksize=chunksize, **kwargs)):
+                if i == 0 and not kwargs:
+                    sidecar.open(chunk.columns)
+                sidecar.append(chunk)
+                yield chunk if columns is None else chunk[columns]
+                if progress is not None:
+                    progress(min(f.tell() / size, 1))
+            complete = True
+        finally:
+            sidecar.close(complete)
+
+
+def read_parquet(path, columns=None, progress=None):
+    """
+    read a parquet file by row groups, only the requested columns are read
+
+    Parameters
+    ----------
+    path: str
+    columns: list of str, optional
+    progress: function, optional
+        called with the fraction of row groups already read
+
+    Yield
+    -----
+    chunk: pd.DataFrame
+
+    """
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path, memory_map=True)
+    n_groups = max(parquet.num_row_groups, 1)
+    for i in range(parquet.num_row_groups):
+        # the numeric columns are views of the memory-mapped file instead of pyarrow copies
+        yield ColumnarFrame.from_arrow(parquet.read_row_group(i, columns=columns)).to_pandas(copy=False)
+        if progress is not None:
+            progress((i + 1) / n_groups)
+
+
+def read_npy(path, columns=None):
+    """
+    memory-map a .npy file, structured arrays are read as a ColumnarFrame
+    of their fields (views of the memory map)
+
+    Parameters
+    ----------
+    path: str
+    columns: list of int, optional
+        indices along the last axis to keep (copied into memory),
+        or indices of the fields of a structured array
+
+    Return
+    ------
+    array: np.ndarray or ColumnarFrame
+
+    """
+    array = np.load(path, mmap_mode='r')
+    if array.dtype.names is not None and array.ndim == 1:
+        names = array.dtype.names if columns is None else [array.dtype.names[i] for i in columns]
+        return ColumnarFrame({name: array[name] for name in names})
+    if columns is not None:
+        array = np.asarray(array[..., columns])
+    return array
+
+
+def read_binary(path, dtype='float64', shape=None, offset=0, order='C'):
+    """
+    memory-map a raw binary file
+
+    Parameters
+    ----------
+    path: str
+    dtype: str, default='float64'
+    shape: tuple of int, optional
+        shape of the array, flat array of the whole file if None
+    offset: int, default=0
+        number of bytes to skip at the beginning of the file (header)
+    order: {'C', 'F'}, default='C'
+
+    Return
+    ------
+    array: np.memmap
+
+    """
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order=order)
@@ -1,16 +1,18 @@
 import time
 from src.model.utils import protector
+from src.model import loaders
+from src.model import join
 import pandas as pd
 import numpy as np
 
 
 class Model():
     @protector
-    def function1(self, minimum=0, maximum=100, sleep_time=2, insert_error=False):
+    def function1(self, minimum=0, maximum=100, sleep_time=2, insert_error=False, preview=False):
         """
-        this function is an example
+        this function is an example, its preview is faster
         """
-        time.sleep(sleep_time)
+        time.sleep(sleep_time / 10 if preview else sleep_time)
         if insert_error:
             raise ValueError("ceci est une erreur test")
         size = (100, 100)
@@ -18,3 +20,53 @@ class Model():
                           columns=np.arange(0, size[1]),
                           data=np.random.rand(*size)*10)
         return df
+
+    @protector
+    def load_csv(self, path, columns=None, chunksize=100000, progress=None):
+        """
+        stream a csv file by chunks, the file is converted into a binary
+        sidecar at first load and memory-mapped at next loads
+        """
+        yield from loaders.read_csv(path, columns, chunksize, progress)
+
+    @protector
+    def load_parquet(self, path, columns=None, progress=None):
+        """
+        stream a parquet file by row groups
+        """
+        yield from loaders.read_parquet(path, columns, progress)
+
+    @protector
+    def load_npy(self, path, columns=None):
+        """
+        memory-map a .npy file
+        """
+        return loaders.read_npy(path, columns)
+
+    @protector
+    def load_binary(self, path, dtype='float64', shape=None, offset=0):
+        """
+        memory-map a raw binary file
+        """
+        return loaders.read_binary(path, dtype, shape, offset)
+
+    @protector
+    def concat(self, inputs):
+        """
+        put the rows of the parent results one after the other
+        """
+        return join.concat_results(inputs)
+
+    @protector
+    def join(self, inputs, on, how='inner', columns=None, algorithm='auto', progress=None):
+        """
+        join the parent results on key columns, streamed by chunks of rows
+        """
+        yield from join.join_results(inputs, on, how, columns, algorithm, progress=progress)
+
+    @protector
+    def stack_columns(self, inputs):
+        """
+        put the columns of the parent results side by side
+        """
+        return join.stack_columns(inputs)
@@ -1,7 +1,32 @@
+import functools
+import inspect
+
+
 def protector(foo):
     """
     function used as decorator to avoid the app to crash because of basic errors
+    if the function is a generator (streamed result), the error is yielded as last item
+    if the function is a coroutine, the error is returned when awaited
     """
+    if inspect.iscoroutinefunction(foo):
+        @functools.wraps(foo)
+        async def inner_coroutine(*args, **kwargs):
+            try:
+                return await foo(*args, **kwargs)
+            except Exception as e:
+                return e
+        return inner_coroutine
+
+    if inspect.isgeneratorfunction(foo):
+        @functools.wraps(foo)
+        def inner_generator(*args, **kwargs):
+            try:
+                yield from foo(*args, **kwargs)
+            except Exception as e:
+                yield e
+        return inner_generator
+
+    @functools.wraps(foo)
     def inner(*args, **kwargs):
         try:
             return foo(*args, **kwargs)
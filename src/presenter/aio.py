@@ -0,0 +1,85 @@
+from PyQt5 import QtCore
+from src import DEFAULT
+import asyncio
+
+
+class AsyncioLoop(QtCore.QObject):
+    """
+    asyncio event loop driven by the Qt event loop: while coroutines are
+    pending, a QTimer runs one non-blocking iteration of the asyncio loop,
+    so that any number of concurrent I/O waits costs no extra thread
+
+    Parameters
+    ----------
+    interval: int, default=DEFAULT['asyncio_interval']
+        time between two iterations of the asyncio loop, in ms
+
+    """
+    def __init__(self, interval=DEFAULT['asyncio_interval']):
+        super().__init__()
+        self.loop = asyncio.new_event_loop()
+        self._tasks = set()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.step)
+
+    def step(self):
+        """
+        run one iteration of the asyncio loop without blocking
+        """
+        # stop is called at the end of the first iteration, and the ready
+        # callback makes the selector poll without timeout
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        if not self._tasks:
+            self._timer.stop()
+
+    def submit(self, coroutine):
+        """
+        schedule a coroutine on the loop
+
+        Parameters
+        ----------
+        coroutine: coroutine
+
+        Return
+        ------
+        task: asyncio.Task
+
+        """
+        task = self.loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if not self._timer.isActive():
+            self._timer.start()
+        return task
+
+    def close(self):
+        """
+        cancel pending coroutines and close the loop
+        """
+        self._timer.stop()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            self.loop.run_until_complete(asyncio.gather(*self._tasks, return_exceptions=True))
+        self.loop.close()
+
+
+class AsyncRunner():
+    """
+    Runner-like handle of a coroutine scheduled on the AsyncioLoop
+
+    Parameters
+    ----------
+    task: asyncio.Task
+    """
+    def __init__(self, task=None):
+        self.task = task
+
+    def isRunning(self):
+        return self.task is not None and not self.task.done()
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
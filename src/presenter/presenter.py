@@ -1,8 +1,17 @@
-from src.presenter.utils import view_manager
-from src import CONFIG_DIR
-import json
-import os
-from src import RESULT_STACK
+from src.presenter.utils import Runner, view_manager, widget_value
+from src.presenter.aio import AsyncioLoop
+from src.presenter.scheduler import SCHEDULER
+from src.view.utils import prepare_result
+from src import RESULT_STACK, DEFAULT
+from src.registry import ModuleRegistry
+from src.remote import WorkerPool
+from src.cache import RESULT_CACHE, cache_key
+from src.memory import MEMORY_TRACKER
+from src.columnar import readonly_view
+from src.export import export_result
+from src.sweep import sweep
+from PyQt5 import QtCore
+import inspect
 
 
 class Presenter():
@@ -20,13 +29,31 @@ class Presenter():
         self._model = model
         self._view = view
         self.threading_enabled = True
+        self.asyncio_loop = AsyncioLoop()
+        # worker daemons running the modules declared "remote"
+        self.workers = WorkerPool(DEFAULT['remote_workers']) if DEFAULT['remote_workers'] else None
+        self.exports = []
+        # results being written in the result cache
+        self.stores = []
         self.init_view_connections()
 
     # ------------------------------ CONNECTIONS ------------------------------#
     def init_view_connections(self):
-        self.modules = json.load(open(os.path.join(CONFIG_DIR, "modules.json"), "rb"))
+        self.registry = ModuleRegistry()
+        self.modules = self.registry.load()
         self._view.initMenu(self.modules)
         self._view.graph.nodeAdded.connect(lambda m: self.init_module_connections(m))
+        self._view.closed.connect(self.asyncio_loop.close)
+        self._view.runRequested.connect(self.run_batch)
+        self._view.exportRequested.connect(self.export_results)
+        self._view.closed.connect(self.cancel_exports)
+        SCHEDULER.queueChanged.connect(self._view.setQueueDepth)
+
+        # memory accounting, refreshed periodically to follow deleted and renamed nodes
+        self._view.memoryRequested.connect(self.update_memory_usage)
+        self._memory_timer = QtCore.QTimer(self._view)
+        self._memory_timer.timeout.connect(self.update_memory_usage)
+        self._memory_timer.start(DEFAULT['memory_refresh_interval'])
 
     def init_module_connections(self, module):
         """
@@ -41,13 +68,113 @@ class Presenter():
         """
         parameters = self.modules[module.type]
         module._runners = []
+        module._pending = None
+        module._activation_function = None
 
         if 'function' in parameters:
-            activation_function = eval('self.'+parameters['function'])
-            module.parameters.apply.clicked.connect(lambda: activation_function(module))
+            module._activation_function = getattr(self, parameters['function'])
+        elif 'model' in parameters:
+            # declared modules, their code is imported with the first node
+            try:
+                self.registry.resolve(module.type, self._model)
+            except Exception as e:
+                module.lefthead.setToolTip("[{0}] {1}".format(type(e).__name__, e))
+                module.lefthead.setPixmap(self._view._fail)
+                return
+            module._activation_function = self.call_module
+            self.show_cached_result(module)
+
+        if module._activation_function is not None:
+            module.parameters.apply.clicked.connect(lambda: module._activation_function(module))
+            self.init_live_mode(module)
 
         # do custom connections
-        # ...
+        if 'filter' in parameters:
+            module.parameters.browse.clicked.connect(
+                lambda: self._view.browseFile(module.parameters.path, parameters['filter']))
+        if parameters.get('function') == 'call_sweep':
+            module.parameters.module.addItems(self.sweep_targets())
+
+    def init_live_mode(self, module):
+        """
+        run the module while its parameters are edited (when its live mode is on):
+        edits are debounced, a preview run starts after a short pause and the full
+        run once editing stops. A run cancels the one in flight and waits for its
+        end, so that at most one run is pending
+
+        Parameters
+        ----------
+        module: QWidget
+
+        """
+        module._preview_timer = QtCore.QTimer(module)
+        module._preview_timer.setSingleShot(True)
+        module._preview_timer.setInterval(DEFAULT['live_preview_delay'])
+        module._preview_timer.timeout.connect(lambda: self.request_live_run(module, True))
+        module._full_timer = QtCore.QTimer(module)
+        module._full_timer.setSingleShot(True)
+        module._full_timer.setInterval(DEFAULT['live_run_delay'])
+        module._full_timer.timeout.connect(lambda: self.request_live_run(module, False))
+
+        def edited():
+            if module.live.isChecked():
+                if self.accepts_preview(module):
+                    module._preview_timer.start()
+                module._full_timer.start()
+        module.connectSignal('parametersEdited', edited)
+        module.live.toggled.connect(lambda checked: edited() if checked else None)
+        module.live.show()
+
+    def accepts_preview(self, module):
+        """
+        True if the model function of the module has a fast 'preview' path
+        """
+        if 'model' not in self.modules[module.type]:
+            return False
+        function = self.registry.resolve(module.type, self._model)
+        return 'preview' in inspect.signature(function).parameters
+
+    def request_live_run(self, module, preview):
+        """
+        coalesce a live run into the pending one and dispatch it when no run is in flight
+
+        Parameters
+        ----------
+        module: QWidget
+        preview: bool
+        """
+        # a full run request wins over a preview one
+        module._pending = preview if module._pending is None else module._pending and preview
+        running = [r for r in module._runners if r.isRunning()]
+        if running:
+            for runner in running:
+                runner.cancel()
+        else:
+            self.dispatch_live_run(module)
+
+    def dispatch_live_run(self, module):
+        preview, module._pending = module._pending, None
+        module._activation_function(module, preview=preview)
+
+    def run_batch(self, modules):
+        """
+        run several modules as background batch runs, the scheduler starts
+        upstream ones first and keeps a worker for interactive runs
+
+        Parameters
+        ----------
+        modules: list of QWidget
+        """
+        for module in modules:
+            if getattr(module, '_activation_function', None) is not None:
+                module._activation_function(module, batch=True)
+
+    def update_memory_usage(self):
+        """
+        send the memory used by each node result to the view
+        """
+        usage, total = MEMORY_TRACKER.usage(RESULT_STACK)
+        self._view.setMemoryUsage(usage, total)
 
     # --------------------- PRIOR  AND POST FUNCTION CALL ---------------------#
     def prior_to_function(self, module):
@@ -58,11 +185,155 @@ class Presenter():
         ----------
         module: QWidget
         """
+        # result replaced by this run (kept by the runs which supersede it)
+        if not any(r.isRunning() for r in module._runners):
+            module._previous = RESULT_STACK.get(module.name)
         module.loading.setMaximum(0)  # activate eternal loading
         module.lefthead.clear()
         module.lefthead.setToolTip(None)
 
-    def post_function(self, module, output):
+    def cache_key(self, module, function, args):
+        """
+        This method compute the key of a run in the result cache, from the module
+        type, the function, its arguments and the keys of the parent results
+
+        Parameters
+        ----------
+        module: QWidget
+        function: function
+        args: dict
+
+        Return
+        ------
+        key: str or None
+            None if the result must not be cached (disabled, declared "cache": false,
+            sweep of a module declared "cache": false or parent results which are
+            not cached)
+        """
+        modules = [module.type]
+        if self.modules[module.type].get('function') == 'call_sweep':
+            modules.append(widget_value(module.parameters.module))
+        if not DEFAULT['cache_enabled'] or not all(self.modules.get(name, {}).get('cache', True) for name in modules):
+            return None
+        upstream = [getattr(parent, '_fingerprint', None) for parent in module.parents]
+        if None in upstream:
+            return None
+        # parent results are identified by their keys
+        args = {name: value for name, value in args.items() if name != 'inputs'}
+        return cache_key(module.type, function, args, upstream)
+
+    def show_cached_result(self, module):
+        """
+        This method show the cached result of a new node, if its parameters and
+        parents were already run (e.g. in a previous session)
+
+        Parameters
+        ----------
+        module: QWidget
+        """
+        try:
+            function, args = self.module_arguments(module)
+        except Exception:
+            return
+        key = self.cache_key(module, function, args)
+        if key is None:
+            return
+        generation = getattr(module, '_generation', 0)
+
+        def show(output, summary):
+            # a run started meanwhile supersedes the cached result
+            if output is None or isinstance(output, Exception) or generation != getattr(module, '_generation', 0):
+                return
+            module._fingerprint = key
+            self.post_function(module, output, summary)
+
+        if not self.threading_enabled:
+            output = RESULT_CACHE.load(key)
+            show(output, self.prepare_result(output))
+            return
+        # the result file is read by a worker, not by the GUI thread
+        runner = Runner(RESULT_CACHE.load, key)
+        runner.prepare = self.prepare_result
+        runner.module = module
+        module._runners.append(runner)
+        runner.finished.connect(lambda: (module._runners.remove(runner), show(runner.out, runner.summary)))
+        runner.start()
+
+    def prepare_result(self, output):
+        """
+        This method compute the view data of an output (memory usage, headers,
+        first page, ...). It is called by the view_manager inside the worker thread
+        so that post_function has nothing expensive left to do
+
+        Parameters
+        ----------
+        output: exception, str, pd.DataFrame, np.array, ...
+
+        Return
+        ------
+        summary: view.utils.ResultSummary or None
+        """
+        try:
+            # cache the memory estimate with the result
+            MEMORY_TRACKER.estimate(output)
+            return prepare_result(output)
+        except Exception:
+            # view data will be computed by the view itself
+            return None
+
+    def store_result(self, key, output):
+        """
+        This method persist a result in the result cache once it is shown: the
+        file is written by a batch run of the scheduler, so that a result never
+        waits for its copy on disk
+
+        Parameters
+        ----------
+        key: str
+            see cache_key
+        output: any type data
+        """
+        if not self.threading_enabled:
+            RESULT_CACHE.store(key, output)
+            return
+        runner = Runner(RESULT_CACHE.store, key, output)
+        runner.batch = True
+        runner.finished.connect(lambda: self.stores.remove(runner))
+        self.stores.append(runner)
+        runner.start()
+
+    def stream_function(self, module, output):
+        """
+        This method show the partial output of a streamed model function,
+        it is called by the view_manager each time new chunks are available
+
+        Parameters
+        ----------
+        module: QWidget
+        output: ChunkedFrame
+            growing result, stored as is in the result stack
+        """
+        RESULT_STACK[module.name] = output
+        module.updateStream(output)
+
+    def update_progress(self, module, value):
+        """
+        This method show the progression of a model function which accepts
+        a 'progress' argument, it is called by the view_manager
+
+        Parameters
+        ----------
+        module: QWidget
+        value: float
+            progression between 0 and 1
+        """
+        try:
+            module.loading.setMaximum(100)
+            module.loading.setValue(int(value * 100))
+        except RuntimeError:
+            pass  # the node has been deleted meanwhile
+
+    def post_function(self, module, output, summary=None):
         """
         This method manage the output of a model function based on the output type
         it is called by the view_manager at the end of the model process
@@ -71,31 +342,187 @@ class Presenter():
         ----------
         module: QWidget
         output: exception, str, pd.DataFrame, np.array, ...
+        summary: view.utils.ResultSummary, optional
+            view data prepared by prepare_result
         """
         RESULT_STACK[module.name] = output
+        previous, module._previous = getattr(module, '_previous', None), output
+        if previous is not None and previous is not output:
+            self._view.graph.recordResult(module.name, previous, output, merge=module.live.isChecked())
         if isinstance(output, Exception):
             module.lefthead.setToolTip("[{0}] {1}".format(type(output).__name__, output))
             module.lefthead.setPixmap(self._view._fail)
         else:
             module.lefthead.setPixmap(self._view._valid)
 
-        module.updateResult(output)
+        module.updateResult(output, summary)
+        self.update_memory_usage()
+
+    def end_function(self, module):
+        """
+        This method is called by the view_manager when a run ends, after
+        post_function if its result is shown (runs superseded by a new call are not)
 
+        Parameters
+        ----------
+        module: QWidget
+        """
         # stop loading if one process is still running (if click multiple time
         # on the same button)
         are_running = [r.isRunning() for r in module._runners]
         if not any(are_running):
             module.loading.setMaximum(1)  # deactivate eternal loading
+            module.loading.setValue(0)
+            # start the live run which waited for the cancelled ones
+            if module._pending is not None:
+                self.dispatch_live_run(module)
 
     # ----------------------------- MODEL CALL --------------------------------#
-    @view_manager(True)
-    def call_function1(self, module):
-        # set model inputs
-        function = self._model.function1
-        args = {"minimum": module.parameters.minimum.value(),
-                "maximum": module.parameters.maximum.value(),
-                "sleep_time": module.parameters.sleeptime.value(),
-                "insert_error": module.parameters.inserterror.isChecked()}
-
-        # the view manager decorator will handle the function and its arguments
+    def module_function(self, name):
+        """
+        This method get the model function of a declared module, the functions
+        of the modules declared "remote" run on the workers if there are some
+
+        Parameters
+        ----------
+        name: str
+            module name
+
+        Return
+        ------
+        function: function
+        """
+        function = self.registry.resolve(name, self._model)
+        if self.workers is not None and self.modules[name].get('remote'):
+            function = self.workers.function(name, function)
+        return function
+
+    def module_arguments(self, module):
+        """
+        This method get the model function of a declared module and its
+        arguments, read from the parameter widgets. Modules declared with
+        "inputs" also get the results of their parents ('inputs' argument)
+
+        Parameters
+        ----------
+        module: QWidget
+
+        Return
+        ------
+        function: function
+        args: dict
+        """
+        function = self.module_function(module.type)
+        args = {}
+        for name, widget in self.modules[module.type].get('parameters', {}).items():
+            if isinstance(widget, str):
+                widget = {'widget': widget}
+            args[name] = widget_value(getattr(module.parameters, widget['widget']), widget.get('split'))
+        if self.modules[module.type].get('inputs'):
+            args['inputs'] = self.parent_results(module)
         return function, args
+
+    def parent_results(self, module):
+        """
+        This method get the results of the parents of a module, as read-only
+        views sharing their buffers (see columnar.readonly_view)
+
+        Parameters
+        ----------
+        module: QWidget
+
+        Return
+        ------
+        results: list
+            one result per parent, None for the parents without result
+        """
+        return [readonly_view(RESULT_STACK[parent.name]) if parent.name in RESULT_STACK else None
+                for parent in module.parents]
+
+    @view_manager(True)
+    def call_module(self, module):
+        return self.module_arguments(module)
+
+    # -------------------------------- SWEEP ----------------------------------#
+    def sweep_targets(self):
+        """
+        This method list the modules which can be swept, the declared ones
+
+        Return
+        ------
+        names: list of str
+        """
+        return [name for name, parameters in self.modules.items()
+                if 'model' in parameters and not parameters.get('inputs')]
+
+    @view_manager(True)
+    def call_sweep(self, module):
+        """
+        This method run the model function of a module on all the combinations
+        of some parameter values (see sweep.sweep), the modules declared
+        "vectorized" get batches of points in one call
+
+        Parameters
+        ----------
+        module: QWidget
+        """
+        target = widget_value(module.parameters.module)
+        args = {'function': self.module_function(target),
+                'values': widget_value(module.parameters.values),
+                'mode': widget_value(module.parameters.mode),
+                'vectorized': self.modules[target].get('vectorized', False)}
+        return sweep, args
+
+    # -------------------------------- EXPORT ---------------------------------#
+    def export_results(self, paths, format=None, compression=None):
+        """
+        This method write node results in files by chunks, in background: each
+        export is a batch run of the scheduler, so that the results of a branch
+        are written in parallel while a worker stays free for interactive runs
+
+        Parameters
+        ----------
+        paths: dict
+            {module: path}
+        format: {'csv', 'parquet', 'npy'}, optional
+            deduced from the file extensions by default
+        compression: str, optional
+        """
+        for module, path in paths.items():
+            if module.name not in RESULT_STACK:
+                self._view.showExportStatus(module.name, path, "no result")
+                continue
+            runner = Runner(export_result, RESULT_STACK[module.name], path, format, compression)
+            runner.module = module
+            runner.batch = True
+            runner._kwargs['progress'] = runner.report
+            runner.progressChanged.connect(lambda value, module=module: self.update_progress(module, value))
+            runner.finished.connect(lambda runner=runner, name=module.name: self.end_export(runner, name))
+            self.exports.append(runner)
+            runner.start()
+
+    def end_export(self, runner, name):
+        """
+        This method report the end of an export
+
+        Parameters
+        ----------
+        runner: Runner
+        name: str
+            name of the exported node
+        """
+        self.exports.remove(runner)
+        error = runner.out if isinstance(runner.out, Exception) else None
+        self._view.showExportStatus(name, runner._args[1], None if error is None else
+                                    "[{0}] {1}".format(type(error).__name__, error))
+        try:
+            self.end_function(runner.module)
+        except RuntimeError:
+            pass  # the node has been deleted meanwhile
+
+    def cancel_exports(self):
+        """
+        This method stop the exports, their partial files are removed
+        """
+        for runner in list(self.exports):
+            runner.cancel()
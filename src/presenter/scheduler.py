@@ -0,0 +1,164 @@
+from PyQt5 import QtCore
+from src import DEFAULT
+import itertools
+import threading
+
+
+class Scheduler(QtCore.QObject):
+    """
+    bounded pool of worker threads running the Runners by priority
+
+    When a worker is free, the queued run with the best rank starts: runs of nodes
+    visible in the viewport first, then upstream nodes before downstream ones, then
+    the oldest. Interactive runs (started by the user) are preferred to batch runs,
+    but a batch run still starts every 'interactive_share' runs and batch runs never
+    take the last worker, so that both kinds progress. A running job can reserve
+    free workers for its own threads (sweeps), they are counted as busy.
+
+    Parameters
+    ----------
+    max_workers: int, default=DEFAULT['max_workers']
+        number of worker threads, 0 for the number of cores
+    interactive_share: int, default=DEFAULT['interactive_share']
+        number of interactive runs started for each batch run when both are waiting
+
+    """
+    # emitted with the number of queued and running runs
+    queueChanged = QtCore.pyqtSignal(int, int)
+    # emitted by the threads giving back reserved workers, queued to the scheduler thread
+    _unreserved = QtCore.pyqtSignal()
+
+    def __init__(self, max_workers=DEFAULT['max_workers'], interactive_share=DEFAULT['interactive_share']):
+        super().__init__()
+        self.max_workers = max_workers or QtCore.QThread.idealThreadCount()
+        self.interactive_share = interactive_share
+        self._pool = None
+        self._queue = []
+        self._running = set()
+        self._order = itertools.count()
+        self._skipped_batches = 0
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self._unreserved.connect(self.dispatch)
+
+    @property
+    def pool(self):
+        # created with the first run, once the application exists
+        if self._pool is None:
+            self._pool = QtCore.QThreadPool(self)
+            self._pool.setMaxThreadCount(self.max_workers)
+        return self._pool
+
+    def submit(self, runner):
+        """
+        queue a runner, it starts as soon as a worker is free and no queued run has a better rank
+        """
+        runner._order = next(self._order)
+        self._queue.append(runner)
+        self.dispatch()
+
+    def cancel(self, runner):
+        """
+        remove a queued runner, it finishes without running
+        """
+        if runner in self._queue:
+            self._queue.remove(runner)
+            # finished is emitted later, as for a run, so that callers are not re-entered
+            QtCore.QTimer.singleShot(0, runner._skip)
+            self.queueChanged.emit(len(self._queue), len(self._running))
+
+    def rank(self, runner):
+        """
+        sort key of a queued runner, lower runs first
+
+        Return
+        ------
+        rank: tuple
+            (not visible, depth of the node in the graph, submission order)
+        """
+        module = runner.module
+        try:
+            hidden = module is None or not module.graph.isNodeVisible(module)
+            depth = 0 if module is None else module.depth
+        except RuntimeError:
+            # the node has been deleted meanwhile
+            hidden, depth = True, 0
+        return hidden, depth, runner._order
+
+    def next(self):
+        """
+        pop the next runner to start, None if none can start
+        """
+        interactive = [r for r in self._queue if not r.batch]
+        batch = [r for r in self._queue if r.batch]
+        busy_batches = sum(r.batch for r in self._running)
+        # the last worker is kept for interactive runs
+        if batch and (self.max_workers == 1 or busy_batches < self.max_workers - 1):
+            if not interactive or self._skipped_batches >= self.interactive_share:
+                self._skipped_batches = 0
+                runner = min(batch, key=self.rank)
+                self._queue.remove(runner)
+                return runner
+        if interactive:
+            self._skipped_batches += bool(batch)
+            runner = min(interactive, key=self.rank)
+            self._queue.remove(runner)
+            return runner
+        return None
+
+    def dispatch(self):
+        """
+        start queued runners while workers are free
+        """
+        while len(self._running) + self._reserved < self.max_workers:
+            runner = self.next()
+            if runner is None:
+                break
+            self._running.add(runner)
+            runner.finished.connect(lambda runner=runner: self.release(runner))
+            self.pool.start(_Job(runner))
+        self.queueChanged.emit(len(self._queue), len(self._running))
+
+    def release(self, runner):
+        self._running.discard(runner)
+        self.dispatch()
+
+    def reserve(self, count):
+        """
+        take free workers for the threads of a running job, called from its
+        worker; they are not used by queued runs until unreserve
+
+        Parameters
+        ----------
+        count: int
+            number of workers wanted
+
+        Return
+        ------
+        taken: int
+            number of workers reserved, at most count
+        """
+        with self._lock:
+            taken = max(0, min(count, self.max_workers - len(self._running) - self._reserved))
+            self._reserved += taken
+        return taken
+
+    def unreserve(self, count):
+        """
+        give back workers taken by reserve
+        """
+        with self._lock:
+            self._reserved -= count
+        self._unreserved.emit()
+
+
+class _Job(QtCore.QRunnable):
+    def __init__(self, runner):
+        super().__init__()
+        self.runner = runner
+
+    def run(self):
+        self.runner._execute()
+
+
+SCHEDULER = Scheduler()
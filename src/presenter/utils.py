@@ -1,52 +1,309 @@
-from PyQt5 import QtCore
+from PyQt5 import QtCore, QtWidgets
+from src import DEFAULT
+from src.cache import RESULT_CACHE
+from src.chunked import ChunkedFrame
+from src.presenter.aio import AsyncRunner
+from src.presenter.scheduler import SCHEDULER
+import asyncio
+import inspect
+import time
 
 
-class Runner(QtCore.QThread):
+def consume(generator, on_chunk=None, interval=DEFAULT['stream_refresh_interval'], interrupted=None):
     """
-    QThread that activate a function with arguments
+    gather the DataFrame chunks yielded by a streamed model function
+
+    Parameters
+    ----------
+    generator: generator
+        yields pd.DataFrame chunks, or an exception as last item (see protector)
+    on_chunk: function, optional
+        called with the growing ChunkedFrame, at most once every interval
+    interval: int, default=DEFAULT['stream_refresh_interval']
+        minimum time between two on_chunk calls, in ms
+    interrupted: function, optional
+        checked between chunks, the generator is closed when it returns True
+
+    Return
+    ------
+    result: ChunkedFrame or Exception
+
+    """
+    result = ChunkedFrame()
+    last_call = None
+    try:
+        for chunk in generator:
+            if isinstance(chunk, Exception):
+                return chunk
+            if interrupted is not None and interrupted():
+                generator.close()
+                return InterruptedError("cancelled")
+            result.append(chunk)
+            if on_chunk is not None and (last_call is None or time.perf_counter() - last_call > interval / 1000):
+                on_chunk(result)
+                last_call = time.perf_counter()
+    except Exception as e:
+        return e
+    return result
+
+
+def cached_call(key, function, /, **kwargs):
+    """
+    get the cached result of a call, or call the function; called by the
+    workers so that the result file is never read on the GUI thread
+
+    Parameters
+    ----------
+    key: str or None
+        cache key of the call, see cache.cache_key
+    function: function
+    **kwargs: function arguments
+
+    Return
+    ------
+    result: any type data
+    """
+    cached = None if key is None else RESULT_CACHE.load(key)
+    if cached is not None:
+        return cached
+    return function(**kwargs)
+
+
+class Runner(QtCore.QObject):
+    """
+    activate a function with arguments on a worker of the scheduler
 
     Parameters
     ----------
     target: function
     *args, **kwargs: function arguments
     """
+    # emitted with the growing result when target is a streamed function (generator)
+    chunksReady = QtCore.pyqtSignal(object)
+    # emitted with the progression (between 0 and 1) when target accepts a 'progress' argument
+    progressChanged = QtCore.pyqtSignal(float)
+    # emitted when the function returned, or when the run is cancelled before its start
+    finished = QtCore.pyqtSignal()
+
     def __init__(self, target, *args, **kwargs):
         super().__init__()
         self._target = target
         self._args = args
         self._kwargs = kwargs
+        self._running = False
+        self._interrupted = False
 
-        # where the function result is stored
+        # function applied to the result inside the thread to prepare its view data
+        self.prepare = None
+
+        # scheduling information: node of the run and kind of run (user or batch)
+        self.module = None
+        self.batch = False
+
+        # where the function result and its view data are stored
         self.out = None
+        self.summary = None
+
+    def start(self):
+        self._running = True
+        SCHEDULER.submit(self)
+
+    def isRunning(self):
+        """
+        True while the run is queued or running
+        """
+        return self._running
+
+    def cancel(self):
+        """
+        ask the function to stop: queued runs never start, streamed functions stop
+        at the next chunk, functions reporting progress at their next report
+        """
+        self._interrupted = True
+        SCHEDULER.cancel(self)
+
+    def isInterruptionRequested(self):
+        return self._interrupted
+
+    def report(self, value):
+        if self._interrupted:
+            raise InterruptedError("cancelled")
+        self.progressChanged.emit(value)
 
     def run(self):
         self.out = self._target(*self._args, **self._kwargs)
+        if inspect.isgenerator(self.out):
+            self.out = consume(self.out, self.chunksReady.emit, interrupted=self.isInterruptionRequested)
+        if self.prepare is not None and not self._interrupted:
+            self.summary = self.prepare(self.out)
+
+    def _execute(self):
+        # called by the worker thread
+        try:
+            self.run()
+        except Exception as e:
+            self.out = e
+        finally:
+            self._running = False
+            self.finished.emit()
+
+    def _skip(self):
+        self.out = InterruptedError("cancelled")
+        self._running = False
+        self.finished.emit()
 
 
 def view_manager(threadable=True):
     """
     this decorator manage threading
 
+    A new call supersedes the runs in flight of the module: they are cancelled
+    and their results are dropped
+
     Parameters
     ----------
     threadable: bool, default=True
-        if True, the model function will be processed inside a QThread (if allowed)
+        if True, the model function will be processed by a worker of the scheduler (if allowed)
+        coroutine functions (async def) are always scheduled on the presenter asyncio loop
 
     """
     def decorator(foo):
-        def inner(presenter, module):
+        def inner(presenter, module, preview=False, batch=False):
             presenter.prior_to_function(module)
             function, args = foo(presenter, module)
+            parameters = inspect.signature(function).parameters
 
-            # start the process inside a QThread
-            if threadable and presenter.threading_enabled:
-                runner = Runner(function, **args)
+            # only the last run of a module shows its result
+            module._generation = generation = getattr(module, '_generation', 0) + 1
+            for runner in list(module._runners):
+                runner.cancel()
+
+            # previews are approximations, they are never cached
+            key = None if preview else presenter.cache_key(module, function, args)
+
+            def finish(output, summary):
+                if generation == module._generation:
+                    # identifies the result in the keys of the children
+                    module._fingerprint = None if isinstance(output, Exception) else key
+                    presenter.post_function(module, output, summary)
+                    # written on disk once shown, mapped results of the cache are not stored again
+                    if key is not None and not isinstance(output, Exception):
+                        presenter.store_result(key, output)
+                presenter.end_function(module)
+
+            # fast path of the functions that accept a 'preview' argument
+            if preview and 'preview' in parameters:
+                args['preview'] = True
+
+            # give a progress callback to the functions that accept it
+            reports_progress = 'progress' in parameters
+
+            # schedule coroutines on the asyncio loop, without thread
+            if inspect.iscoroutinefunction(function):
+                if reports_progress:
+                    args['progress'] = lambda value: presenter.update_progress(module, value)
+                runner = AsyncRunner()
+
+                async def job():
+                    # the loop is stepped by the GUI thread, blocking work goes to its executor
+                    loop = asyncio.get_running_loop()
+                    try:
+                        # result of a previous run with the same inputs, possibly of a previous session
+                        output = None if key is None else await loop.run_in_executor(None, RESULT_CACHE.load, key)
+                        if output is None:
+                            output = await function(**args)
+                        summary = None
+                        if generation == module._generation:
+                            summary = await loop.run_in_executor(None, presenter.prepare_result, output)
+                    except asyncio.CancelledError:
+                        output, summary = InterruptedError("cancelled"), None
+                    except Exception as e:
+                        # unprotected coroutines fail as the threaded runs do
+                        output, summary = e, None
+                    finally:
+                        module._runners.remove(runner)
+                    finish(output, summary)
+                module._runners.append(runner)
+                runner.task = presenter.asyncio_loop.submit(job())
+
+            # queue the process on the bounded worker pool
+            elif threadable and presenter.threading_enabled:
+                # the cache is read by the worker
+                runner = Runner(cached_call, key, function, **args)
+                runner.prepare = presenter.prepare_result
+                runner.module = module
+                runner.batch = batch
+                if reports_progress:
+                    runner._kwargs['progress'] = runner.report
+                    runner.progressChanged.connect(lambda value: presenter.update_progress(module, value))
+                if getattr(function, 'remote', False):
+                    # remote functions poll the cancellation while waiting for their worker
+                    runner._kwargs['interrupted'] = runner.isInterruptionRequested
                 module._runners.append(runner)
-                runner.finished.connect(lambda: (presenter.post_function(module, runner.out),
-                                                 module._runners.remove(runner)))
+                runner.chunksReady.connect(lambda result: presenter.stream_function(module, result)
+                                           if generation == module._generation else None)
+                runner.finished.connect(lambda: (module._runners.remove(runner),
+                                                 finish(runner.out, runner.summary)))
                 runner.start()
             else:
-                presenter.post_function(module, function(**args))
-                module._runners.remove(runner)
+                if reports_progress:
+                    args['progress'] = lambda value: presenter.update_progress(module, value)
+                output = cached_call(key, function, **args)
+                if inspect.isgenerator(output):
+                    output = consume(output, lambda result: presenter.stream_function(module, result))
+                finish(output, presenter.prepare_result(output))
         return inner
     return decorator
+
+
+def split_list(text, type=str):
+    """
+    convert a comma-separated text into a list
+
+    Parameters
+    ----------
+    text: str
+    type: function, default=str
+        applied to each stripped element
+
+    Return
+    ------
+    result: list or None
+        None if text is empty
+
+    """
+    elements = [e.strip() for e in text.split(',') if e.strip()]
+    return [type(e) for e in elements] or None
+
+
+def widget_value(widget, split=None):
+    """
+    read the value of a parameter widget
+
+    Parameters
+    ----------
+    widget: QWidget
+        QLineEdit, QSpinBox, QDoubleSpinBox, QAbstractButton, QComboBox, ...
+    split: str, optional
+        name of a builtin type ('str', 'int', 'float'), if given, the text is
+        converted into a list (see split_list)
+
+    Return
+    ------
+    value: str, int, float, bool, list or None
+
+    """
+    if isinstance(widget, (QtWidgets.QSpinBox, QtWidgets.QDoubleSpinBox, QtWidgets.QSlider)):
+        value = widget.value()
+    elif isinstance(widget, QtWidgets.QAbstractButton):
+        value = widget.isChecked()
+    elif isinstance(widget, QtWidgets.QComboBox):
+        value = widget.currentText()
+    elif isinstance(widget, QtWidgets.QPlainTextEdit):
+        value = widget.toPlainText()
+    else:
+        value = widget.text()
+
+    if split is not None:
+        value = split_list(str(value), {'str': str, 'int': int, 'float': float}[split])
+    return value
@@ -0,0 +1,200 @@
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import sys
+from src import CONFIG_DIR, DESIGN_DIR, MAIN_DIR, DEFAULT
+
+
+MANIFEST = "plugin.json"
+ENTRY_POINT_GROUP = "pyqtapp.plugins"
+
+
+def plugin_entry_points():
+    """
+    list the entry points of the plugin group, entry_points(group=...) is not
+    available before python 3.10
+    """
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return list(entry_points.select(group=ENTRY_POINT_GROUP))
+    return list(entry_points.get(ENTRY_POINT_GROUP, []))
+
+
+class ModuleRegistry():
+    """
+    index of the modules available in the application
+
+    Modules are declared in manifests (json dictionaries {module name: parameters}):
+    the built-in config/modules.json, a plugin.json file in each sub-directory of
+    the plugin directories, and a plugin.json file next to the packages declared
+    by the 'pyqtapp.plugins' entry points. A module declares its node type, menu,
+    .ui file, model function and parameters, e.g.
+
+        "csv": {"type": "primary", "menu": "load", "ui": "csv.ui",
+                "model": "load_csv",
+                "parameters": {"path": "path", "columns": {"widget": "columns", "split": "str"}}}
+
+    A module declaring "inputs": true gets the results of its parent nodes as
+    the 'inputs' argument of its model function (a list, one per parent).
+    A module whose model function accepts 1D arrays of parameter values (one
+    element per point) and returns one result per point declares "vectorized":
+    true, sweeps then call it once per batch of points (see sweep.sweep).
+
+    The merged index is cached on disk and reused while no manifest changed, so that
+    manifests are not parsed at startup. Model functions are imported only when a
+    node of their type is first created (see resolve).
+
+    Parameters
+    ----------
+    plugin_dirs: list of str, optional
+        directories containing one plugin per sub-directory (relative to the main directory)
+    index_path: str, optional
+        path of the cached index
+    entry_points: bool, default=True
+        if True, discover plugins declared by installed packages
+
+    """
+    def __init__(self, plugin_dirs=None, index_path=None, entry_points=True):
+        self.plugin_dirs = [os.path.join(MAIN_DIR, d) for d in (plugin_dirs or DEFAULT['plugin_dirs'])]
+        self.index_path = index_path or os.path.join(CONFIG_DIR, DEFAULT['plugin_index'])
+        self.entry_points = entry_points
+        self.modules = {}
+        self.cached = False
+        self._functions = {}
+
+    def sources(self):
+        """
+        list manifests without reading them
+
+        Return
+        ------
+        sources: list of [path, package, mtime, size]
+            package is the import name of entry point plugins, else None
+        """
+        sources = [(os.path.join(CONFIG_DIR, "modules.json"), None)]
+        for directory in self.plugin_dirs:
+            if os.path.isdir(directory):
+                for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+                    if entry.is_dir():
+                        sources.append((os.path.join(entry.path, MANIFEST), None))
+        if self.entry_points:
+            for entry_point in plugin_entry_points():
+                # locate the package without importing it
+                spec = importlib.util.find_spec(entry_point.value)
+                if spec is not None and spec.submodule_search_locations:
+                    sources.append((os.path.join(list(spec.submodule_search_locations)[0], MANIFEST),
+                                    entry_point.value))
+
+        signature = []
+        for path, package in sources:
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                signature.append([path, package, stat.st_mtime_ns, stat.st_size])
+        return signature
+
+    def load(self):
+        """
+        load the index from the disk cache if it is up to date, else rebuild it
+
+        Return
+        ------
+        modules: dict
+            {module name: parameters}
+        """
+        signature = self.sources()
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            self.cached = index['sources'] == signature
+        except (OSError, ValueError, KeyError):
+            self.cached = False
+
+        if self.cached:
+            self.modules = index['modules']
+        else:
+            self.modules = self.build(signature)
+            self.save(signature)
+        return self.modules
+
+    def build(self, signature):
+        """
+        read all manifests and resolve their relative paths
+        """
+        modules = {}
+        for path, package, _, _ in signature:
+            root = os.path.dirname(path)
+            builtin = root == CONFIG_DIR
+            with open(path, "r") as f:
+                manifest = json.load(f)
+            for name, parameters in manifest.items():
+                parameters = dict(parameters)
+                ui = parameters.get('ui', name + '.ui')
+                parameters['ui'] = os.path.join(DESIGN_DIR, 'ui', ui) if builtin else os.path.join(root, ui)
+                if not builtin:
+                    parameters['root'] = root
+                    parameters['package'] = package
+                modules[name] = parameters
+        return modules
+
+    def save(self, signature):
+        # written aside then renamed, a concurrent startup never reads a partial index
+        tmp = self.index_path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({'sources': signature, 'modules': self.modules}, f)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            pass
+
+    def resolve(self, name, model=None):
+        """
+        get the model function of a module, its code is imported at first call
+
+        Parameters
+        ----------
+        name: str
+            module name
+        model: model.Model, optional
+            instance owning the built-in model functions
+
+        Return
+        ------
+        function: callable or None
+        """
+        if name not in self._functions:
+            target = self.modules[name].get('model')
+            if target is None:
+                function = None
+            elif ':' not in target:
+                # built-in function, a method of the Model
+                function = getattr(model, target)
+            else:
+                module_name, attribute = target.split(':')
+                function = _import(module_name, self.modules[name])
+                for attr in attribute.split('.'):
+                    function = getattr(function, attr)
+            self._functions[name] = function
+        return self._functions[name]
+
+
+def _import(module_name, parameters):
+    """
+    import a plugin module: from its package for entry points, from its directory otherwise
+    """
+    if parameters.get('package'):
+        return importlib.import_module(parameters['package'] + '.' + module_name)
+
+    qualified_name = "plugins.{0}.{1}".format(os.path.basename(parameters['root']), module_name)
+    if qualified_name not in sys.modules:
+        path = os.path.join(parameters['root'], *module_name.split('.')) + '.py'
+        spec = importlib.util.spec_from_file_location(qualified_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[qualified_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[qualified_name]
+            raise
+    return sys.modules[qualified_name]
@@ -0,0 +1,573 @@
+import argparse
+import asyncio
+import hmac
+import inspect
+import itertools
+import os
+import pickle
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+from src import DEFAULT
+from src.registry import ModuleRegistry
+
+
+# frame kinds
+HELLO, JOB, PROGRESS, CHUNK, RESULT = range(5)
+
+# frame header: kind, number of out-of-band buffers, size of the pickled payload
+_HEADER = struct.Struct('!BIQ')
+_SIZE = struct.Struct('!Q')
+# handshake: random challenges, then HMAC-SHA256 proofs of the token
+_NONCE_SIZE = 32
+_HANDSHAKE_LIMIT = 1024
+
+
+def parse_address(address):
+    """
+    convert a worker address into a socket family and a socket address
+
+    Parameters
+    ----------
+    address: str
+        "host:port" for TCP, "unix:path" for a Unix socket
+
+    Return
+    ------
+    family: int
+    target: tuple or str
+
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def send_frame(sock, kind, value=None, raw=None):
+    """
+    send a frame: header, pickled payload, then the out-of-band buffers.
+    The numpy buffers of arrays and pandas objects are not copied into the
+    pickle, they are sent as is after it
+
+    Parameters
+    ----------
+    sock: socket.socket
+    kind: int
+    value: any picklable object, optional
+    raw: bytes, optional
+        payload sent instead of a pickled value (handshake)
+
+    """
+    buffers = []
+    payload = raw if raw is not None else pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    sock.sendall(_HEADER.pack(kind, len(raws), len(payload)) + payload)
+    for data in raws:
+        sock.sendall(_SIZE.pack(data.nbytes))
+        sock.sendall(data)
+
+
+def recv_frame(sock, limit=None):
+    """
+    receive a frame sent by send_frame
+
+    Parameters
+    ----------
+    sock: socket.socket
+    limit: int, optional
+        maximum payload size, frames with buffers or a larger payload are
+        refused (handshake of a peer not authenticated yet)
+
+    Return
+    ------
+    kind: int
+    payload: bytearray
+    buffers: list of bytearray
+
+    """
+    kind, count, size = _HEADER.unpack(_recv(sock, _HEADER.size))
+    if limit is not None and (count or size > limit):
+        raise ConnectionError("unexpected handshake frame")
+    payload = _recv(sock, size)
+    buffers = [_recv(sock, _SIZE.unpack(_recv(sock, _SIZE.size))[0]) for _ in range(count)]
+    return kind, payload, buffers
+
+
+def _recv(sock, size):
+    # received in place, arrays rebuilt on these buffers are not copied
+    data = bytearray(size)
+    view = memoryview(data)
+    while view:
+        n = sock.recv_into(view)
+        if n == 0:
+            raise ConnectionError("connection closed")
+        view = view[n:]
+    return data
+
+
+def _load(payload, buffers):
+    return pickle.loads(payload, buffers=buffers)
+
+
+def _proof(token, side, server_nonce, client_nonce):
+    # HMAC of both challenges, the side prevents a proof from being sent back as is
+    return hmac.new(token.encode(), side + server_nonce + client_nonce, 'sha256').digest()
+
+
+class WorkerDaemon():
+    """
+    server running module functions for remote applications
+
+    A client connects and both sides prove that they know the token without
+    sending it (HMAC-SHA256 of random challenges), then the client sends one
+    job {module name, arguments}.
+    The function of the module is resolved from the module registry (the daemon
+    must have the same plugins as the clients), progress values and chunks of
+    streamed functions are sent back as soon as they are produced, then the
+    result. The client closes the connection to cancel the job: functions
+    reporting progress stop at their next report, streamed functions at their
+    next chunk. Frames are pickled: the daemon refuses to start without a
+    token, and must only listen on trusted networks (the frames are not
+    encrypted).
+
+    Parameters
+    ----------
+    address: str
+        "host:port" (port 0 for any free port) or "unix:path"
+    model: model.Model, optional
+        instance owning the built-in model functions
+    token: str, default=DEFAULT['remote_token']
+        shared secret of the daemon and its clients, it cannot be empty
+    slots: int, default=0
+        number of jobs running at the same time, 0 for the number of cores
+
+    """
+    def __init__(self, address, model=None, token=DEFAULT['remote_token'], slots=0):
+        if not token:
+            raise ValueError("a worker daemon needs a token: anyone able to connect could run code on it")
+        if model is None:
+            from src.model.model import Model
+            model = Model()
+        self.model = model
+        self.registry = ModuleRegistry()
+        self.registry.load()
+        self.token = token
+        self.served = 0
+        self._slots = threading.BoundedSemaphore(slots or os.cpu_count())
+        self._connections = set()
+        self._lock = threading.Lock()
+
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(target):
+                os.unlink(target)
+            self.server = _UnixServer(target, _Handler)
+        else:
+            self.server = _TCPServer(target, _Handler)
+        self.server.worker = self
+
+    @property
+    def address(self):
+        if self.server.address_family == socket.AF_UNIX:
+            return 'unix:' + self.server.server_address
+        return "{0}:{1}".format(*self.server.server_address[:2])
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """
+        stop serving and drop the connected clients
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        with self._lock:
+            for sock in self._connections:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        if self.server.address_family == socket.AF_UNIX and os.path.exists(self.server.server_address):
+            os.unlink(self.server.server_address)
+
+    def serve(self, sock, job):
+        """
+        run a job in a thread while watching the connection: data or end of
+        file from the client during a job means the job is cancelled
+        """
+        cancelled = threading.Event()
+        thread = threading.Thread(target=self.run, args=(sock, job, cancelled), daemon=True)
+        thread.start()
+        while thread.is_alive():
+            if select.select([sock], [], [], 0.1)[0]:
+                cancelled.set()
+                raise ConnectionError("job cancelled by the client")
+
+    def run(self, sock, job, cancelled):
+        lock = threading.Lock()
+
+        def send(kind, value):
+            with lock:
+                send_frame(sock, kind, value)
+
+        try:
+            with self._slots:
+                if cancelled.is_set():
+                    return
+                with self._lock:
+                    self.served += 1
+                output = self.execute(job, cancelled, send)
+            try:
+                send(RESULT, output)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                send(RESULT, RuntimeError("the result cannot be sent: {}".format(e)))
+        except OSError:
+            # the client is gone
+            pass
+
+    def execute(self, job, cancelled, send):
+        """
+        call the function of a job, chunks of streamed functions are sent as
+        they come and the result is None
+
+        Parameters
+        ----------
+        job: dict
+            {'module': module name, 'kwargs': arguments, 'progress': True if progress is reported}
+        cancelled: threading.Event
+        send: function
+            send(kind, value) sends a frame to the client
+
+        Return
+        ------
+        output: any type data or Exception
+
+        """
+        try:
+            function = self.registry.resolve(job['module'], self.model)
+            kwargs = dict(job['kwargs'])
+            if job['progress']:
+                def progress(value):
+                    if cancelled.is_set():
+                        raise InterruptedError("cancelled")
+                    send(PROGRESS, value)
+                kwargs['progress'] = progress
+
+            output = function(**kwargs)
+            if inspect.iscoroutine(output):
+                output = asyncio.run(output)
+            if inspect.isgenerator(output):
+                for chunk in output:
+                    if cancelled.is_set():
+                        output.close()
+                        break
+                    send(CHUNK, chunk)
+                output = None
+        except Exception as e:
+            output = e
+        return output
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        worker, sock = self.server.worker, self.request
+        with worker._lock:
+            worker._connections.add(sock)
+        try:
+            # the handshake must be done within the connection timeout
+            sock.settimeout(DEFAULT['remote_timeout'] / 1000)
+            server_nonce = os.urandom(_NONCE_SIZE)
+            send_frame(sock, HELLO, raw=server_nonce)
+            kind, payload, _ = recv_frame(sock, _HANDSHAKE_LIMIT)
+            client_nonce, proof = bytes(payload[:_NONCE_SIZE]), bytes(payload[_NONCE_SIZE:])
+            accepted = kind == HELLO and len(client_nonce) == _NONCE_SIZE and \
+                hmac.compare_digest(proof, _proof(worker.token, b'client', server_nonce, client_nonce))
+            send_frame(sock, HELLO, raw=_proof(worker.token, b'server', server_nonce, client_nonce)
+                       if accepted else b'denied')
+            sock.settimeout(None)
+            while accepted:
+                kind, payload, buffers = recv_frame(sock)
+                if kind == JOB:
+                    worker.serve(sock, _load(payload, buffers))
+        except OSError:
+            pass
+        finally:
+            with worker._lock:
+                worker._connections.discard(sock)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:  # windows
+    _UnixServer = None
+
+
+class RemoteWorker():
+    """
+    client side state of a worker daemon
+
+    Parameters
+    ----------
+    address: str
+        "host:port" or "unix:path"
+    token: str
+    timeout: float
+        connection timeout, in s
+
+    """
+    def __init__(self, address, token, timeout):
+        self.address = address
+        self.token = token
+        self.timeout = timeout
+        self.jobs = 0  # jobs in flight
+        self.failures = 0  # consecutive failures
+        self.retry_at = 0
+
+    def available(self):
+        return time.monotonic() >= self.retry_at
+
+    def connect(self):
+        """
+        open a connection and authenticate both sides with the token
+
+        Return
+        ------
+        sock: socket.socket
+        """
+        family, target = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(target)
+            if family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _, server_nonce, _ = recv_frame(sock, _HANDSHAKE_LIMIT)
+            server_nonce, client_nonce = bytes(server_nonce), os.urandom(_NONCE_SIZE)
+            send_frame(sock, HELLO, raw=client_nonce + _proof(self.token, b'client', server_nonce, client_nonce))
+            _, answer, _ = recv_frame(sock, _HANDSHAKE_LIMIT)
+            sock.settimeout(None)
+        except BaseException:
+            sock.close()
+            raise
+        # the worker proves the token too: results of another server are never unpickled
+        if not hmac.compare_digest(bytes(answer), _proof(self.token, b'server', server_nonce, client_nonce)):
+            sock.close()
+            raise PermissionError("worker {} rejected the token or does not know it".format(self.address))
+        return sock
+
+    def failed(self, delay):
+        # exponential backoff: the worker is tried last until delay, 2*delay, ... (at most 1 min)
+        self.failures += 1
+        self.retry_at = time.monotonic() + min(delay * 2**(self.failures - 1), 60)
+
+    def succeeded(self):
+        self.failures = 0
+        self.retry_at = 0
+
+
+class WorkerPool():
+    """
+    set of worker daemons running the functions of remote modules
+
+    A job goes to the worker with the fewest jobs in flight, workers which
+    recently failed are tried last. When a worker cannot be reached or drops
+    the connection before sending anything, the job is sent to the next worker,
+    each worker being tried once per job.
+
+    Parameters
+    ----------
+    addresses: list of str
+        "host:port" or "unix:path"
+    token: str, default=DEFAULT['remote_token']
+    retry_delay: int, default=DEFAULT['remote_retry_delay']
+        time before a failed worker is preferred again (doubled at each
+        consecutive failure), in ms
+    timeout: int, default=DEFAULT['remote_timeout']
+        connection timeout, in ms
+
+    """
+    def __init__(self, addresses, token=DEFAULT['remote_token'], retry_delay=DEFAULT['remote_retry_delay'],
+                 timeout=DEFAULT['remote_timeout']):
+        self.workers = [RemoteWorker(address, token, timeout / 1000) for address in addresses]
+        self.retry_delay = retry_delay / 1000
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def acquire(self, tried):
+        """
+        pick the worker of the next attempt of a job
+
+        Parameters
+        ----------
+        tried: list of RemoteWorker
+            workers already tried for the job
+
+        Return
+        ------
+        worker: RemoteWorker or None
+        """
+        with self._lock:
+            candidates = [w for w in self.workers if w not in tried]
+            if not candidates:
+                return None
+            # round robin between equivalent workers
+            turn = next(self._turn) % len(self.workers)
+            rotation = {w: (i - turn) % len(self.workers) for i, w in enumerate(self.workers)}
+            worker = min(candidates, key=lambda w: (not w.available(), w.jobs, rotation[w]))
+            worker.jobs += 1
+            return worker
+
+    def execute(self, name, kwargs, progress=None, interrupted=None):
+        """
+        run the function of a module on a worker
+
+        Parameters
+        ----------
+        name: str
+            module name
+        kwargs: dict
+            function arguments
+        progress: function, optional
+            called with the progress values reported by the function
+        interrupted: function, optional
+            polled while waiting, the job is cancelled when it returns True
+
+        Yields
+        ------
+        kind, value: CHUNK and chunk, then RESULT and result
+
+        """
+        tried, error = [], ConnectionError("no remote worker")
+        job = {'module': name, 'kwargs': kwargs, 'progress': progress is not None}
+        while True:
+            worker = self.acquire(tried)
+            if worker is None:
+                raise error
+            tried.append(worker)
+            started = False
+            try:
+                sock = worker.connect()
+                try:
+                    send_frame(sock, JOB, job)
+                    while True:
+                        kind, value = _receive(sock, interrupted)
+                        if kind == PROGRESS:
+                            progress(value)
+                            continue
+                        started = True
+                        if kind == RESULT:
+                            worker.succeeded()
+                        yield kind, value
+                        if kind == RESULT:
+                            return
+                finally:
+                    # closing the connection cancels an unfinished job
+                    sock.close()
+            except InterruptedError:
+                raise
+            except OSError as e:
+                worker.failed(self.retry_delay)
+                if started:
+                    # chunks were already given, the job cannot be replayed
+                    raise
+                error = e
+            finally:
+                with self._lock:
+                    worker.jobs -= 1
+
+    def function(self, name, local):
+        """
+        get a callable running the function of a module on the workers
+
+        Parameters
+        ----------
+        name: str
+            module name
+        local: function
+            local function of the module, gives the signature
+
+        Return
+        ------
+        function: RemoteFunction
+        """
+        return RemoteFunction(self, name, local)
+
+
+def _receive(sock, interrupted):
+    while interrupted is not None:
+        if interrupted():
+            raise InterruptedError("cancelled")
+        if select.select([sock], [], [], 0.1)[0]:
+            break
+    kind, payload, buffers = recv_frame(sock)
+    return kind, _load(payload, buffers)
+
+
+class RemoteFunction():
+    """
+    callable running the function of a module on a WorkerPool. It has the
+    signature of the local function so that it gets the same arguments
+    (preview, progress), and returns a generator of chunks if the local
+    function is streamed. The 'interrupted' argument is polled while waiting
+
+    Parameters
+    ----------
+    pool: WorkerPool
+    name: str
+        module name
+    local: function
+
+    """
+    remote = True
+
+    def __init__(self, pool, name, local):
+        self.pool = pool
+        self.name = name
+        self.streamed = inspect.isgeneratorfunction(local)
+        self.__signature__ = inspect.signature(local)
+        self.__wrapped__ = local
+        self.__name__ = getattr(local, '__name__', name)
+
+    def __call__(self, progress=None, interrupted=None, **kwargs):
+        frames = self.pool.execute(self.name, kwargs, progress, interrupted)
+        if self.streamed:
+            return self._stream(frames)
+        for kind, value in frames:
+            if kind == RESULT:
+                frames.close()
+                return value
+
+    @staticmethod
+    def _stream(frames):
+        for kind, value in frames:
+            if kind == CHUNK or isinstance(value, Exception):
+                yield value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run the module functions of remote applications")
+    parser.add_argument('address', help='"host:port" or "unix:path"')
+    parser.add_argument('--slots', type=int, default=0,
+                        help="number of jobs running at the same time (default: number of cores)")
+    args = parser.parse_args()
+
+    daemon = WorkerDaemon(args.address, slots=args.slots)
+    print("worker listening on", daemon.address)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        daemon.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import ast
+import concurrent.futures
+import inspect
+import itertools
+import math
+import os
+import threading
+import numpy as np
+import pandas as pd
+from src import DEFAULT
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+from src.model.utils import protector
+from src.presenter.scheduler import SCHEDULER
+from src.presenter.utils import consume
+
+
+MODES = ('grid', 'list')
+
+
+class SweepError(Exception):
+    """
+    error of a sweep point, its message gives the parameters of the point
+    """
+
+
+def parse_values(text):
+    """
+    read the parameter values of a sweep, one parameter per line:
+
+        name = 1, 2, 5          list of values
+        name = 0:100:11         11 values evenly spaced from 0 to 100 (both included)
+        name = 3                single value, the parameter is fixed
+
+    Values are python literals, other values are kept as strings. Empty lines
+    and lines starting with # are ignored
+
+    Parameters
+    ----------
+    text: str
+
+    Return
+    ------
+    values: dict
+        {name: list of values} of the swept parameters
+    fixed: dict
+        {name: value} of the fixed parameters
+
+    """
+    values, fixed = {}, {}
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        name, separator, spec = line.partition('=')
+        name, spec = name.strip(), spec.strip()
+        if not separator or not name.isidentifier() or not spec:
+            raise ValueError("line {0}: expected 'name = values', got {1!r}".format(number, line))
+        if spec.count(':') == 2 and ',' not in spec:
+            parsed = _linspace(*(_literal(s) for s in spec.split(':')))
+        else:
+            parsed = [_literal(s) for s in spec.split(',')]
+        if len(parsed) == 1:
+            fixed[name] = parsed[0]
+        else:
+            values[name] = parsed
+    return values, fixed
+
+
+def _literal(text):
+    text = text.strip()
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def _linspace(start, stop, count):
+    if not isinstance(count, int) or count < 1:
+        raise ValueError("the number of values of a range must be a positive integer")
+    values = np.linspace(start, stop, count)
+    # integer bounds with an integer step give integers
+    if isinstance(start, int) and isinstance(stop, int) and (count == 1 or (stop - start) % (count - 1) == 0):
+        return [int(v) for v in np.rint(values)]
+    return values.tolist()
+
+
+def sweep_points(values, mode='grid'):
+    """
+    list the parameter combinations of a sweep
+
+    Parameters
+    ----------
+    values: dict
+        {name: list of values}
+    mode: {'grid', 'list'}, default='grid'
+        'grid' for all the combinations (the last parameter varies the
+        fastest), 'list' to take the i-th value of each parameter together
+
+    Return
+    ------
+    points: dict
+        {name: 1D np.ndarray} one element per combination
+
+    """
+    if mode not in MODES:
+        raise ValueError("unknown sweep mode: {}".format(mode))
+    names = list(values)
+    if not names:
+        return {}
+    if mode == 'list':
+        lengths = {len(v) for v in values.values()}
+        if len(lengths) > 1:
+            raise ValueError("parameters of a 'list' sweep must have the same number of values")
+        columns = [list(v) for v in values.values()]
+    else:
+        combinations = list(itertools.product(*values.values()))
+        columns = [[c[i] for c in combinations] for i in range(len(names))]
+    return {name: _column(column) for name, column in zip(names, columns)}
+
+
+def _column(values):
+    # object columns keep mixed or non-numeric values as they were given
+    array = np.asarray(values)
+    if array.dtype.kind not in 'biuf' or array.ndim != 1:
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+    return array
+
+
+@protector
+def sweep(function, values, fixed=None, mode='grid', vectorized=False, workers=DEFAULT['sweep_workers'],
+          batch_size=DEFAULT['sweep_batch_size'], progress=None):
+    """
+    run a function on all the combinations of some parameter values and gather
+    the results
+
+    Points are spread over a pool of threads, made of the calling thread's
+    worker and the free workers of the scheduler (see Scheduler.reserve); the
+    other arguments are shared by all the points without copy. A vectorized function is called once per
+    batch of points, with each swept parameter given as a 1D array (one element
+    per point), and must return one result per point: a list, or an array
+    stacked along its first axis. The sweep fails with the first point which
+    fails, the points not started are dropped
+
+    Parameters
+    ----------
+    function: function
+        model function of a module, streamed functions are consumed
+    values: dict or str
+        {name: list of values}, or a text read by parse_values (its single
+        values are added to fixed)
+    fixed: dict, optional
+        arguments given to every point
+    mode: {'grid', 'list'}, default='grid'
+        see sweep_points
+    vectorized: bool, default=False
+    workers: int, default=DEFAULT['sweep_workers']
+        maximum number of points running at the same time, 0 for the number of
+        cores; limited by the free workers of the scheduler
+    batch_size: int, default=DEFAULT['sweep_batch_size']
+        maximum number of points of a vectorized call
+    progress: function, optional
+        called with the fraction of points done, the sweep is cancelled if it
+        raises an exception
+
+    Return
+    ------
+    result: pd.DataFrame or np.ndarray
+        see gather_results
+
+    """
+    fixed = dict(fixed or {})
+    if isinstance(values, str):
+        values, text_fixed = parse_values(values)
+        fixed.update(text_fixed)
+    points = sweep_points(values, mode)
+    count = len(next(iter(points.values()))) if points else 1
+    workers = workers or os.cpu_count()
+
+    cancelled = threading.Event()
+    if getattr(function, 'remote', False):
+        # remote points are dropped by their worker when the sweep is cancelled
+        fixed['interrupted'] = cancelled.is_set
+
+    if vectorized:
+        size = max(1, min(batch_size, math.ceil(count / workers)))
+        tasks = [(start, min(start + size, count)) for start in range(0, count, size)]
+
+        def run(start, stop):
+            batch = {name: column[start:stop] for name, column in points.items()}
+            output = _consume(function(**fixed, **batch))
+            if isinstance(output, Exception):
+                return output
+            if len(output) != stop - start:
+                raise ValueError("a vectorized function must return one result per point")
+            return list(output)
+    else:
+        tasks = [(i, i + 1) for i in range(count)]
+
+        def run(start, stop):
+            # numpy scalars are given as python values
+            point = {name: column[start] for name, column in points.items()}
+            point = {name: v.item() if isinstance(v, np.generic) else v for name, v in point.items()}
+            return [_consume(function(**fixed, **point))]
+
+    results = [None] * count
+    done = 0
+    # the calling thread waits for the points, its worker runs one of them
+    reserved = SCHEDULER.reserve(min(workers, len(tasks)) - 1)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1 + reserved)
+    futures = {}
+    try:
+        futures.update({executor.submit(run, start, stop): start for start, stop in tasks})
+        for future in concurrent.futures.as_completed(futures):
+            start = futures[future]
+            output = future.result()
+            if isinstance(output, Exception):
+                raise SweepError("{0}: [{1}] {2}".format(_describe(points, start), type(output).__name__, output))
+            for i, result in enumerate(output):
+                if isinstance(result, Exception):
+                    raise SweepError("{0}: [{1}] {2}".format(_describe(points, start + i),
+                                                             type(result).__name__, result))
+                results[start + i] = result
+            done += len(output)
+            if progress is not None:
+                progress(done / count)
+    finally:
+        cancelled.set()
+        # points not started are dropped (shutdown(cancel_futures=True) needs python 3.9),
+        # the reserved workers are given back once the running points are done
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        SCHEDULER.unreserve(reserved)
+    return gather_results(results, points, [len(v) for v in values.values()] if mode == 'grid' else None)
+
+
+def _consume(output):
+    if inspect.isgenerator(output):
+        return consume(output)
+    return output
+
+
+def _describe(points, i):
+    return ", ".join("{0}={1}".format(name, column[i]) for name, column in points.items()) or "sweep"
+
+
+def gather_results(results, points, grid=None):
+    """
+    gather the results of the points of a sweep
+
+    - tables (and series) give one tidy DataFrame: their rows one after the
+      other, preceded by the parameter columns of their point
+    - arrays of the same shape are stacked, along the parameter axes of a grid
+      sweep (shape = number of values of each parameter + shape of a result)
+    - numbers and strings give a DataFrame of the parameters and a 'value'
+      column, other results an object 'result' column
+
+    Parameters
+    ----------
+    results: list
+        result of each point
+    points: dict
+        {name: 1D np.ndarray} parameters of each point, see sweep_points
+    grid: list of int, optional
+        number of values of each parameter of a grid sweep
+
+    Return
+    ------
+    result: pd.DataFrame or np.ndarray
+
+    """
+    frames = [_frame(r) for r in results]
+    if results and all(f is not None for f in frames):
+        lengths = np.array([len(f) for f in frames])
+        gathered = pd.concat(frames, ignore_index=True)
+        # parameter columns are repeated once per row of their point
+        for position, (name, column) in enumerate(points.items()):
+            gathered.insert(position, name, np.repeat(column, lengths), allow_duplicates=True)
+        return gathered
+
+    if results and all(isinstance(r, np.ndarray) for r in results) and len({r.shape for r in results}) == 1:
+        stacked = np.stack(results)
+        if grid:
+            stacked = stacked.reshape(tuple(grid) + results[0].shape)
+        return stacked
+
+    gathered = pd.DataFrame({name: column for name, column in points.items()})
+    if all(isinstance(r, (int, float, complex, str, bool, np.generic)) for r in results):
+        gathered['value'] = results
+    else:
+        column = np.empty(len(results), dtype=object)
+        column[:] = results
+        gathered['result'] = column
+    return gathered
+
+
+def _frame(result):
+    if isinstance(result, pd.DataFrame):
+        return result
+    if isinstance(result, pd.Series):
+        return result.to_frame(result.name if result.name is not None else 'value')
+    if isinstance(result, ChunkedFrame):
+        return result.to_frame()
+    if isinstance(result, ColumnarFrame):
+        return result.to_pandas()
+    return None
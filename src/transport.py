@@ -0,0 +1,239 @@
+from multiprocessing import shared_memory
+import weakref
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+import numpy as np
+import pandas as pd
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:  # windows, shared memory is freed with its last handle
+    resource_tracker = None
+
+
+# shared memory handles of results received from other processes {node name: [SharedMemory]}
+SHARED_BUFFERS = {}
+
+# shared memory blocks allocated by this process with empty() {address: SharedMemory}
+_OWNED = {}
+
+# dtypes whose buffer can be placed in shared memory
+_SHAREABLE_KINDS = 'biufcmM'
+
+
+def empty(shape, dtype=float):
+    """
+    allocate an array directly in shared memory; sharing it (or any of its
+    views) with share() does not copy any data
+
+    Parameters
+    ----------
+    shape: int or tuple of int
+    dtype: data-type, default=float
+
+    Return
+    ------
+    array: np.ndarray
+
+    """
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape)) * dtype.itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    mapping = _mapping(shm)
+    array = np.ndarray(shape, dtype, buffer=mapping)
+    address = array.__array_interface__['data'][0]
+    _OWNED[address] = shm
+    # a block that was never shared is freed with its last view
+    weakref.finalize(mapping, _free, address, shm)
+    return array
+
+
+def _free(address, shm):
+    if _OWNED.get(address) is shm:
+        del _OWNED[address]
+        shm.close()
+        shm.unlink()
+
+
+def _mapping(shm):
+    """
+    take the memory mapping out of a SharedMemory handle, so that the mapping
+    lives as long as the arrays built on it instead of being unmapped when
+    the handle is closed (which would leave dangling arrays)
+    """
+    mapping = shm._mmap
+    shm._buf.release()
+    shm._buf, shm._mmap = None, None
+    return mapping
+
+
+def share(result):
+    """
+    place the numeric buffers of a result in shared memory; the returned
+    descriptor is small and picklable, it is rebuilt without copy by attach()
+    in the receiving process. The ownership of the shared memory is given to
+    the receiver (which must release it), the sender must only keep its
+    handles until the receiver attached them
+
+    Parameters
+    ----------
+    result: pd.DataFrame, pd.Series, np.ndarray, ChunkedFrame, ColumnarFrame, dict, list,
+        tuple or any picklable object
+
+    Return
+    ------
+    descriptor: tuple
+    handles: list of SharedMemory
+
+    """
+    handles = {}
+    descriptor = _share(result, handles)
+    # the blocks of empty() are handed over with the descriptor
+    for address in [address for address, shm in _OWNED.items() if shm.name in handles]:
+        del _OWNED[address]
+    for shm in handles.values():
+        if resource_tracker is not None:
+            # the receiver is in charge of unlinking the memory
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    return descriptor, list(handles.values())
+
+
+def _share(result, handles):
+    if isinstance(result, np.ndarray) and result.dtype.kind in _SHAREABLE_KINDS:
+        return _share_array(result, handles)
+    elif isinstance(result, pd.DataFrame):
+        columns = [_share_pandas(result.iloc[:, i], handles) for i in range(result.shape[1])]
+        return ('frame', columns, result.columns, _share_pandas(result.index, handles))
+    elif isinstance(result, pd.Series):
+        return ('series', _share_pandas(result, handles), result.name, _share_pandas(result.index, handles))
+    elif isinstance(result, ChunkedFrame):
+        return ('chunked', [_share(chunk, handles) for chunk in result.chunks])
+    elif isinstance(result, ColumnarFrame):
+        index = None if result._index is None else _share(result._index, handles)
+        return ('columnar', {name: _share(result.column(name), handles) for name in result.columns}, index)
+    elif isinstance(result, dict):
+        return ('dict', {k: _share(v, handles) for k, v in result.items()})
+    elif isinstance(result, (list, tuple)):
+        return (type(result).__name__, [_share(v, handles) for v in result])
+    return ('object', result)
+
+
+def _share_pandas(values, handles):
+    if isinstance(values, pd.RangeIndex) or not isinstance(values.dtype, np.dtype) \
+            or values.dtype.kind not in _SHAREABLE_KINDS:
+        return ('object', values if isinstance(values, pd.Index) else values.array)
+    spec = _share_array(values.to_numpy(), handles)
+    return ('index', spec, values.name) if isinstance(values, pd.Index) else spec
+
+
+def _share_array(array, handles):
+    root = array
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    address = root.__array_interface__['data'][0]
+
+    if address in _OWNED:
+        # already in shared memory, only describe the view (other views of the block share its handle)
+        shm = _OWNED[address]
+        offset = array.__array_interface__['data'][0] - address
+        strides = array.strides
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+        offset, strides = 0, None
+    handles[shm.name] = shm
+    return ('ndarray', shm.name, array.dtype, array.shape, offset, strides)
+
+
+def attach(descriptor):
+    """
+    rebuild a result from a descriptor created by share(), numeric buffers
+    are views on the shared memory (no copy)
+
+    Parameters
+    ----------
+    descriptor: tuple
+
+    Return
+    ------
+    result: pd.DataFrame, pd.Series, np.ndarray, ChunkedFrame or any object
+    handles: list of SharedMemory
+        must be kept as long as the result is used, see register()
+
+    """
+    handles = {}
+    return _attach(descriptor, handles), [shm for shm, mapping in handles.values()]
+
+
+def _attach(descriptor, handles):
+    kind = descriptor[0]
+    if kind == 'ndarray':
+        _, name, dtype, shape, offset, strides = descriptor
+        if name not in handles:
+            shm = shared_memory.SharedMemory(name=name)
+            handles[name] = (shm, _mapping(shm))
+        return np.ndarray(shape, dtype, buffer=handles[name][1], offset=offset, strides=strides)
+    elif kind == 'index':
+        return pd.Index(_attach(descriptor[1], handles), name=descriptor[2], copy=False)
+    elif kind == 'series':
+        _, values, name, index = descriptor
+        return pd.Series(_attach(values, handles), index=_attach(index, handles), name=name, copy=False)
+    elif kind == 'frame':
+        _, columns, names, index = descriptor
+        data = {i: _attach(column, handles) for i, column in enumerate(columns)}
+        frame = pd.DataFrame(data, index=_attach(index, handles), copy=False)
+        frame.columns = names
+        return frame
+    elif kind == 'chunked':
+        return ChunkedFrame([_attach(chunk, handles) for chunk in descriptor[1]])
+    elif kind == 'columnar':
+        _, columns, index = descriptor
+        return ColumnarFrame({name: _attach(column, handles) for name, column in columns.items()},
+                             None if index is None else _attach(index, handles))
+    elif kind == 'dict':
+        return {k: _attach(v, handles) for k, v in descriptor[1].items()}
+    elif kind in ('list', 'tuple'):
+        values = [_attach(v, handles) for v in descriptor[1]]
+        return values if kind == 'list' else tuple(values)
+    return descriptor[1]
+
+
+def register(name, handles):
+    """
+    tie shared memory handles to a RESULT_STACK entry, previous handles of
+    this entry are released
+
+    Parameters
+    ----------
+    name: str
+        node name
+    handles: list of SharedMemory
+
+    """
+    release(name)
+    if handles:
+        SHARED_BUFFERS[name] = handles
+
+
+def rename(name, new_name):
+    if name in SHARED_BUFFERS:
+        SHARED_BUFFERS[new_name] = SHARED_BUFFERS.pop(name)
+
+
+def release(name):
+    """
+    free the shared memory of a RESULT_STACK entry; the memory is given back
+    to the system once the last view on it is deleted
+
+    Parameters
+    ----------
+    name: str
+        node name
+
+    """
+    for shm in SHARED_BUFFERS.pop(name, []):
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        shm.close()
@@ -0,0 +1,312 @@
+from PyQt5 import QtWidgets, QtCore, QtGui
+import collections
+import numpy as np
+from src.presenter.utils import Runner
+
+
+def downsample(array, factor, band=256):
+    """
+    reduce a 2D array by averaging factor x factor blocks, the array is read
+    by bands of rows so that memory-mapped data is never loaded entirely.
+    The last row and column of blocks average the remaining pixels, and
+    complex values are reduced to their modulus (as displayed)
+
+    Parameters
+    ----------
+    array: 2D np.ndarray
+    factor: int
+    band: int, default=256
+        number of output rows computed at once
+
+    Return
+    ------
+    result: 2D np.ndarray of float32
+        of shape ceil(array.shape / factor)
+
+    """
+    height, width = array.shape
+    h, w = -(-height // factor), -(-width // factor)
+    result = np.empty((h, w), dtype=np.float32)
+    columns = np.arange(0, width, factor)
+    column_counts = np.diff(np.append(columns, width))
+    for y in range(0, h, band):
+        rows = min(band, h - y)
+        block = array[y*factor:(y+rows)*factor]
+        block = np.abs(block) if np.iscomplexobj(block) else block
+        block = np.asarray(block, dtype=np.float32)
+        starts = np.arange(0, block.shape[0], factor)
+        row_counts = np.diff(np.append(starts, block.shape[0]))
+        sums = np.add.reduceat(np.add.reduceat(block, starts, axis=0), columns, axis=1)
+        result[y:y+rows] = sums / np.outer(row_counts, column_counts)
+    return result
+
+
+class ArrayPyramid():
+    """
+    multi-resolution representation of a 2D array or of a 3D volume (z, y, x)
+    level k is reduced by a factor 2**k; coarse levels are averaged once by
+    build(), finer levels are read from the full-resolution data (e.g. a
+    memory map) by strided slicing when a tile is requested
+
+    Parameters
+    ----------
+    array: 2D or 3D np.ndarray
+    tile_size: int, default=256
+    max_pixels: int, default=2**22
+        maximum size of the finest averaged level
+
+    """
+    def __init__(self, array, tile_size=256, max_pixels=2**22):
+        self.array = array[None] if array.ndim == 2 else array
+        self.tile_size = tile_size
+        self.max_pixels = max_pixels
+        self.depth, self.height, self.width = self.array.shape
+        self.n_levels = 1
+        while max(self.height, self.width) / 2**(self.n_levels-1) > tile_size:
+            self.n_levels += 1
+        self.range = None
+        self._levels = {}  # (z, level) -> averaged 2D array
+
+    def isBuilt(self, z):
+        return (z, self.n_levels - 1) in self._levels or self.n_levels == 1
+
+    def build(self, z=0):
+        """
+        compute the averaged levels of a slice, this is expensive and meant
+        to be called in a worker
+        """
+        level = 1
+        while self.height * self.width / 4**level > self.max_pixels:
+            level += 1
+        if level >= self.n_levels:
+            return
+        data = downsample(self.array[z], 2**level)
+        self._levels[(z, level)] = data
+        for k in range(level+1, self.n_levels):
+            data = downsample(data, 2)
+            self._levels[(z, k)] = data
+
+        if self.range is None:
+            finite = data[np.isfinite(data)]
+            self.range = tuple(np.percentile(finite, [1, 99])) if finite.size else (0, 1)
+
+    def levelShape(self, k):
+        return -(-self.height // 2**k), -(-self.width // 2**k)
+
+    def tile(self, z, k, ty, tx):
+        """
+        get a tile of a level
+
+        Parameters
+        ----------
+        z: int
+            slice index
+        k: int
+            level index
+        ty, tx: int
+            tile position in the level
+
+        Return
+        ------
+        tile: 2D np.ndarray
+
+        """
+        size = self.tile_size
+        if (z, k) in self._levels:
+            return self._levels[(z, k)][ty*size:(ty+1)*size, tx*size:(tx+1)*size]
+        f = 2**k
+        return self.array[z, ty*size*f:(ty+1)*size*f:f, tx*size*f:(tx+1)*size*f:f]
+
+    def toImage(self, tile):
+        """
+        convert a tile into an 8-bit grayscale image
+        """
+        if self.range is None:
+            self.range = (float(np.nanmin(tile)), float(np.nanmax(tile))) if tile.size else (0, 1)
+        vmin, vmax = self.range
+        scale = 255 / (vmax - vmin) if vmax > vmin else 1
+        data = np.nan_to_num((np.abs(tile) if np.iscomplexobj(tile) else tile).astype(np.float32))
+        data = np.ascontiguousarray(np.clip((data - vmin) * scale, 0, 255).astype(np.uint8))
+        h, w = data.shape
+        return QtGui.QImage(data.data, w, h, w, QtGui.QImage.Format_Grayscale8).copy()
+
+
+class QArrayCanvas(QtWidgets.QWidget):
+    """
+    widget painting only the visible tiles of an ArrayPyramid at the level
+    matching the current zoom; wheel to zoom, drag to pan
+
+    Parameters
+    ----------
+    pyramid: ArrayPyramid
+    cache_size: int, default=512
+        maximum number of rendered tiles kept in memory
+
+    """
+    def __init__(self, pyramid, cache_size=512):
+        super().__init__()
+        self.pyramid = pyramid
+        self.z = 0
+        self.zoom = None  # screen pixels per data pixel
+        self.offset = QtCore.QPointF(0, 0)  # data position of the top-left corner
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._drag = None
+        self.setMinimumSize(100, 100)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+
+    def fit(self):
+        self.zoom = min(self.width() / self.pyramid.width, self.height() / self.pyramid.height)
+        self.offset = QtCore.QPointF(0, 0)
+        self.update()
+
+    def setSlice(self, z):
+        self.z = z
+        self.update()
+
+    def clearCache(self, z=None):
+        for key in [k for k in self._cache if z is None or k[0] == z]:
+            del self._cache[key]
+        self.update()
+
+    def image(self, z, k, ty, tx):
+        key = (z, k, ty, tx, (z, k) in self.pyramid._levels)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._cache[key] = self.pyramid.toImage(self.pyramid.tile(z, k, ty, tx))
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return self._cache[key]
+
+    def paintEvent(self, event):
+        if self.zoom is None:
+            self.zoom = min(self.width() / self.pyramid.width, self.height() / self.pyramid.height)
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, self.zoom < 1)
+
+        # level whose resolution matches the zoom
+        k = int(np.clip(np.floor(np.log2(1 / self.zoom)), 0, self.pyramid.n_levels - 1))
+        f, size = 2**k, self.pyramid.tile_size
+        span = size * f  # data pixels covered by a tile
+
+        # visible tiles only
+        x0, y0 = self.offset.x(), self.offset.y()
+        x1, y1 = x0 + self.width() / self.zoom, y0 + self.height() / self.zoom
+        rows, cols = self.pyramid.levelShape(k)
+        for ty in range(max(int(y0 // span), 0), min(int(y1 // span) + 1, -(-rows // size))):
+            for tx in range(max(int(x0 // span), 0), min(int(x1 // span) + 1, -(-cols // size))):
+                image = self.image(self.z, k, ty, tx)
+                target = QtCore.QRectF((tx*span - x0) * self.zoom, (ty*span - y0) * self.zoom,
+                                       image.width() * f * self.zoom, image.height() * f * self.zoom)
+                painter.drawImage(target, image)
+        painter.end()
+
+    def wheelEvent(self, event):
+        # zoom around the cursor
+        position = QtCore.QPointF(event.pos())
+        data_position = self.offset + position / self.zoom
+        self.zoom *= 1.25 if event.angleDelta().y() > 0 else 0.8
+        self.offset = data_position - position / self.zoom
+        self.update()
+        event.accept()
+
+    def mousePressEvent(self, event):
+        self._drag = QtCore.QPointF(event.pos())
+
+    def mouseMoveEvent(self, event):
+        if self._drag is not None:
+            position = QtCore.QPointF(event.pos())
+            self.offset -= (position - self._drag) / self.zoom
+            self._drag = position
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit()
+
+
+class QArrayViewer(QtWidgets.QWidget):
+    """
+    tiled viewer of 2D arrays and 3D volumes, with a slider to browse slices
+
+    Parameters
+    ----------
+    pyramid: ArrayPyramid
+
+    """
+    sliceBuilt = QtCore.pyqtSignal(int)
+
+    def __init__(self, pyramid):
+        super().__init__()
+        self.pyramid = pyramid
+        self.canvas = QArrayCanvas(pyramid)
+        self.maximize = QtWidgets.QPushButton('⛶')
+        self.maximize.setMaximumSize(30, 30)
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.slider.setRange(0, pyramid.depth - 1)
+        self.slider.valueChanged.connect(self.setSlice)
+        self.slider.setVisible(pyramid.depth > 1)
+        self.sliceBuilt.connect(self.canvas.clearCache)
+        self._building = {}  # {slice: Runner}
+
+        header = QtWidgets.QHBoxLayout()
+        header.addWidget(self.slider)
+        header.addStretch(0)
+        header.addWidget(self.maximize)
+        vbox = QtWidgets.QVBoxLayout()
+        vbox.setContentsMargins(0, 0, 0, 0)
+        vbox.addLayout(header)
+        vbox.addWidget(self.canvas)
+        self.setLayout(vbox)
+
+    def setPyramid(self, pyramid):
+        """
+        show another array in the same viewer, the view is kept if the shapes match
+        """
+        same_shape = (pyramid.width, pyramid.height) == (self.pyramid.width, self.pyramid.height)
+        self.pyramid = pyramid
+        self.canvas.pyramid = pyramid
+        # the slices of the previous array are not needed anymore
+        for runner in self._building.values():
+            runner.cancel()
+        self._building = {}
+        if not same_shape:
+            self.canvas.zoom = None
+            self.canvas.offset = QtCore.QPointF(0, 0)
+        self.slider.blockSignals(True)
+        self.slider.setRange(0, pyramid.depth - 1)
+        self.slider.blockSignals(False)
+        self.slider.setVisible(pyramid.depth > 1)
+        self.canvas.clearCache()
+        self.setSlice(self.slider.value())
+
+    def release(self):
+        """
+        free the rendered tiles, they are rendered again when painted
+        """
+        self.canvas.clearCache()
+
+    def setSlice(self, z):
+        """
+        show a slice, its averaged levels are built in background if needed
+        (tiles are read by strided slicing in the meantime)
+        """
+        self.canvas.setSlice(z)
+        if not self.pyramid.isBuilt(z) and z not in self._building:
+            # hidden batch run of the scheduler, node runs go first
+            runner = Runner(self.pyramid.build, z)
+            runner.batch = True
+            runner.finished.connect(self.buildFinished)
+            self._building[z] = runner
+            runner.start()
+
+    def buildFinished(self):
+        runner = self.sender()
+        for z, building in list(self._building.items()):
+            if building is runner:
+                del self._building[z]
+                if not isinstance(runner.out, Exception):
+                    self.sliceBuilt.emit(z)
@@ -1,26 +1,132 @@
 from PyQt5 import QtWidgets, QtCore, QtGui, uic
-from src.view import ui, utils
+from src.view import arrayview, minimap, plot, stats, ui, utils
 from src import DESIGN_DIR, DEFAULT, RESULT_STACK
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame, column_values
+from src import transport
+from src.history import History, HistoryEntry, snapshot
 import copy
 import os
+import numpy as np
 import pandas as pd
 
 
 class QCustomGraphicsNode(ui.QGraphicsNode):
+    # emitted each time a parameter widget is edited by the user
+    parametersEdited = QtCore.pyqtSignal()
+    # emitted when the result is opened in a dock
+    dockOpened = QtCore.pyqtSignal()
+    # emitted when the shown result or the stylesheet changes
+    changed = QtCore.pyqtSignal()
 
     def __init__(self, *args, **kwargs):
         super(QCustomGraphicsNode, self).__init__(*args, **kwargs)
 
+        # live mode toggle, runs the node while its parameters are edited
+        self.live = QtWidgets.QToolButton()
+        self.live.setText('live')
+        self.live.setCheckable(True)
+        self.live.setToolTip('run the node while its parameters are edited')
+        self.live.hide()
+        self.horizontalLayout.addWidget(self.live)
+
         # add parameters widget
-        uifile_path = os.path.join(DESIGN_DIR, 'ui', self.type+'.ui')
+        uifile_path = self.graph._view.uiFiles.get(self.type, os.path.join(DESIGN_DIR, 'ui', self.type+'.ui'))
         if not os.path.isfile(uifile_path):
             print("{} does not exists".format(uifile_path))
         else:
             self.setParametersWidget(uifile_path)
+            self.watchParameters()
         self.button.clicked.emit()
 
         # initialize
         self._font = None
+        self._stream = None
+        self.connectSignal('sizeChanged', self.fitFontSize)
+
+        # viewport state, see setInViewport
+        self.inViewport = True
+        self._pendingResult = None
+        self._releaseTimer = QtCore.QTimer(self)
+        self._releaseTimer.setSingleShot(True)
+        self._releaseTimer.setInterval(DEFAULT['offscreen_release_delay'])
+        self._releaseTimer.timeout.connect(self.releaseResult)
+
+    def watchParameters(self):
+        """
+        emit parametersEdited when the value of a parameter widget changes
+        """
+        def edited(*args):
+            self.emitSignal('parametersEdited')
+
+        for widget in self.parameterWidgets().values():
+            if isinstance(widget, QtWidgets.QAbstractButton):
+                widget.toggled.connect(edited)
+            elif isinstance(widget, QtWidgets.QComboBox):
+                widget.currentIndexChanged.connect(edited)
+            elif isinstance(widget, (QtWidgets.QLineEdit, QtWidgets.QPlainTextEdit)):
+                widget.textChanged.connect(edited)
+            elif hasattr(widget, 'valueChanged'):
+                widget.valueChanged.connect(edited)
+
+    def parameterWidgets(self):
+        """
+        get the named parameter widgets which hold a value
+
+        Return
+        ------
+        widgets: dict
+            {object name: widget}
+        """
+        widgets = {}
+        for widget in self.parameters.findChildren(QtWidgets.QWidget):
+            if not widget.objectName() or widget.objectName().startswith('qt_'):
+                continue
+            if isinstance(widget, (QtWidgets.QAbstractSpinBox, QtWidgets.QAbstractSlider, QtWidgets.QComboBox,
+                                   QtWidgets.QPlainTextEdit)):
+                widgets[widget.objectName()] = widget
+            elif isinstance(widget, QtWidgets.QLineEdit) and \
+                    not isinstance(widget.parent(), QtWidgets.QAbstractSpinBox):
+                widgets[widget.objectName()] = widget
+            elif isinstance(widget, QtWidgets.QAbstractButton) and widget.isCheckable():
+                widgets[widget.objectName()] = widget
+        return widgets
+
+    def parameterValues(self):
+        """
+        get the values of the parameter widgets {object name: value}
+        """
+        values = {}
+        for name, widget in self.parameterWidgets().items():
+            if isinstance(widget, QtWidgets.QAbstractButton):
+                values[name] = widget.isChecked()
+            elif isinstance(widget, QtWidgets.QComboBox):
+                values[name] = widget.currentText()
+            elif isinstance(widget, QtWidgets.QPlainTextEdit):
+                values[name] = widget.toPlainText()
+            elif isinstance(widget, QtWidgets.QLineEdit):
+                values[name] = widget.text()
+            elif hasattr(widget, 'value'):
+                values[name] = widget.value()
+        return values
+
+    def setParameterValues(self, values):
+        """
+        set the values of the parameter widgets {object name: value}
+        """
+        widgets = self.parameterWidgets()
+        for name, value in values.items():
+            widget = widgets.get(name)
+            if isinstance(widget, QtWidgets.QAbstractButton):
+                widget.setChecked(value)
+            elif isinstance(widget, QtWidgets.QComboBox):
+                widget.setCurrentText(value)
+            elif isinstance(widget, QtWidgets.QPlainTextEdit):
+                widget.setPlainText(value)
+            elif isinstance(widget, QtWidgets.QLineEdit):
+                widget.setText(value)
+            elif widget is not None:
+                widget.setValue(value)
 
     def updateHeight(self, force=False):
         """
@@ -39,35 +145,161 @@ class QCustomGraphicsNode(ui.QGraphicsNode):
                 self.resize(width, self.minimumHeight()+1)
             self.resize(self.width(), 0)
 
-    def updateResult(self, result):
+    def updateResult(self, result, summary=None):
         """
-        This function create widget from result and show it. The created widget
-        depends on the result type
+        This function show a result. The widget depends on the result type, the
+        current widget is reused (and its data replaced) when it has the right type
 
         Parameters
         ----------
         result: any type data
+        summary: utils.ResultSummary, optional
+            view data prepared in the worker, computed here if not provided
 
         """
-        # create the output widget depending on output type
+        if not self.inViewport:
+            # the widget is built when the node is scrolled into view
+            self._pendingResult = (result, summary)
+            self._stream = None
+            return
+        self._pendingResult = None
+        if isinstance(result, ChunkedFrame) and result is self._stream:
+            # streamed result is already shown, only insert the last rows
+            self.result.table.model().sourceModel().fetchRows()
+            if summary is not None:
+                # statistics of the complete stream
+                self.result.summary = summary
+                self.result.statsBar.setStatistics(result, summary.columnStats, summary.refineStats)
+            self.leftfoot.setText("{0} x {1}    ({2} {3})".format(*result.shape, *utils.getMemoryUsage(result)))
+            self.emitSignal('changed')
+            return
+        self._stream = None
+
+        # create or update the output widget depending on output type
         if isinstance(result, Exception):
-            new_widget = QtWidgets.QWidget()
+            kind, compute = 'error', self.computeEmptyWidget
+        elif isinstance(result, (int, float, str, bool)):
+            kind, compute = 'text', self.computeTextWidget
+        elif isinstance(result, (pd.DataFrame, ChunkedFrame, ColumnarFrame)):
+            kind, compute = 'table', self.computeTableWidget
+        elif utils.isImage(result):
+            kind, compute = 'array', self.computeArrayWidget
+        elif utils.isSignal(result):
+            kind, compute = 'plot', self.computePlotWidget
+        else:
+            kind, compute = 'text', self.computeTextWidget
+            result = "{0} {1}".format(type(result).__name__, getattr(result, 'shape', ''))
+        reuse = self.result if getattr(self.result, 'kind', None) == kind else None
+        new_widget = compute(result, summary=summary, widget=reuse)
+
+        if kind == 'error':
             self.updateHeight(True)
             self.hideResult.hide()
         else:
-            if isinstance(result, (int, float, str, bool)):
-                new_widget = self.computeTextWidget(result)
-            elif isinstance(result, pd.DataFrame):
-                new_widget = self.computeTableWidget(result)
             self.hideResult.show()
 
         # replace current output widget with the new one
-        self.widget.layout().setStretchFactor(self.result, 10)
-        self.widget.layout().replaceWidget(self.result, new_widget)
-        self.result.deleteLater()
-        self.result = new_widget
+        if new_widget is not self.result:
+            new_widget.kind = kind
+            if hasattr(new_widget, 'maximize'):
+                new_widget.maximize.clicked.connect(lambda: self.emitSignal('dockOpened'))
+            self.widget.layout().setStretchFactor(self.result, 10)
+            self.widget.layout().replaceWidget(self.result, new_widget)
+            self.result.deleteLater()
+            self.result = new_widget
+        self.result.released = False
+        self.emitSignal('changed')
+
+    def setInViewport(self, visible):
+        """
+        This function pause the node while it is outside the viewport: it is
+        not repainted, the results it receives are shown once it is scrolled
+        into view, and the view data of its result (models, rendered tiles) are
+        released after DEFAULT['offscreen_release_delay'] ms
+
+        Parameters
+        ----------
+        visible: bool
+
+        """
+        if visible == self.inViewport:
+            return
+        self.inViewport = visible
+        self.setUpdatesEnabled(visible)
+        if not visible:
+            self._releaseTimer.start()
+            return
+
+        self._releaseTimer.stop()
+        if self._pendingResult is not None:
+            self.updateResult(*self._pendingResult)
+        elif getattr(self.result, 'released', False):
+            self.restoreResult()
+        self.fitFontSize()
+
+    def releaseResult(self):
+        """
+        This function free the view data of the result widget: table models,
+        cached tiles and plots. They are rebuilt by restoreResult
+        """
+        if self.inViewport:
+            return
+        kind = getattr(self.result, 'kind', None)
+        if kind == 'table':
+            self.result.proxy.setSourceModel(None)
+            self.result.sourceModel = None
+            # the streamed rows are shown again by a new model
+            self._stream = None
+        elif kind in ('array', 'plot'):
+            self.result.release()
+        else:
+            return
+        self.result.released = True
+
+    def restoreResult(self):
+        """
+        This function rebuild the view data freed by releaseResult
+        """
+        self.result.released = False
+        if self.result.kind == 'table':
+            self.result.updateVheader(self.result.Vheader.currentIndex())
+        else:
+            self.result.update()
+
+    def updateStream(self, result):
+        """
+        This function show the rows received so far of a streamed result. The
+        table is created at first call, then rows are appended to its model
 
-    def computeTextWidget(self, data):
+        Parameters
+        ----------
+        result: ChunkedFrame
+            growing result
+
+        """
+        if not self.inViewport:
+            self._pendingResult = (result, None)
+            self._stream = None
+            return
+        if result is not self._stream:
+            self.updateResult(result)
+            self._stream = result
+        self.result.table.model().sourceModel().fetchRows()
+        self.leftfoot.setText("{0} x {1}    (streaming...)".format(*result.shape))
+        self.emitSignal('changed')
+
+    def computeEmptyWidget(self, data, summary=None, widget=None):
+        """
+        This function create the empty widget shown instead of errors
+
+        Return
+        ------
+        widget: QWidget
+
+        """
+        return QtWidgets.QWidget() if widget is None else widget
+
+    def computeTextWidget(self, data, summary=None, widget=None):
         """
         This function create a QLabel widget with resizable font based on the
         widget size
@@ -75,6 +307,10 @@ class QCustomGraphicsNode(ui.QGraphicsNode):
         Parameters
         ----------
         data: float, int, str, bool
+        summary: None
+            unused, for a common signature
+        widget: QLabel, optional
+            text widget to reuse
 
         Return
         ------
@@ -82,7 +318,6 @@ class QCustomGraphicsNode(ui.QGraphicsNode):
 
         """
         default_fontsize = 30
-        min_fontsize = 10
 
         # set font
         if self._font is None:
@@ -90,56 +325,213 @@ class QCustomGraphicsNode(ui.QGraphicsNode):
             self._font.setPointSize(default_fontsize)
 
         # set widget
-        widget = QtWidgets.QLabel(str(data))
-        widget.setAlignment(QtCore.Qt.AlignCenter)
+        if widget is None:
+            widget = QtWidgets.QLabel()
+            widget.setAlignment(QtCore.Qt.AlignCenter)
+        widget.setText(str(data))
         widget.setFont(self._font)
 
-        # update fontsize to fit widget size
+        # font size to text size ratio, used by fitFontSize
         metric = QtGui.QFontMetrics(self._font)
-        ratio = metric.boundingRect(str(data)).size() / self._font.pointSize()
-
-        def fitFontSize():
-            if isinstance(self.result, QtWidgets.QLabel):
-                fontsize = max([min([self.result.width() / ratio.width(),
-                                     self.result.height() / ratio.height()]) - 10, min_fontsize])
-                self._font.setPointSize(fontsize)
-                self.result.setFont(self._font)
-        self.sizeChanged.connect(fitFontSize)
+        widget.ratio = metric.boundingRect(str(data)).size() / self._font.pointSize()
         return widget
 
-    def computeTableWidget(self, data):
+    def fitFontSize(self):
+        """
+        update the font size of a text result to fit the widget size
+        """
+        min_fontsize = 10
+        if not self.inViewport:
+            # fitted when the node is scrolled into view
+            return
+        ratio = getattr(self.result, 'ratio', None)
+        if isinstance(self.result, QtWidgets.QLabel) and ratio is not None and not ratio.isEmpty():
+            fontsize = max([min([self.result.width() / ratio.width(),
+                                 self.result.height() / ratio.height()]) - 10, min_fontsize])
+            self._font.setPointSize(int(fontsize))
+            self.result.setFont(self._font)
+
+    def computeTableWidget(self, data, summary=None, widget=None, footer=True):
         """
         This function create a table widget which can be windowed
 
         Parameters
         ----------
-        data: pd.DataFrame
+        data: pd.DataFrame, ChunkedFrame or ColumnarFrame
+        summary: utils.ResultSummary, optional
+            view data prepared in the worker, computed here if not provided
+        widget: QWidget, optional
+            table widget to reuse, its models are replaced
+        footer: bool, default=True
+            False for the widgets shown in docks, the footer of the node is left unchanged
 
         Return
         ------
         widget: QTableWidget
 
         """
-        widget = uic.loadUi(os.path.join(DESIGN_DIR, 'ui', 'TableWidget.ui'))
-        widget.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
-        widget.Vheader.addItems(['--'] + list(data.columns.astype(str)))
+        if summary is None:
+            summary = utils.prepare_result(data)
+
+        if widget is None:
+            widget = uic.loadUi(os.path.join(DESIGN_DIR, 'ui', 'TableWidget.ui'))
+            widget.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
+            widget.proxy = QtCore.QSortFilterProxyModel(widget)
+            widget.sourceModel = None
+
+            # column statistics above the header, exact statistics replace sampled ones
+            widget.statsBar = stats.QColumnStatsBar(widget.table, self.graph._view.theme.plot_color)
+            widget.layout().insertWidget(widget.layout().indexOf(widget.table), widget.statsBar)
+
+            def statsRefined(data, column_stats):
+                if data is widget.data:
+                    widget.summary.columnStats = column_stats
+                    widget.summary.stats = column_stats.table()
+                    if widget is self.result:
+                        self.leftfoot.setToolTip(widget.summary.stats)
+            widget.statsBar.refined.connect(statsRefined)
+
+            # connections read the data shown by the widget, they are made once
+            def updateVheader(index):
+                data, summary = widget.data, widget.summary
+                if isinstance(data, ChunkedFrame):
+                    model = ui.ChunkedModel(data, summary=summary)
+                elif isinstance(data, ColumnarFrame):
+                    model = ui.ColumnarModel(data, index-1, summary=summary)
+                else:
+                    model = ui.PandasModel(data, index-1, summary=summary)
+                # the previous model is released once replaced in the proxy
+                widget.proxy.setSourceModel(model)
+                widget.sourceModel = model
+                widget.statsBar.setPositions(model._positions)
+                if widget.table.model() is not widget.proxy:
+                    widget.table.setModel(widget.proxy)
+            widget.Vheader.currentIndexChanged.connect(updateVheader)
+            widget.updateVheader = updateVheader
+
+            def openInDock():
+                docked = self.computeTableWidget(widget.data, widget.summary, footer=False)
+                dock = self.graph._view.addWidgetInDock(docked)
+                dock.setWindowTitle(self.name)
+            widget.maximize.clicked.connect(openInDock)
+
+            # plot a numeric column in a dock from the header context menu
+            def plotColumn(position):
+                data = widget.data
+                column = widget.table.horizontalHeader().logicalIndexAt(position)
+                # -1 outside of the sections
+                if column < 0:
+                    return
+                column = widget.sourceModel._positions[column]
+                # the values are read only once the plot is requested
+                dtype = data.dtypes.iloc[column]
+                if not (isinstance(dtype, np.dtype) and dtype.kind in 'biuf' and len(data) > 0):
+                    return
+                menu = QtWidgets.QMenu(widget)
+                menu.addAction('plot column')
+                if menu.exec_(widget.table.horizontalHeader().mapToGlobal(position)) is not None:
+                    if isinstance(data, pd.DataFrame):
+                        values = data.iloc[:, column]
+                    else:
+                        values = column_values(data, column)
+                    dock = self.graph._view.addWidgetInDock(self.computePlotWidget(values, footer=False))
+                    dock.setWindowTitle("{0} [{1}]".format(self.name, widget.summary.headers[column]))
+
+            widget.table.horizontalHeader().setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+            widget.table.horizontalHeader().customContextMenuRequested.connect(plotColumn)
+
+        widget.data, widget.summary = data, summary
+        widget.Vheader.blockSignals(True)
+        widget.Vheader.clear()
+        widget.Vheader.addItems(['--'] + summary.headers)
+        widget.Vheader.blockSignals(False)
+        widget.Vheader.setEnabled(not isinstance(data, ChunkedFrame))
+        widget.updateVheader(0)
+        widget.statsBar.setStatistics(data, summary.columnStats, summary.refineStats)
+
+        if footer:
+            self.leftfoot.setText("{0} x {1}    ({2} {3})".format(*summary.shape, *summary.memory))
+            self.leftfoot.setToolTip(summary.stats or None)
 
-        def updateVheader(index):
-            model = ui.PandasModel(data, index-1)
-            proxyModel = QtCore.QSortFilterProxyModel()
-            proxyModel.setSourceModel(model)
-            widget.table.setModel(proxyModel)
-        widget.Vheader.currentIndexChanged.connect(updateVheader)
-        updateVheader(0)
+        return widget
 
-        def openInDock():
-            widget = self.computeTableWidget(data)
-            dock = self.graph._view.addWidgetInDock(widget)
-            dock.setWindowTitle(self.name)
+    def computeArrayWidget(self, data, summary=None, widget=None, footer=True):
+        """
+        This function create a tiled viewer for 2D arrays and 3D volumes
+        which can be windowed
+
+        Parameters
+        ----------
+        data: np.ndarray
+        summary: utils.ResultSummary, optional
+            view data prepared in the worker (image pyramid), computed here if not provided
+        widget: QArrayViewer, optional
+            viewer to reuse, its pyramid is replaced
+        footer: bool, default=True
+            False for the widgets shown in docks, the footer of the node is left unchanged
+
+        Return
+        ------
+        widget: QArrayViewer
+
+        """
+        if summary is None:
+            summary = utils.prepare_result(data)
 
-        widget.maximize.clicked.connect(openInDock)
-        self.leftfoot.setText("{0} x {1}    ({2} {3})".format(*data.shape, *utils.getMemoryUsage(data)))
+        if widget is None:
+            widget = arrayview.QArrayViewer(summary.pyramid)
 
+            def openInDock():
+                docked = self.computeArrayWidget(widget.data, widget.summary, footer=False)
+                dock = self.graph._view.addWidgetInDock(docked)
+                dock.setWindowTitle(self.name)
+            widget.maximize.clicked.connect(openInDock)
+        else:
+            widget.setPyramid(summary.pyramid)
+
+        widget.data, widget.summary = data, summary
+        if footer:
+            shape = " x ".join(map(str, summary.shape))
+            self.leftfoot.setText("{0}  {1}    ({2} {3})".format(shape, summary.dtypes[0], *summary.memory))
+        return widget
+
+    def computePlotWidget(self, data, summary=None, widget=None, footer=True):
+        """
+        This function create a decimated plot of a signal which can be windowed
+
+        Parameters
+        ----------
+        data: pd.Series or 1D np.ndarray
+        summary: utils.ResultSummary, optional
+            view data prepared in the worker (min/max decimation), computed here if not provided
+        widget: QPlotWidget, optional
+            plot to reuse, its decimation is replaced
+        footer: bool, default=True
+            False for the widgets shown in docks, the footer of the node is left unchanged
+
+        Return
+        ------
+        widget: QPlotWidget
+
+        """
+        if summary is None:
+            summary = utils.prepare_result(data)
+
+        if widget is None:
+            widget = plot.QPlotWidget(summary.decimation, self.graph._view.theme.plot_color)
+
+            def openInDock():
+                docked = self.computePlotWidget(widget.data, widget.summary, footer=False)
+                dock = self.graph._view.addWidgetInDock(docked)
+                dock.setWindowTitle(self.name)
+            widget.maximize.clicked.connect(openInDock)
+        else:
+            widget.setPyramid(summary.decimation)
+
+        widget.data, widget.summary = data, summary
+        if footer:
+            samples = "{} samples".format(summary.shape[0])
+            self.leftfoot.setText("{0}  {1}    ({2} {3})".format(samples, summary.dtypes[0], *summary.memory))
         return widget
 
 
@@ -158,17 +550,24 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
 
     """
     nodeAdded = QtCore.pyqtSignal(QCustomGraphicsNode)
+    # emitted with the node name when the user deletes a branch
+    nodeDeleted = QtCore.pyqtSignal(str)
 
     def __init__(self, mainwin, direction='horizontal'):
         super().__init__()
+        self._sheet = ''
+        self._stale = set()
+        self.horizontalScrollBar().valueChanged.connect(self.updateVisibility)
+        self.verticalScrollBar().valueChanged.connect(self.updateVisibility)
         self._view = mainwin
         self.direction = direction
         self.setWindowState(QtCore.Qt.WindowMaximized)
         self.scene = QtWidgets.QGraphicsScene()
         self.setRenderHint(QtGui.QPainter.Antialiasing)
         self.setScene(self.scene)
+        # the viewport moves when the scene grows or shrinks
+        self.scene.sceneRectChanged.connect(self.updateVisibility)
         self.contextMenuEvent = lambda e: self.openMenu()
-        self.setBackgroundBrush(eval(self._view.theme['background_brush']))
 
         self.installEventFilter(self)
         self.holdShift = False
@@ -177,6 +576,21 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
         self.nodes = {}
         self.settings = {}
         self.focus = None
+        self.history = History()
+        self._dragStart = None
+
+        # smooth zoom (ctrl + wheel) toward a target zoom
+        self.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorUnderMouse)
+        self._zoom = 1
+        self._zoomAnimation = QtCore.QVariantAnimation(self)
+        self._zoomAnimation.setDuration(DEFAULT['zoom_duration'])
+        self._zoomAnimation.setEasingCurve(QtCore.QEasingCurve.OutCubic)
+        self._zoomAnimation.valueChanged.connect(self.applyZoom)
+        self._zoomAnimation.finished.connect(lambda: self.setZooming(False))
+
+        # overview of the graph in the bottom right corner
+        self.minimap = minimap.QMinimap(self)
+        self.minimap.setVisible(DEFAULT['minimap'])
 
     def bind(self, parent, child):
         """
@@ -188,13 +602,13 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
             nodes to visually bind
         """
 
-        link = ui.QGraphicsLink(parent, child, **self._view.theme['arrow'])
+        link = ui.QGraphicsLink(parent, child, **self._view.theme.arrow)
 
-        parent.positionChanged.connect(link.updatePos)
-        parent.sizeChanged.connect(link.updatePos)
-        child.positionChanged.connect(link.updatePos)
-        child.sizeChanged.connect(link.updatePos)
-        child.sizeChanged.emit()
+        parent.connectSignal('positionChanged', link.updatePos)
+        parent.connectSignal('sizeChanged', link.updatePos)
+        child.connectSignal('positionChanged', link.updatePos)
+        child.connectSignal('sizeChanged', link.updatePos)
+        child.emitSignal('sizeChanged')
 
         parent.links.append(link)
         child.links.append(link)
@@ -221,13 +635,119 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
         """
         return [n for n in self.nodes.values() if n.isSelected() and n not in exceptions]
 
+    def setTheme(self, theme, sheet):
+        """
+        apply a theme to the graph: background and links are updated at once,
+        the stylesheet is applied to visible nodes and to the others when they are
+        scrolled into the viewport
+
+        Parameters
+        ----------
+        theme: themes.Theme
+        sheet: str
+            compiled stylesheet
+        """
+        self.setBackgroundBrush(theme.background_brush)
+        for link in {link for node in self.nodes.values() for link in node.links}:
+            link.setArrowStyle(**theme.arrow)
+        if sheet != self._sheet:
+            self._sheet = sheet
+            self._stale = set(self.nodes.values())
+            self.applyPendingStyles()
+
+    def applyPendingStyles(self):
+        """
+        apply the current stylesheet to the visible nodes which do not have it yet
+        """
+        if self._stale:
+            for node in [n for n in self._stale if self.isNodeVisible(n)]:
+                node.setStyleSheet(self._sheet)
+                node.emitSignal('changed')
+                self._stale.discard(node)
+
+    def updateVisibility(self, *args):
+        """
+        pause the nodes outside the viewport and resume the ones scrolled into
+        it (see QCustomGraphicsNode.setInViewport), then apply pending styles
+        """
+        # a hidden window shows no node, but its nodes are not paused
+        if self.isVisible():
+            viewport = self.mapToScene(self.viewport().rect()).boundingRect()
+            for node in list(self.nodes.values()):
+                node.setInViewport(self.isNodeVisible(node, viewport))
+        self.applyPendingStyles()
+
+    def updateNodeVisibility(self, node):
+        if self.isVisible():
+            node.setInViewport(self.isNodeVisible(node))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        corner = self.viewport().geometry().bottomRight()
+        self.minimap.move(corner.x() - self.minimap.width() - 10, corner.y() - self.minimap.height() - 10)
+        self.updateVisibility()
+
+    def wheelEvent(self, event):
+        if event.modifiers() & QtCore.Qt.ControlModifier:
+            self.zoom(1.25 ** (event.angleDelta().y() / 120))
+            event.accept()
+        else:
+            super().wheelEvent(event)
+
+    def zoom(self, factor):
+        """
+        zoom smoothly by a factor, the zoom is kept in DEFAULT['zoom_range']
+
+        Parameters
+        ----------
+        factor: float
+            > 1 to zoom in, < 1 to zoom out
+        """
+        minimum, maximum = DEFAULT['zoom_range']
+        self._zoom = min(max(self._zoom * factor, minimum), maximum)
+        self._zoomAnimation.stop()
+        self._zoomAnimation.setStartValue(float(self.transform().m11()))
+        self._zoomAnimation.setEndValue(float(self._zoom))
+        self.setZooming(True)
+        self._zoomAnimation.start()
+
+    def applyZoom(self, zoom):
+        self.setTransform(QtGui.QTransform.fromScale(zoom, zoom))
+        self.updateVisibility()
+        self.minimap.update()
+
+    def setZooming(self, zooming):
+        """
+        while zooming, the visible nodes are drawn from a pixmap cache scaled with
+        the view instead of repainting their widgets
+        """
+        mode = QtWidgets.QGraphicsItem.ItemCoordinateCache if zooming else QtWidgets.QGraphicsItem.NoCache
+        for node in self.nodes.values():
+            if node.inViewport or not zooming:
+                node._proxy.setCacheMode(mode)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.updateVisibility()
+
+    def isNodeVisible(self, node, viewport=None):
+        """
+        True if a part of the node is inside the viewport (in scene coordinates,
+        computed if not given)
+        """
+        if viewport is None:
+            viewport = self.mapToScene(self.viewport().rect()).boundingRect()
+        try:
+            return node._item.sceneBoundingRect().intersects(viewport)
+        except RuntimeError:
+            # graphic item already deleted (application closing)
+            return False
+
     def eventFilter(self, obj, event):
         """
         manage keyboard shortcut and mouse events on graph view
         """
         if obj == self:
-            if event.type() == QtCore.QEvent.Wheel:
-                return True
             if event.type() == QtCore.QEvent.MouseButtonPress:
                 self.unselectNodes()
             elif event.type() == QtCore.QEvent.KeyPress:
@@ -287,8 +807,8 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
             nodes = []
         else:
             acts = self._view.menu.get('secondary')
-            nodes = [node] + self.getSelectedNodes()
-            nodes = list(set(nodes))
+            # the clicked node is the first parent (left side of joins)
+            nodes = [node] + self.getSelectedNodes(exceptions=[node])
 
         if acts is None:
             return
@@ -297,28 +817,169 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
             type = action.text()
             if type in ["delete", "delete all"]:
                 self.deleteBranch(node)
+            elif type == "export":
+                self._view.exportNodes(nodes)
+            elif type == "export branch":
+                self._view.exportNodes(self.branch(node))
             else:
                 self.addNode(action.text(), nodes)
 
-        menu = utils.menu_from_dict(acts, activation_function=activate)
+        menu = utils.menu_from_dict(acts, activation_function=activate, menu=QtWidgets.QMenu(self))
         pos = QtGui.QCursor.pos()
         self._mouse_position = self.mapToScene(self.mapFromGlobal(pos))
         menu.exec_(QtGui.QCursor.pos())
 
-    def renameNode(self, node):
+    def branch(self, node):
+        """
+        get a node and all its descendants, parents before children
+        """
+        nodes = [node]
+        for n in nodes:
+            nodes += [child for child in n.childs if child not in nodes]
+        return nodes
+
+    def renameNode(self, node, new_name=None):
         # open input dialog
-        new_name, valid = QtWidgets.QInputDialog.getText(self, "user input", "new name",
-                                                         QtWidgets.QLineEdit.Normal, node.type)
-        if valid:
-            new_name = self.getUniqueName(new_name, exception=node.name)
-            self.nodes[new_name] = self.nodes.pop(node.name)
-            node.rename(new_name)
-            if node.name in RESULT_STACK:
-                RESULT_STACK[new_name] = RESULT_STACK.pop(node.name)
+        if new_name is None:
+            new_name, valid = QtWidgets.QInputDialog.getText(self, "user input", "new name",
+                                                             QtWidgets.QLineEdit.Normal, node.type)
+            if not valid:
+                return
+        new_name = self.getUniqueName(new_name, exception=node.name)
+        name = node.name
+        self.setNodeName(node, new_name)
+        self.history.push(HistoryEntry("rename " + name,
+                                       lambda: self.setNodeName(self.nodes[new_name], name),
+                                       lambda: self.setNodeName(self.nodes[name], new_name)))
+
+    def setNodeName(self, node, new_name):
+        name = node.name
+        self.nodes[new_name] = self.nodes.pop(name)
+        node.rename(new_name)
+        if name in RESULT_STACK:
+            RESULT_STACK[new_name] = RESULT_STACK.pop(name)
+        transport.rename(name, new_name)
+
+    def nodeState(self, node):
+        """
+        snapshot of a node, its result is referenced (see history.snapshot)
+
+        Return
+        ------
+        state: dict
+        """
+        state = {'type': node.type,
+                 'parents': [p.name for p in node.parents],
+                 'childs': [c.name for c in node.childs],
+                 'depth': node.depth,
+                 'position': (node.pos().x(), node.pos().y()),
+                 'size': (node.width(), node.height()),
+                 'parameters': node.parameterValues()}
+        if node.name in RESULT_STACK:
+            state['result'] = snapshot(RESULT_STACK[node.name])
+        return state
+
+    def removeBranch(self, parent):
+        """
+        delete a branch (see deleteBranch) and get the snapshots of its nodes
+
+        Return
+        ------
+        states: dict
+            {node name: state}
+        """
+        # nodes whose parents are all deleted are deleted too
+        branch = [parent]
+        for node in branch:
+            for child in node.childs:
+                if child not in branch and all(p in branch for p in child.parents):
+                    branch.append(child)
+        states = {node.name: self.nodeState(node) for node in branch}
+        self._deleteBranch(parent)
+        return states
+
+    def restoreNodes(self, states):
+        """
+        recreate deleted nodes with their parameters and results
+
+        Parameters
+        ----------
+        states: dict
+            {node name: state}, see nodeState
+        """
+        for name, state in sorted(states.items(), key=lambda item: item[1]['depth']):
+            node = self.addNode(state['type'], [self.nodes[p] for p in state['parents']], name=name)
+            node.moveBy(state['position'][0] - node.pos().x(), state['position'][1] - node.pos().y())
+            node.resize(*state['size'])
+            node.setParameterValues(state['parameters'])
+            if 'result' in state:
+                self.setResult(name, state['result'])
+        # links with the children which were not deleted
+        for name, state in states.items():
+            node = self.nodes[name]
+            for child in [self.nodes[c] for c in state['childs'] if c not in states and c in self.nodes]:
+                child.parents.append(node)
+                node.childs.append(child)
+                self.bind(node, child)
+
+    def setResult(self, name, result):
+        """
+        put a result in the result stack and show it in its node
+        """
+        RESULT_STACK[name] = result
+        node = self.nodes.get(name)
+        if node is not None:
+            node.lefthead.setPixmap(self._view._fail if isinstance(result, Exception) else self._view._valid)
+            node.updateResult(result)
+
+    def recordResult(self, name, previous, result, merge=False):
+        """
+        record the replacement of a node result in the history
+
+        Parameters
+        ----------
+        name: str
+            node name
+        previous, result: any type data
+        merge: bool, default=False
+            if True, merge with the previous replacement of the node result (live mode)
+        """
+        previous, result = snapshot(previous), snapshot(result)
+        self.history.push(HistoryEntry("result of " + name,
+                                       lambda: self.setResult(name, previous),
+                                       lambda: self.setResult(name, result),
+                                       [previous, result], ('result', name) if merge else None))
+
+    def recordMove(self, started):
+        """
+        record the nodes moved by a drag in the history
+
+        Parameters
+        ----------
+        started: bool
+            True when the drag starts, False when it ends
+        """
+        positions = {name: (n.pos().x(), n.pos().y()) for name, n in self.nodes.items()}
+        if started:
+            self._dragStart = positions
+            return
+        if self._dragStart is None:
+            return
+        moves = {name: (self._dragStart[name], p) for name, p in positions.items()
+                 if name in self._dragStart and self._dragStart[name] != p}
+        self._dragStart = None
+
+        def move(index):
+            for name, positions in moves.items():
+                node = self.nodes[name]
+                node.moveBy(positions[index][0] - node.pos().x(), positions[index][1] - node.pos().y())
+        if moves:
+            self.history.push(HistoryEntry("move", lambda: move(0), lambda: move(1)))
 
     def deleteBranch(self, parent, childs_only=False):
         """
-        delete node, its children and the associated data recursively
+        delete node, its children and the associated data recursively,
+        the deletion is recorded in the history with the results
 
         Parameters
         ----------
@@ -327,20 +988,31 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
             if True do not delete the parent node else delete parent and children
 
         """
+        name = parent.name
+        states = self.removeBranch(parent)
+        self.history.push(HistoryEntry("delete " + name,
+                                       lambda: self.restoreNodes(states),
+                                       lambda: self.removeBranch(self.nodes[name]),
+                                       [s['result'] for s in states.values() if 'result' in s]))
+        self.nodeDeleted.emit(name)
+
+    def _deleteBranch(self, parent):
         # delete data
         if parent.name in RESULT_STACK:
             del RESULT_STACK[parent.name]
+        transport.release(parent.name)
         # delete children if has no other parent
         for child in parent.childs:
             child.parents.remove(parent)
             if not child.parents:
-                self.deleteBranch(child)
+                self._deleteBranch(child)
         # remove node from parent children
         for p in parent.parents:
             p.childs.remove(parent)
         # delete node and links
         parent.delete()
         del self.nodes[parent.name]
+        self._stale.discard(parent)
 
     def restoreGraph(self, settings):
         """
@@ -355,7 +1027,7 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
         for k, values in settings.items():
             self.addNode(**values)
 
-    def addNode(self, type, parents=None):
+    def addNode(self, type, parents=None, name=None):
         """
         create a node with specified parent nodes
 
@@ -364,6 +1036,12 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
         type: str
             type of node
         parents: list of QCustomGraphicsNode or QCustomGraphicsNode
+        name: str, optional
+            name of the node, by default a unique name is built from its type
+
+        Return
+        ------
+        node: QCustomGraphicsNode
 
         """
         if parents is None:
@@ -374,8 +1052,9 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
         for i, parent in enumerate(parents):
             if isinstance(parent, str):
                 parents[i] = self.nodes[parent]
-        name = self.getUniqueName(type)
+        name = self.getUniqueName(type) if name is None else name
         node = QCustomGraphicsNode(self, type, name, parents)
+        node.setStyleSheet(self._sheet)
         node.addToScene(self.scene)
 
         if not parents:
@@ -392,7 +1071,16 @@ class QCustomGraphicsView(QtWidgets.QGraphicsView):
             y = max_x_parent.pos().y() if not Ys else max(Ys) + DEFAULT['space_between_nodes'][1]
 
         node.moveBy(x, y)
+        node.connectSignal('dragged', self.recordMove)
+        node.connectSignal('moved', lambda: self.updateNodeVisibility(node))
+        self.updateNodeVisibility(node)
         self.nodes[name] = node
         self.settings[name] = {'type': type, 'parents': [p.name for p in parents]}
         self.nodeAdded.emit(node)
+
+        # the snapshot of the node is taken when the addition is undone
+        states = {}
+        self.history.push(HistoryEntry("add " + name,
+                                       lambda: states.update(self.removeBranch(self.nodes[name])),
+                                       lambda: self.restoreNodes(states)))
         return node
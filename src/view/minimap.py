@@ -0,0 +1,129 @@
+import time
+from PyQt5 import QtCore, QtGui, QtWidgets
+from src import DEFAULT
+
+
+class QMinimap(QtWidgets.QWidget):
+    """
+    overview of a graph drawn from cached thumbnails of its nodes, the
+    viewport of the graph is drawn as a rectangle which follows the mouse
+    when the overview is clicked or dragged
+
+    A thumbnail is a downscaled capture of its node, taken again only when the
+    node changes (result, name, style, size or parameters). Captures are spread
+    over several paints within DEFAULT['minimap_render_budget'] ms, nodes not
+    captured yet are drawn as rectangles.
+
+    Parameters
+    ----------
+    graph: QCustomGraphicsView
+
+    """
+    def __init__(self, graph):
+        super().__init__(graph)
+        self.graph = graph
+        self.thumbnails = {}  # {node: QPixmap}
+        self._dirty = set()
+        self._transform = QtGui.QTransform()  # scene to minimap
+        self.setFixedSize(*DEFAULT['minimap_size'])
+        self.setCursor(QtCore.Qt.PointingHandCursor)
+
+        graph.nodeAdded.connect(self.watchNode)
+        for node in graph.nodes.values():
+            self.watchNode(node)
+        graph.horizontalScrollBar().valueChanged.connect(self.update)
+        graph.verticalScrollBar().valueChanged.connect(self.update)
+        graph.scene.sceneRectChanged.connect(self.update)
+
+    def watchNode(self, node):
+        """
+        capture the node again when it changes
+        """
+        for signal in ('changed', 'sizeChanged', 'parametersEdited'):
+            node.connectSignal(signal, lambda: self.invalidate(node))
+        node.nameChanged.connect(lambda name, new_name: self.invalidate(node))
+        node.connectSignal('moved', self.update)
+        self.invalidate(node)
+
+    def invalidate(self, node):
+        self._dirty.add(node)
+        self.update()
+
+    def renderThumbnail(self, node):
+        """
+        capture a node downscaled by DEFAULT['minimap_thumbnail_scale']
+        """
+        pixmap = node.grab()
+        return pixmap.scaled(pixmap.size() * DEFAULT['minimap_thumbnail_scale'],
+                             QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    def updateTransform(self, viewport):
+        # fit the nodes and the viewport in the minimap, with a margin
+        rect = self.graph.scene.itemsBoundingRect().united(viewport)
+        margin = 4
+        scale = min((self.width() - 2 * margin) / max(rect.width(), 1),
+                    (self.height() - 2 * margin) / max(rect.height(), 1))
+        dx = (self.width() - rect.width() * scale) / 2 - rect.left() * scale
+        dy = (self.height() - rect.height() * scale) / 2 - rect.top() * scale
+        self._transform = QtGui.QTransform(scale, 0, 0, scale, dx, dy)
+
+    def paintEvent(self, event):
+        nodes = list(self.graph.nodes.values())
+        # forget deleted nodes
+        if len(self.thumbnails) > len(nodes) or self._dirty.difference(nodes):
+            alive = set(nodes)
+            self.thumbnails = {n: p for n, p in self.thumbnails.items() if n in alive}
+            self._dirty &= alive
+
+        viewport = self.graph.mapToScene(self.graph.viewport().rect()).boundingRect()
+        self.updateTransform(viewport)
+        background = QtGui.QColor(self.palette().color(QtGui.QPalette.Window))
+        background.setAlpha(220)
+        foreground = QtGui.QColor(self.graph._view.theme.arrow.get('color', QtCore.Qt.gray))
+
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), background)
+        painter.setPen(QtGui.QPen(foreground, 0))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        painter.setTransform(self._transform)
+
+        rects = {node: node._item.sceneBoundingRect() for node in nodes}
+        for node, rect in rects.items():
+            for parent in node.parents:
+                if parent in rects:
+                    painter.drawLine(rects[parent].center(), rect.center())
+
+        deadline = time.perf_counter() + DEFAULT['minimap_render_budget'] / 1000
+        for node, rect in rects.items():
+            if node in self._dirty and time.perf_counter() < deadline:
+                self.thumbnails[node] = self.renderThumbnail(node)
+                self._dirty.discard(node)
+            thumbnail = self.thumbnails.get(node)
+            if thumbnail is None:
+                painter.fillRect(rect, foreground)
+            else:
+                painter.drawPixmap(rect, thumbnail, QtCore.QRectF(thumbnail.rect()))
+
+        painter.setPen(QtGui.QPen(foreground, 2 / self._transform.m11()))
+        painter.drawRect(viewport)
+        painter.end()
+
+        # remaining captures are done in the next paints
+        if self._dirty:
+            QtCore.QTimer.singleShot(0, self.update)
+
+    def moveViewport(self, position):
+        """
+        center the graph viewport on a point of the minimap
+        """
+        inverted, invertible = self._transform.inverted()
+        if invertible:
+            self.graph.centerOn(inverted.map(QtCore.QPointF(position)))
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            self.moveViewport(event.pos())
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & QtCore.Qt.LeftButton:
+            self.moveViewport(event.pos())
@@ -0,0 +1,255 @@
+from PyQt5 import QtWidgets, QtCore, QtGui
+import numpy as np
+import pandas as pd
+
+
+class MinMaxPyramid():
+    """
+    min/max decimation of a 1D signal: level L holds the minimum and the
+    maximum of each bin of 2**L samples. Levels from base are computed once
+    with vectorized reductions and cached (coarse levels are derived from finer
+    ones), finer levels are reduced on the fly for the visible bins only
+
+    Parameters
+    ----------
+    y: 1D np.ndarray
+    base: int, default=6
+        finest cached level, it costs 2/2**base of the signal memory
+
+    """
+    def __init__(self, y, base=6):
+        self.y = y
+        self.size = len(y)
+        self.base = base
+        self.top = 0
+        while self.size / 2**self.top > 1:
+            self.top += 1
+        self._levels = {}
+
+    def level(self, L):
+        """
+        get the cached decimation of a level (L >= base)
+
+        Parameters
+        ----------
+        L: int
+            bins contain 2**L samples
+
+        Return
+        ------
+        mins, maxs: 1D np.ndarray
+
+        """
+        if L not in self._levels:
+            if L > self.base:
+                mins, maxs = self.level(L - 1)
+                self._levels[L] = (self._pairs(np.fmin, mins), self._pairs(np.fmax, maxs))
+            else:
+                self._levels[L] = self._reduce(self.y, 2**L)
+        return self._levels[L]
+
+    def bins(self, L, b0, b1):
+        """
+        get the decimation of some bins of a level
+
+        Parameters
+        ----------
+        L: int
+        b0, b1: int
+            first and last (excluded) bins
+
+        Return
+        ------
+        mins, maxs: 1D np.ndarray
+
+        """
+        if L == 0:
+            return self.y[b0:b1], self.y[b0:b1]
+        elif L < self.base:
+            return self._reduce(self.y[b0 * 2**L:b1 * 2**L], 2**L)
+        mins, maxs = self.level(L)
+        return mins[b0:b1], maxs[b0:b1]
+
+    @staticmethod
+    def _pairs(function, values):
+        result = function(values[0:-1:2], values[1::2])
+        if len(values) % 2:
+            result = np.append(result, values[-1])
+        return result
+
+    @staticmethod
+    def _reduce(y, size):
+        # the divisible part is reshaped without copy, the tail is reduced apart
+        n = (len(y) // size) * size
+        main = np.asarray(y[:n]).reshape(-1, size)
+        mins, maxs = np.fmin.reduce(main, axis=1), np.fmax.reduce(main, axis=1)
+        if n < len(y):
+            tail = np.asarray(y[n:])
+            mins, maxs = np.append(mins, np.nanmin(tail)), np.append(maxs, np.nanmax(tail))
+        return mins, maxs
+
+    def prepare(self):
+        """
+        compute all cached levels (meant to be called in a worker)
+        """
+        if self.top >= self.base:
+            self.level(self.top)
+        return self
+
+
+def isSignal(result):
+    """
+    True if result can be plotted as a signal (numeric 1D array or Series)
+    """
+    if isinstance(result, pd.Series):
+        return isinstance(result.dtype, np.dtype) and result.dtype.kind in 'biuf' and len(result) > 0
+    return isinstance(result, np.ndarray) and result.ndim == 1 and result.dtype.kind in 'biuf' and result.size > 0
+
+
+def signalValues(result):
+    """
+    get the 1D array of a signal without copy (when possible)
+    """
+    return result if isinstance(result, np.ndarray) else result.to_numpy()
+
+
+class QPlotCanvas(QtWidgets.QWidget):
+    """
+    widget plotting a signal from its min/max decimation: only the bins
+    visible in the viewport are drawn (one vertical segment per pixel),
+    and the plot is redrawn only when the viewport changes
+
+    Parameters
+    ----------
+    pyramid: MinMaxPyramid
+    color: QColor, optional
+
+    """
+    def __init__(self, pyramid, color=QtGui.QColor(77, 120, 204)):
+        super().__init__()
+        self.pyramid = pyramid
+        self.pen = QtGui.QPen(color, 1)
+        self.x0, self.x1 = 0, pyramid.size  # visible samples
+        self._pixmap = None
+        self._key = None
+        self._drag = None
+        self.setMinimumSize(100, 80)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+
+    def setRange(self, x0, x1):
+        span = max(min(x1 - x0, self.pyramid.size), 2)
+        x0 = min(max(x0, 0), self.pyramid.size - span)
+        self.x0, self.x1 = x0, x0 + span
+        self.update()
+
+    def polygon(self, width, height):
+        """
+        compute the plot envelope of the visible samples in pixel coordinates
+        """
+        x0, x1 = int(np.floor(self.x0)), int(np.ceil(self.x1))
+        per_pixel = (self.x1 - self.x0) / width
+        L = int(np.floor(np.log2(per_pixel))) if per_pixel >= 2 else 0
+        b0, b1 = x0 >> L, min((x1 >> L) + 1, -(-self.pyramid.size // 2**L))
+        mins, maxs = self.pyramid.bins(L, b0, b1)
+        lo, hi = np.asarray(mins, dtype=float), np.asarray(maxs, dtype=float)
+        xs = (np.arange(b0, b1) * 2**L + 2**(L-1) * (L > 0) - self.x0) * width / (self.x1 - self.x0)
+
+        ymin, ymax = np.nanmin(lo), np.nanmax(hi)
+        if not np.isfinite(ymin) or ymin == ymax:
+            ymin, ymax = (ymin - 1, ymax + 1) if np.isfinite(ymin) else (0, 1)
+        scale = (height - 1) / (ymax - ymin)
+        top, bottom = (ymax - hi) * scale, (ymax - lo) * scale
+        if L == 0:
+            points = np.stack([xs, top], axis=1)
+        else:
+            # upper envelope left to right, lower envelope right to left
+            points = np.concatenate([np.stack([xs, top], axis=1), np.stack([xs, bottom], axis=1)[::-1]])
+        points = points[np.isfinite(points).all(axis=1)]
+        return QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in points]), L == 0, (ymin, ymax)
+
+    def paintEvent(self, event):
+        key = (self.x0, self.x1, self.width(), self.height())
+        if key != self._key:
+            self._pixmap = QtGui.QPixmap(self.size())
+            self._pixmap.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(self._pixmap)
+            painter.setPen(self.pen)
+            painter.setBrush(self.pen.color())
+            polygon, raw, (ymin, ymax) = self.polygon(self.width(), self.height())
+            if raw:
+                painter.drawPolyline(polygon)
+            else:
+                painter.drawPolygon(polygon)
+            painter.setPen(self.palette().color(QtGui.QPalette.Text))
+            painter.drawText(self.rect(), QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft, "{:.4g}".format(ymax))
+            painter.drawText(self.rect(), QtCore.Qt.AlignBottom | QtCore.Qt.AlignLeft, "{:.4g}".format(ymin))
+            painter.drawText(self.rect(), QtCore.Qt.AlignBottom | QtCore.Qt.AlignRight,
+                             "[{0:.0f}, {1:.0f}]".format(self.x0, self.x1))
+            painter.end()
+            self._key = key
+        painter = QtGui.QPainter(self)
+        painter.drawPixmap(0, 0, self._pixmap)
+        painter.end()
+
+    def wheelEvent(self, event):
+        # zoom around the cursor
+        center = self.x0 + event.pos().x() / self.width() * (self.x1 - self.x0)
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        self.setRange(center - (center - self.x0) * factor, center + (self.x1 - center) * factor)
+        event.accept()
+
+    def mousePressEvent(self, event):
+        self._drag = event.pos().x()
+
+    def mouseMoveEvent(self, event):
+        if self._drag is not None:
+            shift = (self._drag - event.pos().x()) / self.width() * (self.x1 - self.x0)
+            self._drag = event.pos().x()
+            self.setRange(self.x0 + shift, self.x1 + shift)
+
+    def mouseReleaseEvent(self, event):
+        self._drag = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.setRange(0, self.pyramid.size)
+
+
+class QPlotWidget(QtWidgets.QWidget):
+    """
+    decimated plot of a signal which can be windowed
+
+    Parameters
+    ----------
+    pyramid: MinMaxPyramid
+    color: QColor, optional
+
+    """
+    def __init__(self, pyramid, color=QtGui.QColor(77, 120, 204)):
+        super().__init__()
+        self.canvas = QPlotCanvas(pyramid, color)
+        self.maximize = QtWidgets.QPushButton('⛶')
+        self.maximize.setMaximumSize(30, 30)
+
+        header = QtWidgets.QHBoxLayout()
+        header.addStretch(0)
+        header.addWidget(self.maximize)
+        vbox = QtWidgets.QVBoxLayout()
+        vbox.setContentsMargins(0, 0, 0, 0)
+        vbox.addLayout(header)
+        vbox.addWidget(self.canvas)
+        self.setLayout(vbox)
+
+    def release(self):
+        """
+        free the rendered plot, it is drawn again when painted
+        """
+        self.canvas._pixmap = None
+        self.canvas._key = None
+
+    def setPyramid(self, pyramid):
+        """
+        plot another signal in the same widget
+        """
+        self.canvas.pyramid = pyramid
+        self.canvas._key = None
+        self.canvas.setRange(0, pyramid.size)
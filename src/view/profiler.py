@@ -0,0 +1,137 @@
+import collections
+import time
+from src import DEFAULT
+
+
+class SignalProfiler():
+    """
+    instrumentation of the signals emitted by QViewWidget (positionChanged, sizeChanged, ...)
+    it counts emissions and time spent in connected slots per signal and per node,
+    and records re-entrant cascades (a signal emitted again while one of its own slots is running)
+
+    Parameters
+    ----------
+    enabled: bool, default=DEFAULT['profile_signals']
+        if False, signals are emitted and connected without any wrapping (no overhead)
+
+    """
+    def __init__(self, enabled=DEFAULT.get('profile_signals', False)):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """
+        clear all recorded statistics
+        """
+        self.emissions = collections.Counter()  # (node, signal) -> number of emissions
+        self.emission_time = collections.Counter()  # (node, signal) -> inclusive time in s
+        self.slot_calls = collections.Counter()  # (node, signal, slot) -> number of calls
+        self.slot_time = collections.Counter()  # (node, signal, slot) -> time in s
+        self.cascades = collections.Counter()  # chain of emissions/slots -> occurrences
+        self._stack = []
+
+    @staticmethod
+    def nodeName(node):
+        return getattr(node, 'name', None) or type(node).__name__
+
+    @staticmethod
+    def slotName(slot):
+        name = getattr(slot, '__qualname__', None) or repr(slot)
+        return name.replace('.<locals>', '')
+
+    def emit(self, node, signal_name, *args):
+        """
+        emit node.<signal_name>(*args) and record the emission
+
+        Parameters
+        ----------
+        node: QWidget
+        signal_name: str
+        *args: signal arguments
+
+        """
+        signal = getattr(node, signal_name)
+        if not self.enabled:
+            return signal.emit(*args)
+
+        key = (self.nodeName(node), signal_name)
+        label = "{0}.{1}".format(*key)
+        self.emissions[key] += 1
+        if label in self._stack:
+            chain = self._stack[self._stack.index(label):] + [label]
+            self.cascades[" > ".join(chain)] += 1
+
+        self._stack.append(label)
+        start = time.perf_counter()
+        try:
+            signal.emit(*args)
+        finally:
+            self.emission_time[key] += time.perf_counter() - start
+            self._stack.pop()
+
+    def connect(self, node, signal_name, slot):
+        """
+        connect slot to node.<signal_name>, timing each call if profiling is enabled
+
+        Parameters
+        ----------
+        node: QWidget
+        signal_name: str
+        slot: function
+
+        Return
+        ------
+        connection: QMetaObject.Connection
+            can be used to disconnect the slot
+
+        """
+        signal = getattr(node, signal_name)
+        if not self.enabled:
+            return signal.connect(slot)
+
+        slot_name = self.slotName(slot)
+
+        def timed(*args):
+            key = (self.nodeName(node), signal_name, slot_name)
+            self._stack.append(slot_name)
+            start = time.perf_counter()
+            try:
+                return slot(*args)
+            finally:
+                self.slot_time[key] += time.perf_counter() - start
+                self.slot_calls[key] += 1
+                self._stack.pop()
+        return signal.connect(timed)
+
+    def report(self, n=10):
+        """
+        build a text report of the top offenders
+
+        Parameters
+        ----------
+        n: int, default=10
+            number of lines per section
+
+        Return
+        ------
+        report: str
+
+        """
+        lines = ["--- slots by total time ---"]
+        for (node, signal, slot), t in self.slot_time.most_common(n):
+            calls = self.slot_calls[(node, signal, slot)]
+            lines.append("{0:>10.2f} ms  {1:>7} calls  {2}.{3} -> {4}".format(t*1000, calls, node, signal, slot))
+
+        lines.append("--- signals by emissions ---")
+        for (node, signal), count in self.emissions.most_common(n):
+            t = self.emission_time[(node, signal)]
+            lines.append("{0:>7} emits  {1:>10.2f} ms  {2}.{3}".format(count, t*1000, node, signal))
+
+        lines.append("--- re-entrant cascades ---")
+        for chain, count in self.cascades.most_common(n):
+            lines.append("{0:>7} x  {1}".format(count, chain))
+        return "\n".join(lines)
+
+
+# application-wide profiler used by every QViewWidget
+PROFILER = SignalProfiler()
@@ -0,0 +1,315 @@
+import argparse
+import gzip
+import json
+import os
+import statistics
+import time
+from PyQt5 import QtCore, QtWidgets
+from src import DEFAULT
+
+
+SESSION_VERSION = 1
+
+
+class SessionRecorder():
+    """
+    record the graph-level actions of a user: nodes added, deleted, renamed,
+    moved, selected, parameter edits, runs, docks opened, undo and redo. Each
+    action is stored with its time since the start of the recording, the
+    nodes existing at the start are recorded as added at time 0
+
+    Parameters
+    ----------
+    view: View
+
+    """
+    def __init__(self, view):
+        self._view = view
+        self.graph = view.graph
+        self.actions = []
+        self.recording = True
+        self._start = time.perf_counter()
+        self._values = {}  # last recorded parameter values {node name: {widget: value}}
+        self._dragStart = None
+
+        nodes = sorted(self.graph.nodes.values(), key=lambda n: n.depth)
+        for node in nodes:
+            self.watchNode(node)
+            self.recordAdd(node, t=0)
+        self.graph.nodeAdded.connect(self.nodeAdded)
+        self.graph.nodeDeleted.connect(lambda name: self.record('delete', name))
+        view.undoAction.triggered.connect(lambda: self.record('undo'))
+        view.redoAction.triggered.connect(lambda: self.record('redo'))
+        view.runRequested.connect(lambda nodes: self.record('run', [n.name for n in nodes]))
+
+    def stop(self):
+        self.recording = False
+
+    def record(self, action, *args, t=None):
+        """
+        add an action to the session, actions done by the history (undo/redo)
+        are part of the undo/redo action and are not recorded
+        """
+        if self.recording and not self.graph.history.replaying:
+            t = time.perf_counter() - self._start if t is None else t
+            self.actions.append([round(t, 3), action, *args])
+
+    def nodeAdded(self, node):
+        self.watchNode(node)
+        self.recordAdd(node)
+
+    def recordAdd(self, node, t=None):
+        self._values[node.name] = node.parameterValues()
+        self.record('add', node.type, [p.name for p in node.parents], node.name,
+                    [node.pos().x(), node.pos().y()], self._values[node.name], t=t)
+
+    def watchNode(self, node):
+        """
+        connect the recorder to the widgets of a node
+        """
+        node.connectSignal('parametersEdited', lambda: self.recordParameters(node))
+        node.connectSignal('dragged', self.recordMove)
+        node.connectSignal('dockOpened', lambda: self.record('dock', node.name))
+        node.nameChanged.connect(lambda name, new_name: self.recordRename(name, new_name))
+        node.selected.toggled.connect(lambda checked: self.record('select', node.name, checked))
+        node.live.toggled.connect(lambda checked: self.record('live', node.name, checked))
+        if hasattr(node.parameters, 'apply'):
+            node.parameters.apply.clicked.connect(lambda: self.record('apply', node.name))
+
+    def recordParameters(self, node):
+        # only the edited values are stored
+        values = node.parameterValues()
+        previous = self._values.get(node.name, {})
+        edited = {k: v for k, v in values.items() if previous.get(k) != v}
+        self._values[node.name] = values
+        if edited:
+            self.record('parameters', node.name, edited)
+
+    def recordRename(self, name, new_name):
+        self._values[new_name] = self._values.pop(name, {})
+        self.record('rename', name, new_name)
+
+    def recordMove(self, started):
+        positions = {name: [n.pos().x(), n.pos().y()] for name, n in self.graph.nodes.items()}
+        if started:
+            self._dragStart = positions
+        elif self._dragStart is not None:
+            moves = {name: p for name, p in positions.items() if self._dragStart.get(name, p) != p}
+            self._dragStart = None
+            if moves:
+                self.record('move', moves)
+
+    def save(self, path):
+        """
+        write the session in a gzip-compressed json file
+        """
+        session = {'version': SESSION_VERSION, 'actions': self.actions}
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(session, f, separators=(',', ':'))
+
+
+def load_session(path):
+    """
+    read a session file written by SessionRecorder.save
+
+    Return
+    ------
+    actions: list of [time, action, *args]
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        session = json.load(f)
+    if session.get('version') != SESSION_VERSION:
+        raise ValueError("unsupported session version: {}".format(session.get('version')))
+    return session['actions']
+
+
+class SessionReplayer():
+    """
+    replay a recorded session on a View driven by a Presenter, and measure
+    the latency of each action
+
+    With a speed, actions are dispatched at their recorded times (scaled), so
+    that debounced edits and runs cancelled by a new action behave as recorded;
+    the latency of an action is then measured until the graph is idle or the
+    next action starts. Without speed, each action starts once the previous one
+    is settled.
+
+    Parameters
+    ----------
+    view: View
+    speed: float or None, default=1
+        replay speed relative to the recording, None to chain the actions
+    timeout: float, default=60
+        maximum time to wait for the graph to be idle, in s
+
+    """
+    def __init__(self, view, speed=1, timeout=60):
+        self._view = view
+        self.graph = view.graph
+        self.speed = speed
+        self.timeout = timeout
+        self.results = []
+
+    def isIdle(self):
+        """
+        True when no run is queued, running or pending (live mode) in any node
+        """
+        for node in self.graph.nodes.values():
+            # runners leave the node once their result is shown
+            if getattr(node, '_runners', None):
+                return False
+            if getattr(node, '_pending', None) is not None:
+                return False
+            for timer in (getattr(node, '_preview_timer', None), getattr(node, '_full_timer', None)):
+                if timer is not None and timer.isActive():
+                    return False
+        return True
+
+    def wait(self, deadline, idle=False):
+        """
+        process events until a time (perf_counter), or until the graph is idle
+
+        Return
+        ------
+        idle: bool
+            True if the graph became idle before the deadline
+        """
+        while True:
+            QtWidgets.QApplication.processEvents(QtCore.QEventLoop.AllEvents, 5)
+            if idle and self.isIdle():
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(0.001)
+
+    def replay(self, actions):
+        """
+        replay actions and measure them
+
+        Parameters
+        ----------
+        actions: list of [time, action, *args]
+
+        Return
+        ------
+        results: list of dict
+            {'action', 'args', 'blocking': time in the action call (GUI freeze),
+             'latency': time until settled, 'settled': False if interrupted by the next action,
+             'error': message if the action failed}, times in ms
+        """
+        self.results = []
+        start = time.perf_counter()
+        for i, (t, action, *args) in enumerate(actions):
+            result = {'action': action, 'args': args, 'error': None}
+            t0 = time.perf_counter()
+            try:
+                getattr(self, 'do_' + action)(*args)
+            except Exception as e:
+                result['error'] = "[{0}] {1}".format(type(e).__name__, e)
+            t1 = time.perf_counter()
+
+            # time available before the next action
+            if self.speed and i + 1 < len(actions):
+                deadline = start + actions[i + 1][0] / self.speed
+            else:
+                deadline = t1 + self.timeout
+            result['settled'] = self.wait(max(deadline, t1), idle=True)
+            result['blocking'] = (t1 - t0) * 1000
+            result['latency'] = (time.perf_counter() - t0) * 1000
+            self.results.append(result)
+            if self.speed and i + 1 < len(actions):
+                self.wait(deadline)
+        self.wait(time.perf_counter() + self.timeout, idle=True)
+        return self.results
+
+    def report(self):
+        """
+        build a text report: each action, then statistics by kind of action
+        """
+        lines = ["--- actions ---"]
+        for i, r in enumerate(self.results):
+            target = " ".join(str(a) for a in r['args'][:3] if isinstance(a, str))
+            lines.append("{0:>5} {1:<11} {2:<24} {3:>10.1f} ms {4:>10.1f} ms blocking{5}{6}".format(
+                i, r['action'], target, r['latency'], r['blocking'],
+                "" if r['settled'] else "  (interrupted)", "  " + r['error'] if r['error'] else ""))
+
+        lines.append("--- by action: count, mean, max latency, max blocking ---")
+        for action in sorted({r['action'] for r in self.results}):
+            latencies = [r['latency'] for r in self.results if r['action'] == action]
+            blocking = [r['blocking'] for r in self.results if r['action'] == action]
+            lines.append("{0:<11} {1:>5} {2:>10.1f} ms {3:>10.1f} ms {4:>10.1f} ms".format(
+                action, len(latencies), statistics.mean(latencies), max(latencies), max(blocking)))
+        return "\n".join(lines)
+
+    # ------------------------------- ACTIONS ---------------------------------#
+    def do_add(self, type, parents, name, position, values):
+        node = self.graph.addNode(type, list(parents), name=name)
+        node.moveBy(position[0] - node.pos().x(), position[1] - node.pos().y())
+        node.setParameterValues(values)
+
+    def do_delete(self, name):
+        self.graph.deleteBranch(self.graph.nodes[name])
+
+    def do_rename(self, name, new_name):
+        self.graph.renameNode(self.graph.nodes[name], new_name)
+
+    def do_move(self, positions):
+        for name, (x, y) in positions.items():
+            node = self.graph.nodes[name]
+            node.moveBy(x - node.pos().x(), y - node.pos().y())
+
+    def do_select(self, name, checked):
+        self.graph.nodes[name].selected.setChecked(checked)
+
+    def do_live(self, name, checked):
+        self.graph.nodes[name].live.setChecked(checked)
+
+    def do_parameters(self, name, values):
+        self.graph.nodes[name].setParameterValues(values)
+
+    def do_apply(self, name):
+        self.graph.nodes[name].parameters.apply.click()
+
+    def do_run(self, names):
+        self._view.runRequested.emit([self.graph.nodes[name] for name in names])
+
+    def do_dock(self, name):
+        self.graph.nodes[name].result.maximize.click()
+
+    def do_undo(self):
+        self._view.undoAction.trigger()
+
+    def do_redo(self):
+        self._view.redoAction.trigger()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replay a recorded session and report the latency of each action")
+    parser.add_argument('session', help="session file")
+    parser.add_argument('--speed', type=float, default=1,
+                        help="replay speed relative to the recording, 0 to chain the actions (default: 1)")
+    parser.add_argument('--timeout', type=float, default=60, help="maximum wait for a run, in s (default: 60)")
+    parser.add_argument('--use-cache', action='store_true', help="reuse the results of the on-disk cache")
+    args = parser.parse_args()
+
+    # headless unless a platform is given
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # runs are measured, not read from the result cache
+    DEFAULT['cache_enabled'] = args.use_cache
+    app = QtWidgets.QApplication([])
+    from src.model.model import Model
+    from src.presenter.presenter import Presenter
+    from src.view.view import View
+
+    view = View()
+    view.show()
+    Presenter(view, Model())
+    replayer = SessionReplayer(view, args.speed or None, args.timeout)
+    replayer.replay(load_session(args.session))
+    print(replayer.report())
+    view.close()
+    app.processEvents()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+from PyQt5 import QtWidgets, QtCore, QtGui
+import numpy as np
+import pandas as pd
+from src import DEFAULT
+from src.columnar import column_values
+from src.presenter.utils import Runner
+
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def estimate_distinct(values, k=1024, population=None):
+    """
+    estimate the number of distinct values with a k-minimum-values sketch of
+    their hashes, the count is exact below k distinct values. For a sample of
+    a larger population, the count is extrapolated from the values seen once
+    and twice (bias-corrected Chao1 estimator)
+
+    Parameters
+    ----------
+    values: 1D np.ndarray
+    k: int, default=1024
+    population: int, optional
+        number of values the sample was drawn from
+
+    Return
+    ------
+    distinct: int
+
+    """
+    if not len(values):
+        return 0
+    hashes = pd.util.hash_array(values)
+    if population is not None and population > len(hashes):
+        counts = pd.Series(hashes).value_counts().to_numpy()
+        once, twice = np.count_nonzero(counts == 1), np.count_nonzero(counts == 2)
+        return int(min(len(counts) + once * (once - 1) / (2 * (twice + 1)), population))
+
+    # only the smallest hashes are sorted, the threshold grows until k of them are distinct
+    fraction = 4 * k / len(hashes)
+    while True:
+        threshold = np.uint64(2**64 - 1) if fraction >= 1 else np.uint64(fraction * 2**64)
+        smallest = np.sort(pd.unique(hashes[hashes <= threshold]))
+        if len(smallest) >= k:
+            return int((k - 1) * 2**64 / float(smallest[k - 1]))
+        if fraction >= 1:
+            return len(smallest)
+        fraction *= 4
+
+
+def describe_column(values, bins, population=None):
+    """
+    compute the statistics of a column with vectorized passes
+
+    Parameters
+    ----------
+    values: 1D np.ndarray
+    bins: int
+        number of bins of the histogram
+    population: int, optional
+        length of the column if values is a sample of it
+
+    Return
+    ------
+    stats: dict
+        {'count', 'nulls', 'distinct', 'min', 'max', 'mean', 'quantiles', 'histogram'},
+        the last four are None for the non-numeric columns
+
+    """
+    kind = values.dtype.kind
+    if kind in 'f':
+        nulls = np.isnan(values)
+    elif kind in 'mM':
+        nulls = np.isnat(values)
+    elif kind in 'biu':
+        nulls = None
+    else:
+        nulls = pd.isna(values)
+    valid = values if nulls is None or not nulls.any() else values[~nulls]
+    population = None if population is None else population * len(valid) // max(len(values), 1)
+    stats = {'count': len(valid), 'nulls': len(values) - len(valid),
+             'distinct': estimate_distinct(valid, population=population),
+             'min': None, 'max': None, 'mean': None, 'quantiles': None, 'histogram': None}
+    if kind not in 'biufmM' or not len(valid):
+        return stats
+
+    # datetimes and timedeltas are summarized as integers then converted back
+    numbers = valid.view('i8') if kind in 'mM' else valid.astype(np.int8) if kind == 'b' else valid
+    low, high = numbers.min(), numbers.max()
+    quantiles = np.quantile(numbers, QUANTILES)
+    mean = numbers.mean(dtype=np.float64)
+    if kind in 'mM':
+        convert = lambda x: np.array(int(round(x)), dtype='i8').view(valid.dtype)[()]  # noqa: E731
+        low, high, mean = convert(low), convert(high), convert(mean)
+        quantiles = [convert(q) for q in quantiles]
+    stats.update({'min': low, 'max': high, 'mean': mean, 'quantiles': dict(zip(QUANTILES, quantiles)),
+                  'histogram': np.histogram(numbers, bins=bins)[0]})
+    return stats
+
+
+def formatValue(value):
+    if isinstance(value, (float, np.floating)):
+        return "{:.6g}".format(value)
+    if isinstance(value, (int, np.integer)):
+        return "{:,}".format(int(value))
+    return str(value)
+
+
+class ColumnStatistics():
+    """
+    statistics of the columns of a table: null count, distinct count estimate,
+    min, max, mean, quantiles, and a fixed-bin histogram of the numeric and
+    datetime columns. Each column is summarized by a few vectorized passes
+
+    Tables longer than sample_size are summarized on a random sample of their
+    rows (sampled is then True); counts and histograms are scaled to the whole
+    table. Memory-mapped tables are only read by the sample.
+
+    Parameters
+    ----------
+    result: pd.DataFrame, ChunkedFrame or ColumnarFrame
+    sample_size: int or None, default=DEFAULT['stats_sample_size']
+        None to summarize all the rows
+    bins: int, default=DEFAULT['stats_bins']
+
+    """
+    def __init__(self, result, sample_size=DEFAULT['stats_sample_size'], bins=DEFAULT['stats_bins']):
+        self.rows = len(result)
+        self.bins = bins
+        self.headers = [str(c) for c in result.columns]
+        self.sampled = sample_size is not None and self.rows > sample_size
+        self.sample_size = sample_size if self.sampled else self.rows
+        rows = None
+        if self.sampled:
+            rng = np.random.default_rng(0)
+            rows = np.sort(rng.choice(self.rows, sample_size, replace=False))
+
+        self.columns = []
+        for position in range(len(self.headers)):
+            values = column_values(result, position, rows)
+            stats = describe_column(values, bins, self.rows if self.sampled else None)
+            if self.sampled:
+                scale = self.rows / len(rows)
+                stats['count'] = int(round(stats['count'] * scale))
+                stats['nulls'] = self.rows - stats['count']
+                if stats['histogram'] is not None:
+                    stats['histogram'] = np.round(stats['histogram'] * scale).astype(np.int64)
+            self.columns.append(stats)
+
+    def text(self, position):
+        """
+        describe the statistics of a column
+        """
+        stats = self.columns[position]
+        approx = "≈ " if self.sampled else ""
+        lines = [self.headers[position],
+                 "count    {0}{1}".format(approx, formatValue(stats['count'])),
+                 "nulls    {0}{1}".format(approx, formatValue(stats['nulls'])),
+                 "distinct ≈ {0}".format(formatValue(stats['distinct']))]
+        if stats['min'] is not None:
+            lines += ["min      {}".format(formatValue(stats['min'])),
+                      "max      {}".format(formatValue(stats['max'])),
+                      "mean     {}".format(formatValue(stats['mean']))]
+            lines += ["q{0:<7g} {1}".format(q * 100, formatValue(v)) for q, v in stats['quantiles'].items()]
+        if self.sampled:
+            lines.append("(on a sample of {} rows)".format(formatValue(self.sample_size)))
+        return "\n".join(lines)
+
+    def table(self, max_rows=20):
+        """
+        summary of all the columns as text
+        """
+        frame = pd.DataFrame({'count': [s['count'] for s in self.columns],
+                              'nulls': [s['nulls'] for s in self.columns],
+                              'distinct': [s['distinct'] for s in self.columns],
+                              'mean': [s['mean'] for s in self.columns],
+                              'min': [s['min'] for s in self.columns],
+                              'max': [s['max'] for s in self.columns]}, index=self.headers)
+        return frame.to_string(max_rows=max_rows)
+
+
+class QColumnStatsBar(QtWidgets.QWidget):
+    """
+    bar shown above the horizontal header of a table view: histogram of each
+    numeric column (distinct count of the others) aligned with the header
+    sections, the share of nulls is drawn below; the tooltip of a column
+    gives its statistics
+
+    Sampled statistics are replaced by exact ones computed in background, see
+    setStatistics
+
+    Parameters
+    ----------
+    table: QTableView
+    color: QColor, optional
+
+    """
+    refined = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, table, color=QtGui.QColor(77, 120, 204)):
+        super().__init__()
+        self.table = table
+        self.header = table.horizontalHeader()
+        self.color = color
+        self.stats = None
+        self.positions = []  # data column of each table column
+        self._data = None
+        self._refinement = None
+        self.setFixedHeight(32)
+        self.header.sectionResized.connect(self.update)
+        self.header.sectionMoved.connect(self.update)
+        self.header.geometriesChanged.connect(self.update)
+        table.horizontalScrollBar().valueChanged.connect(self.update)
+        self.refined.connect(self.applyRefined)
+
+    def setStatistics(self, data, stats, refine=True):
+        """
+        show the statistics of a table, sampled statistics are computed again
+        on all the rows in background when refine is True
+
+        Parameters
+        ----------
+        data: pd.DataFrame, ChunkedFrame or ColumnarFrame
+        stats: ColumnStatistics
+        refine: bool, default=True
+
+        """
+        self._data, self.stats = data, stats
+        self.update()
+        if self._refinement is not None:
+            # the previous table is not shown anymore
+            self._refinement.cancel()
+            self._refinement = None
+        if stats is not None and stats.sampled and refine:
+            # hidden batch run of the scheduler, node runs go first
+            self._refinement = Runner(ColumnStatistics, data, sample_size=None, bins=stats.bins)
+            self._refinement.batch = True
+            self._refinement.finished.connect(self.refinementFinished)
+            self._refinement.start()
+
+    def refinementFinished(self):
+        runner = self.sender()
+        if runner is not self._refinement:
+            return
+        self._refinement = None
+        if isinstance(runner.out, ColumnStatistics):
+            self.refined.emit(self._data, runner.out)
+
+    def applyRefined(self, data, stats):
+        # the table may show another result since the refinement started
+        if data is self._data:
+            self.stats = stats
+            self.update()
+
+    def setPositions(self, positions):
+        self.positions = list(positions)
+        self.update()
+
+    def sections(self):
+        """
+        yield the table column, the data column and the x range of each visible section
+        """
+        offset = self.table.verticalHeader().width() + self.table.frameWidth()
+        for visual in range(self.header.count()):
+            logical = self.header.logicalIndex(visual)
+            if self.header.isSectionHidden(logical) or logical >= len(self.positions):
+                continue
+            x = self.header.sectionViewportPosition(logical)
+            width = self.header.sectionSize(logical)
+            if x + width > 0 and x < self.header.width():
+                yield logical, self.positions[logical], offset + x, width
+
+    def paintEvent(self, event):
+        if self.stats is None:
+            return
+        painter = QtGui.QPainter(self)
+        offset = self.table.verticalHeader().width() + self.table.frameWidth()
+        painter.setClipRect(offset, 0, self.width() - offset, self.height())
+        height = self.height() - 4
+        for _, position, x, width in self.sections():
+            if position >= len(self.stats.columns):
+                continue
+            stats = self.stats.columns[position]
+            histogram = stats['histogram']
+            if histogram is not None and histogram.max() > 0:
+                step = (width - 4) / len(histogram)
+                heights = histogram / histogram.max() * (height - 2)
+                for i, h in enumerate(heights):
+                    painter.fillRect(QtCore.QRectF(x + 2 + i * step, height - h, max(step - 1, 1), h), self.color)
+            else:
+                painter.setPen(self.palette().color(QtGui.QPalette.WindowText))
+                text = "{} distinct".format(formatValue(stats['distinct']))
+                painter.drawText(QtCore.QRectF(x + 2, 0, width - 4, height), QtCore.Qt.AlignCenter,
+                                 painter.fontMetrics().elidedText(text, QtCore.Qt.ElideRight, int(width) - 4))
+            if stats['nulls'] and self.stats.rows:
+                share = stats['nulls'] / self.stats.rows
+                painter.fillRect(QtCore.QRectF(x + 2, height + 1, (width - 4) * share, 3), QtCore.Qt.red)
+
+    def event(self, event):
+        if event.type() == QtCore.QEvent.ToolTip:
+            for _, position, x, width in self.sections():
+                if x <= event.pos().x() < x + width and self.stats is not None:
+                    QtWidgets.QToolTip.showText(event.globalPos(), self.stats.text(position), self)
+                    return True
+            QtWidgets.QToolTip.hideText()
+            return True
+        return super().event(event)
@@ -0,0 +1,119 @@
+from PyQt5 import QtCore, QtGui
+from src import DESIGN_DIR
+import functools
+import json
+import os
+import re
+
+
+_COLOR = re.compile(r"\s*(?:(?:QtGui\.)?QColor|rgba?)\(([^()]*)\)\s*")
+_BRUSH = re.compile(r"\s*(?:QtGui\.)?QBrush\((.*?\))\s*(?:,\s*(?:QtCore\.)?Qt\.(\w+)\s*)?\)\s*")
+
+
+def parse_color(text):
+    """
+    parse a theme colour without eval
+
+    Parameters
+    ----------
+    text: str
+        "QtGui.QColor(77, 120, 204)", "rgba(77, 120, 204, 255)", "#4d78cc" or a colour name
+
+    Return
+    ------
+    color: QColor
+
+    """
+    match = _COLOR.fullmatch(text)
+    if match is not None:
+        return QtGui.QColor(*[int(v) for v in match.group(1).split(',')])
+    color = QtGui.QColor(text.strip())
+    if not color.isValid():
+        raise ValueError("invalid colour: {}".format(text))
+    return color
+
+
+def parse_brush(text):
+    """
+    parse a theme brush without eval
+
+    Parameters
+    ----------
+    text: str
+        "QtGui.QBrush(QtGui.QColor(0, 0, 0, 10), QtCore.Qt.CrossPattern)" or a colour
+
+    Return
+    ------
+    brush: QBrush
+
+    """
+    match = _BRUSH.fullmatch(text)
+    if match is None:
+        return QtGui.QBrush(parse_color(text))
+    pattern = getattr(QtCore.Qt, match.group(2)) if match.group(2) else QtCore.Qt.SolidPattern
+    return QtGui.QBrush(parse_color(match.group(1)), pattern)
+
+
+class Theme():
+    """
+    theme file parsed once into Qt objects
+
+    Parameters
+    ----------
+    name: str
+        name of a json file in resources/design/themes
+
+    Attributes
+    ----------
+    qss: dict
+        values of the stylesheet template placeholders
+    background_brush: QBrush
+    arrow: dict
+        QGraphicsLink keyword arguments
+    plot_color: QColor
+
+    """
+    def __init__(self, name):
+        with open(os.path.join(DESIGN_DIR, "themes", name + ".json"), "r") as f:
+            values = json.load(f)
+        self.name = name
+        self.qss = values['qss']
+        self.background_brush = parse_brush(values['background_brush'])
+        self.arrow = dict(values['arrow'])
+        for key in ('color', 'borderColor'):
+            if key in self.arrow:
+                self.arrow[key] = parse_color(self.arrow[key])
+        self.plot_color = parse_color(values['plot_color'])
+
+
+@functools.lru_cache(maxsize=None)
+def load_theme(name):
+    return Theme(name)
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(name):
+    with open(os.path.join(DESIGN_DIR, "qss", name + ".qss"), "r") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def compile_stylesheet(style, theme=None):
+    """
+    stylesheet of a style template filled with the colours of a theme,
+    compiled once per (style, theme) pair
+
+    Parameters
+    ----------
+    style: str
+        name of a qss file in resources/design/qss
+    theme: str, optional
+        name of a theme
+
+    Return
+    ------
+    stylesheet: str
+
+    """
+    template = load_template(style)
+    return template if theme is None else template % load_theme(theme).qss
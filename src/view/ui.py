@@ -1,15 +1,11 @@
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
-from src.view import ui
+from src.view import ui, utils
+from src.view.profiler import PROFILER
 from src import DESIGN_DIR
+from src.export import COMPRESSION_SUFFIXES, FORMATS, export_extension
 import os
 import numpy as np
-
-
-def ceval(arg):
-    try:
-        return eval(arg)
-    except (NameError, TypeError):
-        return arg
+import pandas as pd
 
 
 class QGrap(QtWidgets.QWidget):
@@ -36,7 +32,11 @@ class QGrap(QtWidgets.QWidget):
 class QViewWidget(QtWidgets.QWidget):
     sizeChanged = QtCore.pyqtSignal()
     positionChanged = QtCore.pyqtSignal()
+    # emitted once the widget has moved (positionChanged is emitted before)
+    moved = QtCore.pyqtSignal()
     focused = QtCore.pyqtSignal(bool)
+    # emitted with True when the widget starts being dragged, with False when it is dropped
+    dragged = QtCore.pyqtSignal(bool)
 
     def __init__(self):
         super().__init__()
@@ -109,28 +109,67 @@ class QViewWidget(QtWidgets.QWidget):
                           QtWidgets.QGraphicsItem.ItemIsFocusable |
                           QtWidgets.QGraphicsItem.ItemSendsScenePositionChanges)
 
+        def mousePressEvent(self, event):
+            self.parent.emitSignal('dragged', True)
+            return QtWidgets.QGraphicsRectItem.mousePressEvent(self, event)
+
+        def mouseReleaseEvent(self, event):
+            self.parent.emitSignal('dragged', False)
+            return QtWidgets.QGraphicsRectItem.mouseReleaseEvent(self, event)
+
         def itemChange(self, change, value):
             if change == QtWidgets.QGraphicsItem.ItemPositionChange:
                 self.parent.deltaPosition = value - self.pos()
-                self.parent.positionChanged.emit()
+                self.parent.emitSignal('positionChanged')
+            elif change == QtWidgets.QGraphicsItem.ItemPositionHasChanged:
+                self.parent.emitSignal('moved')
             elif change == QtWidgets.QGraphicsItem.ItemVisibleChange:
-                self.parent.positionChanged.emit()
+                self.parent.emitSignal('positionChanged')
             return QtWidgets.QGraphicsRectItem.itemChange(self, change, value)
 
     def enterEvent(self, event):
-        self.focused.emit(True)
+        self.emitSignal('focused', True)
         self._item.setZValue(10)
         return QtWidgets.QWidget.enterEvent(self, event)
 
     def leaveEvent(self, event):
-        self.focused.emit(False)
+        self.emitSignal('focused', False)
         self._item.setZValue(1)
         return QtWidgets.QWidget.leaveEvent(self, event)
 
     def resizeEvent(self, event):
-        self.sizeChanged.emit()
+        self.emitSignal('sizeChanged')
         return QtWidgets.QWidget.resizeEvent(self, event)
 
+    def emitSignal(self, signal_name, *args):
+        """
+        emit one of the widget signals through the signal profiler
+
+        Parameters
+        ----------
+        signal_name: str
+            'sizeChanged', 'positionChanged', 'focused', ...
+        *args: signal arguments
+
+        """
+        PROFILER.emit(self, signal_name, *args)
+
+    def connectSignal(self, signal_name, slot):
+        """
+        connect a slot to one of the widget signals through the signal profiler
+
+        Parameters
+        ----------
+        signal_name: str
+        slot: function
+
+        Return
+        ------
+        connection: QMetaObject.Connection
+
+        """
+        return PROFILER.connect(self, signal_name, slot)
+
     def isSelected(self):
         return self.selected.isChecked()
 
@@ -146,8 +185,9 @@ class QViewWidget(QtWidgets.QWidget):
         self.layout().setStretchFactor(self.centralWidget, 1)
 
     def addToScene(self, scene):
-        self.sizeChanged.connect(lambda: self._item.setRect(QtCore.QRectF(self.geometry().adjusted(0, 0, 0, 0))))
-        self.sizeChanged.emit()
+        self.connectSignal('sizeChanged',
+                           lambda: self._item.setRect(QtCore.QRectF(self.geometry().adjusted(0, 0, 0, 0))))
+        self.emitSignal('sizeChanged')
         scene.addItem(self._item)
 
 
@@ -188,11 +228,11 @@ class QGraphicsNode(ui.QViewWidget):
 
         self.button.mouseDoubleClickEvent = lambda e: self.graph.renameNode(self)
         self.state = None
-        self.focused.connect(self.focusNode)
-        self.sizeChanged.connect(self.updateHeight)
+        self.connectSignal('focused', self.focusNode)
+        self.connectSignal('sizeChanged', self.updateHeight)
         self.selected.stateChanged.connect(self.changeChildSelection)
         self.selected.stateChanged.connect(self._item.setSelected)
-        self.positionChanged.connect(self.moveSelection)
+        self.connectSignal('positionChanged', self.moveSelection)
 
         self.childs = []
         self.parents = parents
@@ -226,6 +266,13 @@ class QGraphicsNode(ui.QViewWidget):
         """
         self.resize(self.width(), 0)
 
+    @property
+    def depth(self):
+        """
+        number of generations of ancestors
+        """
+        return max((parent.depth + 1 for parent in self.parents), default=0)
+
     @property
     def mid_pos(self):
         return self.width()/2, self.height()/2
@@ -301,8 +348,15 @@ class QGraphicsLink(QtWidgets.QGraphicsPolygonItem):
         self._parent = parent
         self._child = child
         self.setZValue(-1)
-        self.setPen(QtGui.QPen(ceval(borderColor), borderWidth))
-        self.setBrush(ceval(color))
+        self.setArrowStyle(width, arrowWidth, arrowLen, space, color, borderWidth, borderColor)
+
+    def setArrowStyle(self, width=5, arrowWidth=10, arrowLen=10, space=[0, 20],
+                      color=QtGui.QColor(0, 150, 0), borderWidth=2, borderColor=QtGui.QColor(0, 150, 0)):
+        """
+        set the arrow dimensions and colours (see class parameters)
+        """
+        self.setPen(QtGui.QPen(borderColor, borderWidth))
+        self.setBrush(color)
         self.width = width
         self.arrowWidth = arrowWidth
         self.arrowLen = arrowLen
@@ -369,31 +423,235 @@ class QGraphicsLink(QtWidgets.QGraphicsPolygonItem):
 class PandasModel(QtCore.QAbstractTableModel):
     """
     Class to populate a table view with a pandas dataframe
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+    header_index: int, default=-1
+        position of the column shown as vertical header, -1 for the index;
+        the frame is not copied (no set_index), the column is only hidden
+    parent: QObject, optional
+    summary: view.utils.ResultSummary, optional
+        preformatted first page
     """
-    def __init__(self, df, header_index=-1, parent=None):
+    def __init__(self, df, header_index=-1, parent=None, summary=None):
         QtCore.QAbstractTableModel.__init__(self, parent)
-        if header_index == -1:
-            self._data = df
-        else:
-            header_colname = df.columns[header_index]
-            self._data = df.set_index(header_colname)
+        self._data = df
+        self._summary = summary
+        self._header = header_index
+        self._positions = [i for i in range(df.shape[1]) if i != header_index]
 
     def format(self, value):
-        return '' if np.isnan(value) else str(value)
+        return '' if pd.isna(value) else str(value)
+
+    def value(self, row, column):
+        return self._data.iat[row, column]
+
+    def rowLabel(self, row):
+        return self._data.index[row]
 
     def rowCount(self, parent=None):
         return self._data.shape[0]
 
     def columnCount(self, parent=None):
-        return self._data.shape[1]
+        return len(self._positions)
 
     def data(self, index, role):
         if index.isValid():
             if role == QtCore.Qt.DisplayRole:
-                return self.format(self._data.iloc[index.row(), index.column()])
+                column = self._positions[index.column()]
+                if self._summary is not None:
+                    value = self._summary.cell(index.row(), column)
+                    if value is not None:
+                        return value
+                return self.format(self.value(index.row(), column))
 
     def headerData(self, col, orientation, role):
         if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
-            return self.format(self._data.columns[col])
+            if self._summary is not None:
+                return self._summary.headers[self._positions[col]]
+            return self.format(self._data.columns[self._positions[col]])
+        elif orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.ToolTipRole:
+            if self._summary is not None:
+                return self._summary.dtypes[self._positions[col]]
         elif orientation == QtCore.Qt.Vertical and role == QtCore.Qt.DisplayRole:
-            return self.format(self._data.index[col])
+            if self._header != -1:
+                return self.format(self.value(col, self._header))
+            if self._summary is not None and col < len(self._summary.index):
+                return self._summary.index[col]
+            return self.format(self.rowLabel(col))
+
+
+class ColumnarModel(PandasModel):
+    """
+    Class to populate a table view with a ColumnarFrame, cells are read
+    directly from the column buffers
+    """
+    def value(self, row, column):
+        return self._data.iat(row, column)
+
+    def rowLabel(self, row):
+        return self._data.index_at(row)
+
+
+class ChunkedModel(ColumnarModel):
+    """
+    Class to populate a table view with a growing ChunkedFrame, rows are
+    inserted as the chunks arrive (see fetchRows)
+    """
+    def __init__(self, data, parent=None, summary=None):
+        super().__init__(data, parent=parent, summary=summary)
+        self._rows = 0
+        self.fetchRows()
+
+    def fetchRows(self):
+        """
+        insert the rows received since the last call
+        """
+        self._positions = list(range(self._data.shape[1]))
+        rows = len(self._data)
+        if rows > self._rows:
+            self.beginInsertRows(QtCore.QModelIndex(), self._rows, rows - 1)
+            self._rows = rows
+            self.endInsertRows()
+
+    def rowCount(self, parent=None):
+        return self._rows
+
+
+class QExportDialog(QtWidgets.QDialog):
+    """
+    dialog asking where and how to export node results: a file for one node,
+    a directory for several nodes (one file per node, named after it)
+
+    Parameters
+    ----------
+    names: list of str
+        names of the exported nodes
+    parent: QWidget, optional
+
+    """
+    def __init__(self, names, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('export ' + (names[0] if len(names) == 1 else "{} results".format(len(names))))
+        self.names = names
+        self.formats = QtWidgets.QComboBox()
+        self.formats.addItems(list(FORMATS))
+        self.compressions = QtWidgets.QComboBox()
+        self.path = QtWidgets.QLineEdit(os.path.abspath(names[0] if len(names) == 1 else '.'))
+        browse = QtWidgets.QPushButton('...')
+        browse.setMaximumWidth(30)
+        browse.clicked.connect(self.browse)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        path = QtWidgets.QHBoxLayout()
+        path.addWidget(self.path)
+        path.addWidget(browse)
+        form = QtWidgets.QFormLayout()
+        form.addRow('file' if len(names) == 1 else 'directory', path)
+        form.addRow('format', self.formats)
+        form.addRow('compression', self.compressions)
+        form.addRow(buttons)
+        self.setLayout(form)
+
+        self.formats.currentTextChanged.connect(self.setFormat)
+        self.compressions.currentTextChanged.connect(self.updateExtension)
+        self.setFormat(self.formats.currentText())
+
+    def setFormat(self, format):
+        """
+        list the compressions of a format and update the file extension
+        """
+        self.compressions.blockSignals(True)
+        self.compressions.clear()
+        self.compressions.addItems([str(c or 'none') for c in FORMATS[format][1]])
+        self.compressions.blockSignals(False)
+        self.updateExtension()
+
+    def updateExtension(self):
+        """
+        replace the extension of the file by the one of the format and
+        compression ('.csv.gz'), a name without known extension is kept
+        """
+        if len(self.names) == 1:
+            path = self.path.text()
+            extensions = [ext + suffix for ext, _ in FORMATS.values() for suffix in
+                          [''] + list(COMPRESSION_SUFFIXES.values())]
+            known = next((e for e in sorted(extensions, key=len, reverse=True) if path.lower().endswith(e)), None)
+            root = path[:-len(known)] if known else path
+            self.path.setText(root + export_extension(self.format(), self.compression()))
+
+    def browse(self):
+        if len(self.names) == 1:
+            extension = export_extension(self.format(), self.compression())
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'export', self.path.text(),
+                                                            "{0} files (*{1})".format(self.format(), extension))
+        else:
+            path = QtWidgets.QFileDialog.getExistingDirectory(self, 'export', self.path.text())
+        if path:
+            self.path.setText(path)
+
+    def format(self):
+        return self.formats.currentText()
+
+    def compression(self):
+        text = self.compressions.currentText()
+        return None if text == 'none' else text
+
+    def paths(self):
+        """
+        get the file of each node {node name: path}
+        """
+        if len(self.names) == 1:
+            return {self.names[0]: self.path.text()}
+        extension = export_extension(self.format(), self.compression())
+        return {name: os.path.join(self.path.text(), name + extension) for name in self.names}
+
+
+class QMemoryPanel(QtWidgets.QWidget):
+    """
+    table showing the memory used by each node result and the total
+    """
+    def __init__(self):
+        super().__init__()
+        self.table = QtWidgets.QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(['node', 'memory', 'shared'])
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.total = QtWidgets.QLabel()
+
+        vbox = QtWidgets.QVBoxLayout()
+        vbox.addWidget(self.table)
+        vbox.addWidget(self.total)
+        self.setLayout(vbox)
+
+    def setUsage(self, usage, total):
+        """
+        Parameters
+        ----------
+        usage: dict
+            {node name: (bytes, shared bytes)}
+        total: int
+            total bytes used by results, shared buffers are counted once
+
+        """
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(usage))
+        for row, (name, (nbytes, shared)) in enumerate(usage.items()):
+            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(name))
+            for col, value in [(1, nbytes), (2, shared)]:
+                item = self.QBytesItem("{0} {1}".format(*utils.formatMemory(value)))
+                item.setData(QtCore.Qt.UserRole, value)
+                self.table.setItem(row, col, item)
+        self.table.setSortingEnabled(True)
+        self.total.setText("total: {0} {1}".format(*utils.formatMemory(total)))
+
+    class QBytesItem(QtWidgets.QTableWidgetItem):
+        """
+        table item sorted by its number of bytes instead of its text
+        """
+        def __lt__(self, other):
+            return self.data(QtCore.Qt.UserRole) < other.data(QtCore.Qt.UserRole)
@@ -1,6 +1,12 @@
 from PyQt5 import QtWidgets
 import pandas as pd
 import numpy as np
+from src.memory import MEMORY_TRACKER
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+from src.view.arrayview import ArrayPyramid
+from src.view.plot import MinMaxPyramid, isSignal, signalValues
+from src.view.stats import ColumnStatistics
 
 
 def dict_from_list(dict_to_complete, element_list):
@@ -54,10 +60,124 @@ def menu_from_dict(acts, activation_function=None, menu=None):
 
 
 def getMemoryUsage(object):
-    memory = 0
-    if isinstance(object, pd.DataFrame):
-        memory = object.memory_usage(deep=True).sum()
+    """
+    estimate the memory used by any result, see memory.estimate_memory
+
+    Return
+    ------
+    result: (int, str)
+        memory value and unit
+
+    """
+    return formatMemory(MEMORY_TRACKER.estimate(object).nbytes)
+
+
+def formatMemory(memory):
+    """
+    convert a number of bytes into a (value, unit) tuple
+
+    Parameters
+    ----------
+    memory: int
+        number of bytes
+
+    Return
+    ------
+    result: (int, str)
+
+    """
     for i in ['B', 'KB', 'MB', 'GB']:
         if memory < 1000:
             return memory, i
         memory = int(np.round(memory/1000, 0))
+    return memory, 'TB'
+
+
+class ResultSummary():
+    """
+    view data of a result, prepared outside of the GUI thread so that the
+    GUI only has to attach ready-made models
+
+    Parameters
+    ----------
+    result: any type data
+    page_size: int, default=100
+        number of rows formatted in advance
+
+    """
+    def __init__(self, result, page_size=100):
+        self.shape = None
+        self.memory = formatMemory(0)
+        self.dtypes = []
+        self.headers = []
+        self.index = []
+        self.page = np.empty((0, 0), dtype=object)
+        self.stats = ''
+        self.columnStats = None
+        self.refineStats = False
+        self.pyramid = None
+        self.decimation = None
+
+        if isinstance(result, (pd.DataFrame, ChunkedFrame, ColumnarFrame)):
+            self.shape = result.shape
+            self.memory = getMemoryUsage(result)
+            self.dtypes = [str(d) for d in result.dtypes]
+            self.headers = [str(c) for c in result.columns]
+
+            # format the first page of the table
+            head = result.head(page_size)
+            self.index = [str(i) for i in head.index]
+            self.page = np.where(head.isna().to_numpy(), '', head.astype(str).to_numpy())
+
+        if isImage(result):
+            self.shape = result.shape
+            self.memory = getMemoryUsage(result)
+            self.dtypes = [str(result.dtype)]
+            self.pyramid = ArrayPyramid(result)
+            self.pyramid.build(0)
+
+        if isSignal(result):
+            self.shape = result.shape
+            self.memory = getMemoryUsage(result)
+            self.dtypes = [str(result.dtype)]
+            self.decimation = MinMaxPyramid(signalValues(result)).prepare()
+
+        if isinstance(result, (pd.DataFrame, ChunkedFrame, ColumnarFrame)) and len(result.columns):
+            # statistics of the columns, on a sample of the rows for long tables;
+            # memory-mapped data is not read entirely, their statistics are not refined
+            self.columnStats = ColumnStatistics(result)
+            self.refineStats = not MEMORY_TRACKER.estimate(result).mapped
+            self.stats = self.columnStats.table()
+
+    def cell(self, row, column):
+        """
+        get the preformatted value of a cell, None if it is not in the first page
+        """
+        if row < self.page.shape[0] and column < self.page.shape[1]:
+            return self.page[row, column]
+
+
+def prepare_result(result):
+    """
+    compute the view data of a result, this function is thread-safe and is
+    meant to be called in the worker that computed the result
+
+    Parameters
+    ----------
+    result: any type data
+
+    Return
+    ------
+    summary: ResultSummary or None
+
+    """
+    if isinstance(result, (pd.DataFrame, ChunkedFrame, ColumnarFrame)) or isImage(result) or isSignal(result):
+        return ResultSummary(result)
+
+
+def isImage(result):
+    """
+    True if result can be shown as an image (2D array) or a volume (3D array)
+    """
+    return isinstance(result, np.ndarray) and result.ndim in (2, 3) and result.dtype.kind in 'biufc' \
+        and result.size > 0
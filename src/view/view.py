@@ -1,7 +1,7 @@
 from PyQt5 import QtWidgets, QtCore, QtGui, uic
-from src import DESIGN_DIR, DEFAULT
-from src.view import graph, utils
-import json
+from src import DESIGN_DIR, DEFAULT, RESULT_STACK
+from src.view import graph, session, themes, ui, utils
+from src.view.profiler import PROFILER
 import os
 
 
@@ -12,6 +12,10 @@ class View(QtWidgets.QMainWindow):
 
     """
     closed = QtCore.pyqtSignal()
+    memoryRequested = QtCore.pyqtSignal()
+    runRequested = QtCore.pyqtSignal(list)
+    # emitted with {node: path}, the format and the compression of the files
+    exportRequested = QtCore.pyqtSignal(dict, object, object)
 
     def __init__(self):
         super().__init__()
@@ -21,6 +25,8 @@ class View(QtWidgets.QMainWindow):
         else:
             self.resize(*DEFAULT['window_size'])
         self.modules = {}
+        self.uiFiles = {}
+        self.memoryPanel = None
         self.initStyle()
         self.initUI()
 
@@ -55,34 +61,88 @@ class View(QtWidgets.QMainWindow):
         self.loadTheme()
         self.loadStyle()
 
+        # memory usage panel and status
+        act = QtWidgets.QAction('Memory usage', self)
+        act.triggered.connect(self.openMemoryPanel)
+        self.menuEdit.addAction(act)
+        self._memoryLabel = QtWidgets.QLabel()
+        self.statusbar.addPermanentWidget(self._memoryLabel)
+
+        # undo/redo of graph edits and results
+        self.undoAction = QtWidgets.QAction('Undo', self)
+        self.undoAction.setShortcut(QtGui.QKeySequence.Undo)
+        self.undoAction.triggered.connect(lambda: self.graph.history.undo())
+        self.redoAction = QtWidgets.QAction('Redo', self)
+        self.redoAction.setShortcut(QtGui.QKeySequence.Redo)
+        self.redoAction.triggered.connect(lambda: self.graph.history.redo())
+        self.menuEdit.insertActions(self.menuEdit.actions()[0] if self.menuEdit.actions() else None,
+                                    [self.undoAction, self.redoAction])
+        self.menuEdit.aboutToShow.connect(self.updateHistoryActions)
+
+        # batch runs and their queue
+        act = QtWidgets.QAction('Run selected nodes', self)
+        act.triggered.connect(lambda: self.runRequested.emit(self.graph.getSelectedNodes()))
+        self.menuEdit.addAction(act)
+        self._queueLabel = QtWidgets.QLabel()
+        self.statusbar.addPermanentWidget(self._queueLabel)
+
+        # recording of the user actions, to be replayed headless (see session.py)
+        self.recorder = None
+        self.recordAction = QtWidgets.QAction('Record session', self)
+        self.recordAction.setCheckable(True)
+        self.recordAction.toggled.connect(self.recordSession)
+        self.menuEdit.addAction(self.recordAction)
+
+        # signal profiler report (only when the instrumentation mode is enabled)
+        if PROFILER.enabled:
+            act = QtWidgets.QAction('Signal profiler report', self)
+            act.triggered.connect(self.showProfilerReport)
+            self.menuEdit.addAction(act)
+
     def loadTheme(self, theme=DEFAULT['theme']):
-        with open(os.path.join(DESIGN_DIR, "themes", theme + ".json"), "r") as f:
-            self.theme = json.load(f)
-        if self.style is not None:
-            QtWidgets.qApp.setStyleSheet(self.style % self.theme['qss'])
+        self.theme = themes.load_theme(theme)
+        self.applyStyle()
 
     def loadStyle(self, style=DEFAULT['style']):
-        with open(os.path.join(DESIGN_DIR, "qss", style+".qss"), "r") as f:
-            self.style = f.read()
-        if self.theme is not None:
-            QtWidgets.qApp.setStyleSheet(self.style % self.theme['qss'])
-        else:
-            QtWidgets.qApp.setStyleSheet(self.style)
+        self.style = style
+        self.applyStyle()
+
+    def applyStyle(self):
+        """
+        apply the compiled stylesheet to the main window and the graph nodes,
+        instead of the whole application, so that unrelated widgets are not re-polished
+        """
+        if self.style is None:
+            return
+        sheet = themes.compile_stylesheet(self.style, None if self.theme is None else self.theme.name)
+        if sheet != self.styleSheet():
+            self.setStyleSheet(sheet)
+        if hasattr(self, 'graph'):
+            self.graph.setTheme(self.theme, sheet)
 
     def initUI(self):
         """
         This method init widgets UI for the main window
         """
         self.graph = graph.QCustomGraphicsView(self, 'horizontal')
+        self.graph.setTheme(self.theme, self.styleSheet())
         self.setCentralWidget(self.graph)
         self.setWindowState(QtCore.Qt.WindowActive)
 
+        # overview of the graph
+        act = QtWidgets.QAction('Minimap', self)
+        act.setCheckable(True)
+        act.setChecked(DEFAULT['minimap'])
+        act.toggled.connect(self.graph.minimap.setVisible)
+        self.menuPreferences.addAction(act)
+
     def initMenu(self, modules):
         """
         create right-clic menu from modules
         """
         # initalize right-clic-menu
         self.menu = {}
+        self.uiFiles = {k: values['ui'] for k, values in modules.items() if 'ui' in values}
         for k, values in modules.items():
             lst = [values['type']]
             if 'menu' in values:
@@ -104,6 +164,21 @@ class View(QtWidgets.QMainWindow):
 
         self.modules[moduleName] = module
 
+    def browseFile(self, line_edit, filter=''):
+        """
+        open a file dialog and write the selected path in a line edit
+
+        Parameters
+        ----------
+        line_edit: QLineEdit
+        filter: str, optional
+            file dialog filter, e.g. "CSV files (*.csv)"
+
+        """
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'open file', line_edit.text(), filter)
+        if path:
+            line_edit.setText(path)
+
     def addWidgetInDock(self, widget):
         """
         put widget inside a qdock widget
@@ -135,6 +210,97 @@ class View(QtWidgets.QMainWindow):
         dock.raise_()
         return dock
 
+    def openMemoryPanel(self):
+        """
+        show the memory used by each node inside a dock
+        """
+        if self.memoryPanel is None:
+            self.memoryPanel = ui.QMemoryPanel()
+            dock = self.addWidgetInDock(self.memoryPanel)
+            dock.setWindowTitle('memory usage')
+            dock.destroyed.connect(lambda: setattr(self, 'memoryPanel', None))
+        self.memoryRequested.emit()
+
+    def setMemoryUsage(self, usage, total):
+        """
+        update memory usage in the status bar and in the memory panel
+
+        Parameters
+        ----------
+        usage: dict
+            {node name: (bytes, shared bytes)}
+        total: int
+            total bytes used by results
+
+        """
+        self._memoryLabel.setText("results: {0} {1}".format(*utils.formatMemory(total)))
+        if self.memoryPanel is not None:
+            self.memoryPanel.setUsage(usage, total)
+
+    def updateHistoryActions(self):
+        """
+        show the next undo/redo edits in the Edit menu
+        """
+        history = self.graph.history
+        self.undoAction.setText("Undo " + history.undo_stack[-1].description if history.canUndo() else "Undo")
+        self.redoAction.setText("Redo " + history.redo_stack[-1].description if history.canRedo() else "Redo")
+
+    def setQueueDepth(self, queued, running):
+        """
+        show the number of queued and running model functions in the status bar
+        """
+        self._queueLabel.setText("runs: {0} running, {1} queued".format(running, queued) if queued or running else "")
+
+    def exportNodes(self, nodes):
+        """
+        ask where to export the results of nodes, then request the export
+
+        Parameters
+        ----------
+        nodes: list of QCustomGraphicsNode
+        """
+        nodes = [n for n in nodes if n.name in RESULT_STACK]
+        if not nodes:
+            self.statusbar.showMessage("no result to export", 5000)
+            return
+        dialog = ui.QExportDialog([n.name for n in nodes], self)
+        if dialog.exec_():
+            paths = dialog.paths()
+            self.exportRequested.emit({n: paths[n.name] for n in nodes}, dialog.format(), dialog.compression())
+
+    def showExportStatus(self, name, path, error=None):
+        """
+        show the end of an export in the status bar
+        """
+        if error is None:
+            self.statusbar.showMessage("{0} exported to {1}".format(name, path), 10000)
+        else:
+            self.statusbar.showMessage("export of {0} failed: {1}".format(name, error), 10000)
+
+    def recordSession(self, start):
+        """
+        start recording the user actions, or stop and save them in a session file
+        """
+        if start:
+            self.recorder = session.SessionRecorder(self)
+        elif self.recorder is not None:
+            self.recorder.stop()
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'save session', 'record.session',
+                                                            'Session files (*.session)')
+            if path:
+                self.recorder.save(path)
+            self.recorder = None
+
+    def showProfilerReport(self):
+        """
+        show the signal profiler top offenders inside a dock
+        """
+        widget = QtWidgets.QPlainTextEdit(PROFILER.report())
+        widget.setReadOnly(True)
+        widget.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        dock = self.addWidgetInDock(widget)
+        dock.setWindowTitle('signal profiler')
+
     def closeEvent(self, event):
         self.closed.emit()
         QtWidgets.QMainWindow.closeEvent(self, event)
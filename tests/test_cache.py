@@ -0,0 +1,85 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from src import RESULT_STACK
+from src.cache import ResultCache, cache_key
+from src.memory import MEMORY_TRACKER
+from src.model.model import Model
+from src.presenter.presenter import Presenter
+from src.registry import ModuleRegistry
+from src.view.view import View
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path), size_limit=20)
+    df = pd.DataFrame({'a': np.random.rand(1000), 'b': ['x'] * 1000}, index=np.arange(1000) * 2)
+    assert cache.store('frame', df)
+    assert not cache.store('error', ValueError("not cached"))
+    result = cache.load('frame')
+    assert result.equals(df)
+    # buffers are read from the file mapping
+    assert not result['a'].to_numpy().flags.writeable
+    assert MEMORY_TRACKER.estimate(result).mapped
+    assert cache.load('missing') is None
+
+    # least recently used results are evicted first
+    for name in ['first', 'second', 'third']:
+        assert cache.store(name, np.random.rand(2**20))
+        time.sleep(0.01)
+    assert cache.load('first') is None
+    assert cache.load('second') is not None and cache.load('third') is not None
+    assert not cache.store('too big', np.random.rand(3 * 2**20))
+
+    # files are identified by their content
+    path = tmp_path / "data.csv"
+    path.write_text("a\n1\n")
+    key = cache_key('csv', Model().load_csv, {'path': str(path)}, [])
+    assert key == cache_key('csv', Model().load_csv, {'path': str(path)}, [])
+    path.write_text("a\n1\n2\n")
+    os.utime(path, ns=(0, 0))
+    assert key != cache_key('csv', Model().load_csv, {'path': str(path)}, [])
+
+    # functions are identified by their constants and called names, not only their bytecode
+    first, second, third = (lambda x: x + 1), (lambda x: x + 2), (lambda x: min(x))
+    assert len({cache_key('f', f, {}, [])[:8] for f in [first, second, third, lambda x: max(x)]}) == 4
+
+
+def test_cached_results(qtbot, monkeypatch):
+    load = ModuleRegistry.load
+
+    def cached_module1(registry):
+        # module1 is random hence not cached by default
+        modules = load(registry)
+        modules['module1'] = dict(modules['module1'], cache=True)
+        return modules
+    assert ModuleRegistry().load()['module1']['cache'] is False
+    monkeypatch.setattr(ModuleRegistry, 'load', cached_module1)
+
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+    node = view.graph.addNode('module1')
+    node.parameters.sleeptime.setValue(0)
+    presenter.call_module(node)
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=3000)
+    result = RESULT_STACK.pop(node.name)
+    # the result is written by a batch run once shown
+    qtbot.waitUntil(lambda: not presenter.stores, timeout=3000)
+
+    # a new session shows the result of the same parameters without running
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+    node = view.graph.addNode('module1')
+    # the result file is read by a worker
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=3000)
+    assert RESULT_STACK.pop(node.name).equals(result)
+    node.parameters.maximum.setValue(50)
+    presenter.call_module(node)
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=3000)
+    qtbot.waitUntil(lambda: not presenter.stores, timeout=3000)
+    node.parameters.maximum.setValue(100)
+    presenter.call_module(node)
+    qtbot.waitUntil(lambda: not node._runners, timeout=3000)
+    assert RESULT_STACK[node.name].equals(result)
@@ -0,0 +1,69 @@
+# Test of the columnar result type
+import numpy as np
+import pandas as pd
+import pytest
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame, readonly_view
+from src.history import copy_on_write
+from src.memory import estimate_memory
+from src.model.loaders import read_npy
+from src import transport
+from src.view import ui, utils
+
+
+def test_columnar_views():
+    a, b = np.arange(10.0), np.arange(10)
+    frame = ColumnarFrame({'a': a, 'b': b})
+    part = frame[['b']].slice(2, 8, 2)
+    assert part.shape == (3, 1) and list(part.index) == [2, 4, 6] and part.iat(1, 0) == 4
+    assert np.shares_memory(part['b'], b)
+    with pytest.raises(ValueError):
+        part['b'][0] = 1
+    a[0] = 5  # the owner keeps writing its buffer
+    assert frame.iat(0, 0) == 5
+    # views of the same buffers are counted once
+    assert sum(estimate_memory([frame, part, a]).buffers.values()) == a.nbytes + b.nbytes + part.index.nbytes
+
+    df = pd.DataFrame({'x': np.random.rand(5), 'y': list('abcde')})
+    columnar = ColumnarFrame.from_pandas(df)
+    assert np.shares_memory(columnar['x'], df['x'].to_numpy())
+    pd.testing.assert_frame_equal(columnar.to_pandas(), df, check_dtype=False)
+    assert not readonly_view(a).flags.writeable and np.shares_memory(readonly_view(a), a)
+
+    # writes to views of pandas objects never reach the parent
+    df = pd.DataFrame({'a': a.copy()})
+    chunked = ChunkedFrame([df])
+    view, chunk = readonly_view(df), readonly_view(chunked).chunks[0]
+    view.iloc[0, 0] = chunk.iloc[1, 0] = -1
+    assert (df['a'] >= 0).all() and np.shares_memory(readonly_view(df)['a'].to_numpy(), df['a'].to_numpy()) == \
+        copy_on_write()
+
+
+def test_columnar_transport_and_view(tmpdir):
+    path = str(tmpdir.join("records.npy"))
+    np.save(path, np.array([(1, 2.0), (3, 4.0)], dtype=[('i', 'i8'), ('f', 'f8')]))
+    frame = read_npy(path)
+    assert isinstance(frame, ColumnarFrame) and list(frame.columns) == ['i', 'f']
+    assert estimate_memory(frame).mapped
+
+    descriptor, handles = transport.share(frame)
+    attached, attached_handles = transport.attach(descriptor)
+    assert attached.iat(1, 1) == 4.0
+    del attached
+    for shm in attached_handles:
+        shm.close()
+        shm.unlink()
+
+    summary = utils.prepare_result(frame)
+    model = ui.ColumnarModel(frame, header_index=0, summary=summary)
+    assert model.columnCount() == 1 and model.headerData(1, 2, 0) == '3'
+
+
+def test_columnar_from_arrow():
+    pa = pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'a': np.arange(5.0), 'b': ['x', 'y', 'z', 't', 'u']}, index=np.arange(5) * 2)
+    frame = ColumnarFrame.from_arrow(pa.Table.from_pandas(df))
+    assert list(frame.columns) == ['a', 'b']
+    assert frame.index.tolist() == [0, 2, 4, 6, 8]
+    assert not frame.column('a').flags.writeable
+    pd.testing.assert_frame_equal(frame.to_pandas(copy=False), df, check_dtype=False)
@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src import RESULT_STACK
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+from src.export import export_format, export_result
+from src.model.model import Model
+from src.presenter.presenter import Presenter
+from src.view import ui
+from src.view.view import View
+
+
+def test_export_result(tmp_path):
+    df = pd.DataFrame({'a': np.random.rand(1000), 'b': np.arange(1000),
+                       'c': pd.date_range('2020', periods=1000, freq='s')})
+    for result in [df, ChunkedFrame([df.iloc[:10], df.iloc[10:]]), ColumnarFrame.from_pandas(df)]:
+        progress = []
+        path = export_result(result, str(tmp_path / "result.csv"), chunk_rows=300, progress=progress.append)
+        pd.testing.assert_frame_equal(pd.read_csv(path, parse_dates=['c']), df, check_dtype=False)
+        assert progress == sorted(progress) and progress[-1] == 1
+
+        records = np.load(export_result(result, str(tmp_path / "result.npy"), chunk_rows=300))
+        assert records.dtype.names == ('a', 'b', 'c') and np.array_equal(records['b'], df['b'])
+
+    export_result(df, str(tmp_path / "result.csv.gz"), 'csv', 'gzip')
+    assert pd.read_csv(tmp_path / "result.csv.gz").shape == (1000, 3)
+    array = np.asfortranarray(np.random.rand(100, 7))
+    assert np.array_equal(np.load(export_result(array, str(tmp_path / "array.npy"), chunk_rows=30)), array)
+    with pytest.raises(TypeError):
+        export_result(pd.DataFrame({'text': ['x']}), str(tmp_path / "text.npy"))
+    with pytest.raises(ValueError):
+        export_result(df, str(tmp_path / "result.npy"), compression='gzip')
+
+    # a cancelled export leaves no file
+    def cancel(value):
+        raise InterruptedError("cancelled")
+    with pytest.raises(InterruptedError):
+        export_result(df, str(tmp_path / "cancelled.csv"), chunk_rows=100, progress=cancel)
+    assert not [f for f in os.listdir(tmp_path) if f.startswith('cancelled')]
+
+
+def test_export_branch(qtbot, tmp_path):
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+    graph = view.graph
+    parent = graph.addNode('module1')
+    child = graph.addNode('module2', parent)
+    RESULT_STACK[parent.name] = pd.DataFrame({'a': np.arange(10)})
+    RESULT_STACK[child.name] = np.arange(20.)
+
+    # the file extension follows the format and the compression
+    dialog = ui.QExportDialog([parent.name])
+    dialog.path.setText(str(tmp_path / "table.csv"))
+    dialog.compressions.setCurrentText('gzip')
+    assert dialog.path.text().endswith("table.csv.gz") and export_format(dialog.path.text()) == 'csv'
+    dialog.compressions.setCurrentText('xz')
+    assert dialog.path.text().endswith("table.csv.xz")
+    dialog.formats.setCurrentText('parquet')
+    assert dialog.path.text().endswith("table.parquet")
+
+    dialog = ui.QExportDialog([n.name for n in graph.branch(parent)])
+    dialog.path.setText(str(tmp_path))
+    dialog.formats.setCurrentText('npy')
+    paths = dialog.paths()
+    assert paths[child.name] == str(tmp_path / (child.name + '.npy'))
+
+    presenter.export_results({n: paths[n.name] for n in graph.branch(parent)}, dialog.format(), dialog.compression())
+    qtbot.waitUntil(lambda: not presenter.exports, timeout=5000)
+    assert np.array_equal(np.load(paths[child.name]), RESULT_STACK[child.name])
+    assert np.load(paths[parent.name])['a'].sum() == 45
+    assert 'exported' in view.statusbar.currentMessage()
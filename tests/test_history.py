@@ -0,0 +1,77 @@
+# Test of the undo/redo history
+import numpy as np
+import pandas as pd
+import pytest
+from src import RESULT_STACK, history as history_module
+from src.history import History, HistoryEntry, snapshot
+from src.view.view import View
+
+
+def test_history_budget():
+    history = History(budget=1)  # MB
+    state = []
+    arrays = [np.ones(2**17) for i in range(3)]  # 1MB each
+    views = [snapshot(array) for array in arrays]
+    for view in views:
+        state.append(view)
+        history.push(HistoryEntry("append", state.pop, lambda v=view: state.append(v), [view]))
+    # the history sees read-only views sharing the buffers, the arrays stay writable
+    arrays[0][0] = 2
+    assert np.shares_memory(views[0], arrays[0])
+    with pytest.raises(ValueError):
+        views[0][0] = 2
+    # only the last entry fits in the budget
+    assert len(history.undo_stack) == 1 and history.undo_stack[0].results[0] is views[2]
+    history.undo()
+    assert state == views[:2] and history.canRedo()
+    history.redo()
+    assert state[-1] is views[2]
+
+    # merged entries undo to the first state
+    history = History()
+    for i in range(3):
+        history.push(HistoryEntry("set", lambda i=i: state.append(('undo', i)), None, key='same'))
+    history.undo()
+    assert len(history.undo_stack) == 0 and state[-1] == ('undo', 0)
+
+
+def test_snapshot(monkeypatch):
+    df = pd.DataFrame({'a': [1, 2]})
+    monkeypatch.setattr(history_module, 'copy_on_write', lambda: True)
+    assert snapshot(df) is df
+    # pandas without copy-on-write records a copy
+    monkeypatch.setattr(history_module, 'copy_on_write', lambda: False)
+    copied = snapshot(df)
+    df.iloc[0, 0] = 3
+    assert copied is not df and copied['a'].tolist() == [1, 2]
+
+
+def test_graph_history(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    graph = view.graph
+    parent = graph.addNode('module1')
+    graph.addNode('module2', parent)
+    parent.parameters.maximum.setValue(42)
+    result = np.arange(10)
+    graph.setResult(parent.name, result)
+
+    graph.deleteBranch(parent)
+    assert not graph.nodes and parent.name not in RESULT_STACK
+    graph.history.undo()
+    restored = graph.nodes['module1']
+    assert RESULT_STACK['module1'].base is result and result.flags.writeable
+    assert restored.parameters.maximum.value() == 42
+    assert graph.nodes['module2'].parents == [restored]
+    graph.history.redo()
+    assert not graph.nodes
+
+    graph.history.undo()
+    graph.setNodeName(graph.nodes['module1'], 'renamed')
+    graph.recordMove(True)
+    graph.nodes['renamed'].moveBy(100, 0)
+    graph.recordMove(False)
+    x = graph.nodes['renamed'].pos().x()
+    graph.history.undo()
+    assert graph.nodes['renamed'].pos().x() == x - 100
+    RESULT_STACK.clear()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import RESULT_STACK
+from src.chunked import ChunkedFrame
+from src.columnar import ColumnarFrame
+from src.history import copy_on_write
+from src.model.join import JOIN_INDEXES, concat_results, join_results, stack_columns
+from src.model.model import Model
+from src.presenter.presenter import Presenter
+from src.view.view import View
+
+
+def sort_rows(df):
+    return df.sort_values(list(df.columns), ignore_index=True).astype(str)
+
+
+def test_join_results():
+    rng = np.random.default_rng(0)
+    left = pd.DataFrame({'k': rng.integers(0, 50, 1000), 'j': rng.choice(['x', 'y'], 1000), 'v': rng.random(1000)})
+    right = pd.DataFrame({'k': rng.integers(0, 60, 300), 'j': rng.choice(['x', 'y'], 300),
+                          'v': rng.integers(0, 9, 300)})
+    for how in ['inner', 'left', 'outer']:
+        for algorithm in ['auto', 'hash', 'sort']:
+            for on in [['k'], ['k', 'j']]:
+                result = pd.concat(join_results([left, right], on, how, algorithm=algorithm), ignore_index=True)
+                expected = left.merge(right, on=on, how=how, suffixes=('', '_1'))
+                pd.testing.assert_frame_equal(sort_rows(result[list(expected.columns)]), sort_rows(expected))
+
+    # three parents, chunks bounded by the memory budget
+    third = ColumnarFrame.from_pandas(pd.DataFrame({'k': np.arange(0, 60, 3), 'w': np.arange(20)}))
+    chunks = list(join_results([left, right, third], ['k'], 'outer', memory_budget=0.01))
+    assert len(chunks) > 1
+    expected = left.merge(right, on='k', how='outer', suffixes=('', '_1')).merge(third.to_pandas(), on='k', how='outer')
+    assert sum(len(c) for c in chunks) == len(expected)
+
+    # another column selection reuses the matched rows
+    JOIN_INDEXES.clear()
+    full = pd.concat(join_results([left, right], ['k']))
+    assert len(JOIN_INDEXES._entries) == 1
+    selected = pd.concat(join_results([left, right], ['k'], columns=['v_1']))
+    assert len(JOIN_INDEXES._entries) == 1
+    assert list(selected.columns) == ['k', 'v_1'] and selected['v_1'].tolist() == full['v_1'].tolist()
+    # keys concatenated for the run are not cached
+    list(join_results([ChunkedFrame([left.iloc[:500], left.iloc[500:]]), right], ['k']))
+    assert len(JOIN_INDEXES._entries) == 1
+
+    with pytest.raises(KeyError):
+        list(join_results([left, right], ['missing']))
+
+
+def test_concat_and_stack():
+    df = pd.DataFrame({'a': np.arange(10), 'b': np.random.rand(10)})
+    result = concat_results([df, ChunkedFrame([df.iloc[:4], df.iloc[4:]])])
+    assert isinstance(result, ChunkedFrame) and result.shape == (20, 2)
+    assert np.shares_memory(result.chunks[0]['b'].to_numpy(), df['b'].to_numpy()) == copy_on_write()
+    # editing the result never modifies the parents
+    result.chunks[0].iloc[0, 1] = -1
+    result.chunks[1].iloc[0, 1] = -1
+    assert (df['b'] >= 0).all()
+    assert concat_results([df, df[['a']]]).shape == (20, 2)
+
+    stacked = stack_columns([df, df[['b']].to_numpy()])
+    assert list(stacked.columns) == ['a', 'b', '0'] and np.shares_memory(stacked.column('b'), df['b'].to_numpy())
+    with pytest.raises(ValueError):
+        stack_columns([df, df.iloc[:5]])
+
+
+def test_join_node(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    Presenter(view, Model())
+    graph = view.graph
+
+    parents = [graph.addNode('module2'), graph.addNode('module2')]
+    RESULT_STACK[parents[0].name] = pd.DataFrame({'id': [1, 2, 3], 'x': [0.1, 0.2, 0.3]})
+    RESULT_STACK[parents[1].name] = pd.DataFrame({'id': [3, 1, 4], 'y': ['c', 'a', 'd']})
+    node = graph.addNode('join', parents)
+    node.setParameterValues({'on': 'id', 'how': 'left'})
+    node.parameters.apply.click()
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=3000)
+    result = RESULT_STACK[node.name].to_frame()
+    assert result['id'].tolist() == [1, 2, 3] and result['y'].tolist()[::2] == ['a', 'c']
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from src.memory import estimate_memory, MemoryTracker
+
+
+def test_estimate_memory():
+    array = np.zeros((1000, 100))
+    assert estimate_memory(array).nbytes == array.nbytes
+    # views are counted with their root buffer
+    assert estimate_memory(array[:10]).buffers == estimate_memory(array).buffers
+
+    df = pd.DataFrame({'a': np.arange(10000), 'b': np.array(['text'] * 10000, dtype=object)})
+    estimate = estimate_memory(df, sample_size=100)
+    assert estimate.nbytes > df['a'].to_numpy().nbytes + 10000 * 8
+
+    nested = {'x': [array, array[5:]], 'y': (1, 'a')}
+    assert sum(estimate_memory(nested).buffers.values()) == array.nbytes
+
+
+def test_memory_tracker():
+    tracker = MemoryTracker()
+    array = np.ones(1000)
+    results = {'parent': array, 'child': array[::2]}
+    usage, total = tracker.usage(results)
+    assert usage['parent'] == (array.nbytes, array.nbytes)
+    assert total == array.nbytes
@@ -1,8 +1,92 @@
+import os
 import pytest
 import numpy as np
+import pandas as pd
 from src.model.model import Model
+from src.model.utils import protector
+from src.model import loaders
+from src.presenter.utils import consume
+from src.chunked import ChunkedFrame
+from src.memory import estimate_memory
 
 mdl = Model()
 
 def test_function1():
     assert isinstance(mdl.function1(), int)
+
+
+def test_protector_generator():
+    @protector
+    def stream(n):
+        for i in range(n):
+            yield pd.DataFrame({'a': np.arange(3) + 3 * i})
+        raise ValueError("end of stream")
+
+    result = consume(stream(4))
+    assert isinstance(result, ValueError)
+
+    chunks = list(stream(2))[:-1]
+    frame = ChunkedFrame(chunks)
+    assert frame.shape == (6, 1)
+    assert frame.iat(4, 0) == 4
+    assert frame.head(4)['a'].tolist() == [0, 1, 2, 3]
+    assert frame.to_frame()['a'].tolist() == list(range(6))
+
+
+def test_load_csv(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    df = pd.DataFrame({'a': np.arange(1000), 'b': np.random.rand(1000), 'c': ['x'] * 1000})
+    df.to_csv(path, index=False)
+
+    progress = []
+    first = ChunkedFrame(mdl.load_csv(path, chunksize=300, progress=progress.append))
+    assert first.shape == (1000, 3)
+    assert progress[-1] == 1
+    assert os.path.isfile(os.path.join(path + loaders.SIDECAR_EXTENSION, 'meta.json'))
+
+    # second load is memory-mapped from the sidecar
+    second = ChunkedFrame(mdl.load_csv(path, columns=['b', 'c']))
+    assert len(second.chunks) == 1
+    assert estimate_memory(second.chunks[0]['b']).mapped
+    assert np.allclose(second.to_frame()['b'], first.to_frame()['b'])
+    assert second.to_frame()['c'].tolist() == ['x'] * 1000
+
+
+def test_sidecar_widened(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    a = np.arange(250).astype(object)
+    a[200] = None
+    b = np.arange(250).astype(object)
+    b[150] = 'y'
+    df = pd.DataFrame({'a': a, 'b': b, 'c': ['x'] * 250})
+    df.to_csv(path, index=False)
+
+    first = ChunkedFrame(mdl.load_csv(path, chunksize=100)).to_frame()
+    # an integer column with a missing value in a later chunk keeps a binary sidecar
+    assert os.path.isfile(os.path.join(path + loaders.SIDECAR_EXTENSION, 'meta.json'))
+    second = ChunkedFrame(mdl.load_csv(path)).to_frame()
+    assert second['a'].dtype == np.float64
+    assert estimate_memory(second['a']).mapped
+    assert second['a'].iloc[:200].tolist() == list(range(200)) and np.isnan(second['a'].iloc[200])
+    assert second['a'].iloc[201:].tolist() == list(range(201, 250))
+    # a column with text in a later chunk is pickled
+    assert second['b'].astype(str).tolist() == first['b'].astype(str).tolist()
+    assert second['c'].tolist() == ['x'] * 250
+
+
+def test_load_parquet(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    path = str(tmp_path / 'data.parquet')
+    df = pd.DataFrame({'a': np.arange(1000), 'b': np.random.rand(1000), 'c': ['x'] * 1000},
+                      index=np.arange(1000) * 2)
+    pq.write_table(pa.Table.from_pandas(df), path, row_group_size=300)
+
+    progress = []
+    frame = ChunkedFrame(mdl.load_parquet(path, progress=progress.append))
+    assert len(frame.chunks) == 4
+    assert progress[-1] == 1
+    pd.testing.assert_frame_equal(frame.to_frame(), df)
+    # primitive columns are read-only views of the arrow buffers
+    assert not frame.chunks[0]['b'].to_numpy().flags.writeable
+    assert ChunkedFrame(mdl.load_parquet(path, columns=['b'])).to_frame()['b'].tolist() == df['b'].tolist()
@@ -0,0 +1,151 @@
+# Test of presenter components
+import asyncio
+import threading
+import time
+from src.presenter.aio import AsyncioLoop
+from src.presenter.presenter import Presenter
+from src.presenter.scheduler import Scheduler, SCHEDULER
+from src.presenter.utils import Runner
+from src.model.model import Model
+from src.model.utils import protector
+from src.view.view import View
+from src import RESULT_STACK
+
+
+def test_asyncio_loop(qtbot):
+    loop = AsyncioLoop(interval=1)
+    results = []
+
+    @protector
+    async def wait(i):
+        await asyncio.sleep(0.05)
+        if i == 0:
+            raise ValueError("test error")
+        return i
+
+    async def job(i):
+        results.append(await wait(i))
+
+    n_threads = threading.active_count()
+    for i in range(200):
+        loop.submit(job(i))
+    assert threading.active_count() == n_threads
+    qtbot.waitUntil(lambda: len(results) == 200, timeout=2000)
+    assert isinstance(results[0], ValueError)
+    assert sorted(results[1:]) == list(range(1, 200))
+    loop.close()
+
+
+def test_live_mode(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+    calls = []
+
+    def function1(minimum=0, maximum=100, sleep_time=0, insert_error=False, preview=False):
+        calls.append((maximum, preview))
+        time.sleep(0.05)
+        return maximum
+    presenter.registry._functions['module1'] = function1
+
+    node = view.graph.addNode('module1')
+    node.parameters.sleeptime.setValue(0)
+    node.live.setChecked(True)
+    for i in range(20):
+        node.parameters.maximum.setValue(200 + i)
+        qtbot.wait(10)
+
+    # edits are coalesced into one preview and one full run
+    qtbot.waitUntil(lambda: (219, False) in calls and not node._runners, timeout=3000)
+    assert calls == [(219, True), (219, False)]
+    assert RESULT_STACK[node.name] == 219
+
+
+def test_scheduler_priorities():
+    class Node():
+        def __init__(self, visible, depth):
+            self.graph = self
+            self.visible, self.depth = visible, depth
+
+        def isNodeVisible(self, node):
+            return node.visible
+
+    scheduler = Scheduler(max_workers=2, interactive_share=2)
+
+    def queue(module, batch=False):
+        runner = Runner(lambda: None)
+        runner.module, runner.batch = module, batch
+        runner._order = next(scheduler._order)
+        scheduler._queue.append(runner)
+        return runner
+
+    deep, top, visible = queue(Node(False, 2)), queue(Node(False, 0)), queue(Node(True, 3))
+    batches = [queue(None, True) for i in range(2)]
+    # visible first, then upstream, a batch run every 2 interactive runs
+    assert [scheduler.next() for i in range(4)] == [visible, top, batches[0], deep]
+    # batch runs never take the last worker
+    scheduler._running = {batches[0]}
+    assert scheduler.next() is None
+    scheduler._running = set()
+    assert scheduler.next() is batches[1]
+
+
+def test_scheduler_bounded_workers(qtbot):
+    running, peak = [], []
+
+    def work(i):
+        running.append(i)
+        peak.append(len(running))
+        time.sleep(0.02)
+        running.remove(i)
+        return i
+
+    runners = [Runner(work, i) for i in range(4 * SCHEDULER.max_workers)]
+    done = []
+    for runner in runners:
+        runner.finished.connect(lambda runner=runner: done.append(threading.current_thread()))
+        runner.start()
+    qtbot.waitUntil(lambda: len(done) == len(runners), timeout=5000)
+    assert max(peak) <= SCHEDULER.max_workers
+    assert [r.out for r in runners] == list(range(len(runners)))
+    # results are delivered in the main thread
+    assert set(done) == {threading.main_thread()}
+
+
+def test_unprotected_coroutine(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+
+    async def function1(minimum=0, maximum=100, sleep_time=0, insert_error=False):
+        raise ValueError("unprotected error")
+    presenter.registry._functions['module1'] = function1
+
+    node = view.graph.addNode('module1')
+    node.parameters.apply.click()
+    qtbot.waitUntil(lambda: not node._runners, timeout=2000)
+    assert isinstance(RESULT_STACK[node.name], ValueError)
+    assert node.loading.maximum() == 1
+
+
+def test_coroutine_result_prepared_off_gui_thread(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+    threads = []
+    prepare_result = presenter.prepare_result
+
+    def prepare(output):
+        threads.append(threading.current_thread())
+        return prepare_result(output)
+    presenter.prepare_result = prepare
+
+    async def function1(minimum=0, maximum=100, sleep_time=0, insert_error=False):
+        return maximum
+    presenter.registry._functions['module1'] = function1
+
+    node = view.graph.addNode('module1')
+    node.parameters.apply.click()
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=2000)
+    assert RESULT_STACK[node.name] == 100
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,56 @@
+# Test of the module registry
+import json
+import os
+import sys
+import importlib.metadata
+from src.registry import ENTRY_POINT_GROUP, ModuleRegistry, plugin_entry_points
+from src.presenter.utils import widget_value
+from PyQt5 import QtWidgets
+
+
+def test_plugin_registry(tmpdir):
+    plugin = tmpdir.mkdir("plugins").mkdir("shapes")
+    plugin.join("plugin.json").write(json.dumps({
+        "square": {"type": "secondary", "menu": "math", "model": "functions:square",
+                   "parameters": {"x": "x"}}}))
+    plugin.join("functions.py").write("def square(x):\n    return x ** 2\n")
+    index_path = str(tmpdir.join("index.json"))
+
+    registry = ModuleRegistry([str(tmpdir.join("plugins"))], index_path, entry_points=False)
+    modules = registry.load()
+    assert not registry.cached
+    assert modules['square']['ui'] == os.path.join(str(plugin), "square.ui")
+    assert 'csv' in modules
+
+    # the index is reused and the plugin code is not imported yet
+    registry = ModuleRegistry([str(tmpdir.join("plugins"))], index_path, entry_points=False)
+    assert registry.load() == modules and registry.cached
+    assert "plugins.shapes.functions" not in sys.modules
+    assert registry.resolve('square')(3) == 9
+    assert "plugins.shapes.functions" in sys.modules
+
+    # a modified manifest invalidates the index
+    plugin.join("plugin.json").write(json.dumps({"cube": {"type": "secondary"}}))
+    registry.load()
+    assert not registry.cached and 'cube' in registry.modules and 'square' not in registry.modules
+
+
+def test_plugin_entry_points(monkeypatch):
+    entry_point = importlib.metadata.EntryPoint('shapes', 'shapes', ENTRY_POINT_GROUP)
+    # python < 3.10 gives a dict {group: entry points}
+    monkeypatch.setattr(importlib.metadata, 'entry_points', lambda: {ENTRY_POINT_GROUP: (entry_point,)})
+    assert plugin_entry_points() == [entry_point]
+    monkeypatch.setattr(importlib.metadata, 'entry_points', lambda: {})
+    assert plugin_entry_points() == []
+
+
+def test_widget_value(qtbot):
+    line = QtWidgets.QLineEdit("1, 2,3")
+    spin = QtWidgets.QSpinBox()
+    spin.setValue(4)
+    check = QtWidgets.QCheckBox()
+    check.setChecked(True)
+    assert widget_value(line) == "1, 2,3"
+    assert widget_value(line, 'int') == [1, 2, 3]
+    assert widget_value(spin) == 4
+    assert widget_value(check) is True
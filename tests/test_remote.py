@@ -0,0 +1,118 @@
+import socket
+import struct
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from src.model.model import Model
+from src.remote import HELLO, WorkerDaemon, WorkerPool, parse_address, recv_frame, send_frame
+
+
+TOKEN = "test token"
+
+
+@pytest.fixture
+def start_daemon():
+    daemons = []
+
+    def start(address="127.0.0.1:0", token=TOKEN):
+        daemon = WorkerDaemon(address, token=token, slots=2)
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        daemons.append(daemon)
+        return daemon
+    yield start
+    for daemon in daemons:
+        daemon.shutdown()
+
+
+def free_address():
+    # nothing listens on a port which has just been released
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "127.0.0.1:{}".format(sock.getsockname()[1])
+
+
+def test_remote_function(start_daemon, tmp_path):
+    daemon = start_daemon()
+    pool = WorkerPool([daemon.address], TOKEN)
+    model = Model()
+
+    function = pool.function('module1', model.function1)
+    df = function(minimum=0, maximum=1, sleep_time=0, insert_error=False)
+    assert isinstance(df, pd.DataFrame) and df.shape == (100, 100)
+    assert isinstance(function(sleep_time=0, insert_error=True), ValueError)
+
+    # streamed function with progress
+    path = tmp_path / "data.csv"
+    pd.DataFrame({'a': np.arange(1000), 'b': np.arange(1000) * 0.5}).to_csv(path, index=False)
+    progress = []
+    function = pool.function('csv', model.load_csv)
+    chunks = list(function(path=str(path), chunksize=300, progress=progress.append))
+    assert sum(len(chunk) for chunk in chunks) == 1000
+    assert chunks[-1]['b'].iloc[-1] == 499.5
+    assert progress and progress[-1] == pytest.approx(1)
+
+    # cancellation
+    function = pool.function('module1', model.function1)
+    with pytest.raises(InterruptedError):
+        function(sleep_time=5, interrupted=lambda: True)
+
+
+def test_load_balancing_and_reconnect(start_daemon, tmp_path):
+    first, second = start_daemon(), start_daemon()
+    pool = WorkerPool([first.address, second.address], TOKEN, retry_delay=60000)
+    function = pool.function('module1', Model().function1)
+    threads = [threading.Thread(target=function, kwargs={'sleep_time': 0.2}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert first.served == second.served == 2
+
+    # unreachable workers are skipped and tried last
+    dead = free_address()
+    pool = WorkerPool([dead, first.address], TOKEN)
+    function = pool.function('module1', Model().function1)
+    assert isinstance(function(sleep_time=0), pd.DataFrame)
+    assert pool.workers[0].failures == 1 and not pool.workers[0].available()
+
+    # a restarted worker is reached again
+    address = "unix:" + str(tmp_path / "worker.sock")
+    daemon = start_daemon(address)
+    pool = WorkerPool([address], TOKEN, retry_delay=60000)
+    function = pool.function('module1', Model().function1)
+    daemon.shutdown()
+    with pytest.raises(OSError):
+        function(sleep_time=0)
+    start_daemon(address)
+    assert isinstance(function(sleep_time=0), pd.DataFrame)
+    assert pool.workers[0].failures == 0
+
+    # wrong token
+    secured = start_daemon(token="secret")
+    function = WorkerPool([secured.address], TOKEN).function('module1', Model().function1)
+    with pytest.raises(PermissionError):
+        function(sleep_time=0)
+    assert secured.served == 0
+
+
+def test_authentication(start_daemon):
+    # daemons never run without a token
+    with pytest.raises(ValueError):
+        WorkerDaemon("127.0.0.1:0", token="")
+
+    # the token is never sent, the client checks the proof of the worker
+    daemon = start_daemon()
+    sock = WorkerPool([daemon.address], TOKEN).workers[0].connect()
+    sock.close()
+    with socket.create_connection(parse_address(daemon.address)[1]) as sock:
+        kind, challenge, _ = recv_frame(sock)
+        assert kind == HELLO and len(challenge) == 32
+        send_frame(sock, HELLO, raw=TOKEN.encode())
+        assert bytes(recv_frame(sock)[1]) == b'denied'
+
+    # unauthenticated peers cannot make the daemon allocate large frames
+    with socket.create_connection(parse_address(daemon.address)[1]) as sock:
+        recv_frame(sock)
+        sock.sendall(struct.pack('!BIQ', HELLO, 0, 2**40))
+        assert sock.recv(1) == b''
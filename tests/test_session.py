@@ -0,0 +1,44 @@
+# Test of the session recording and replay
+from src import RESULT_STACK
+from src.model.model import Model
+from src.presenter.presenter import Presenter
+from src.view.session import SessionRecorder, SessionReplayer, load_session
+from src.view.view import View
+
+
+def test_session_replay(qtbot, tmp_path):
+    view = View()
+    qtbot.addWidget(view)
+    Presenter(view, Model())
+    recorder = SessionRecorder(view)
+
+    graph = view.graph
+    node = graph.addNode('module1')
+    node.parameters.maximum.setValue(42)
+    node.parameters.apply.click()
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=3000)
+    node.result.maximize.click()
+    child = graph.addNode('module2', node)
+    graph.renameNode(child, 'renamed')
+    graph.deleteBranch(child)
+    view.undoAction.trigger()
+    recorder.stop()
+    recorder.save(tmp_path / "record.session")
+
+    actions = load_session(tmp_path / "record.session")
+    assert [a[1] for a in actions] == ['add', 'parameters', 'apply', 'dock', 'add', 'rename', 'delete', 'undo']
+    assert actions[1][2:] == ['module1', {'maximum': 42}]
+
+    # replay on a new window
+    RESULT_STACK.clear()
+    replay_view = View()
+    qtbot.addWidget(replay_view)
+    Presenter(replay_view, Model())
+    replayer = SessionReplayer(replay_view, speed=None, timeout=5)
+    results = replayer.replay(actions)
+    assert all(r['error'] is None and r['settled'] for r in results)
+    assert sorted(replay_view.graph.nodes) == ['module1', 'renamed']
+    assert replay_view.graph.nodes['module1'].parameterValues()['maximum'] == 42
+    assert 'module1' in RESULT_STACK
+    assert results[2]['latency'] >= results[2]['blocking']
+    assert 'apply' in replayer.report()
@@ -0,0 +1,85 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from src import RESULT_STACK
+from src.model.model import Model
+from src.presenter.presenter import Presenter
+from src.presenter.scheduler import SCHEDULER
+from src.sweep import SweepError, parse_values, sweep
+from src.view.view import View
+
+
+def test_sweep():
+    values, fixed = parse_values("a = 0:10:6\nb = 1, 'x'\n# comment\n\nc = 0.5")
+    assert values == {'a': [0, 2, 4, 6, 8, 10], 'b': [1, 'x']} and fixed == {'c': 0.5}
+
+    # points run in parallel and are gathered in a tidy table
+    threads = set()
+
+    def table(a, b, c=0):
+        threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return pd.DataFrame({'y': [a * c, a]})
+    result = sweep(table, "a = 0:99:100\nb = 1, 2\nc = 2", workers=8)
+    assert result.shape == (400, 3) and list(result.columns) == ['a', 'b', 'y']
+    assert result['a'].tolist()[:4] == [0, 0, 0, 0] and result['b'].tolist()[:4] == [1, 1, 2, 2]
+    assert result['y'].tolist()[-2:] == [198, 99]
+    assert len(threads) > 1
+
+    # the points only use the free workers of the scheduler, here taken by another sweep but one
+    SCHEDULER.max_workers, max_workers = 3, SCHEDULER.max_workers
+    threads.clear()
+    try:
+        assert SCHEDULER.reserve(8) == 3
+        SCHEDULER.unreserve(1)
+        sweep(table, "a = 0:19:20\nb = 1", workers=8)
+        SCHEDULER.unreserve(2)
+    finally:
+        SCHEDULER.max_workers = max_workers
+    assert len(threads) == 2 and SCHEDULER._reserved == 0
+
+    # vectorized functions get batches of points, arrays are stacked along the grid
+    batches = []
+
+    def vectorized(a, b, size):
+        batches.append(len(a))
+        return np.outer(a * b, np.ones(size))
+    result = sweep(vectorized, {'a': [1, 2, 3], 'b': [10, 20]}, {'size': 4}, vectorized=True, batch_size=4)
+    assert result.shape == (3, 2, 4) and result[2, 1, 0] == 60
+    assert sum(batches) == 6 and max(batches) <= 4
+
+    result = sweep(lambda a, b: a + b, {'a': [1, 2], 'b': [10, 20]}, mode='list')
+    assert result['value'].tolist() == [11, 22]
+
+    error = sweep(Model().function1, "minimum = 0, 1\nsleep_time = 0\ninsert_error = True")
+    assert isinstance(error, SweepError) and "minimum=" in str(error)
+
+    def cancel(value):
+        raise InterruptedError("cancelled")
+    started = []
+
+    def counted(a, b):
+        started.append(a)
+        return table(a, b)
+    assert isinstance(sweep(counted, "a = 0:99:100\nb = 1", workers=2, progress=cancel), InterruptedError)
+    # the points not started are dropped
+    time.sleep(0.1)
+    assert len(started) < 10
+
+
+def test_sweep_node(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    presenter = Presenter(view, Model())
+
+    node = view.graph.addNode('sweep')
+    assert node.parameters.module.findText('module1') >= 0
+    node.setParameterValues({'module': 'module1', 'values': "minimum = 0:4:5\nsleep_time = 0"})
+    # module1 is random, its sweeps are not cached either
+    assert presenter.cache_key(node, sweep, {'values': "minimum = 0, 1"}) is None
+    node.parameters.apply.click()
+    qtbot.waitUntil(lambda: node.name in RESULT_STACK and not node._runners, timeout=5000)
+    result = RESULT_STACK[node.name]
+    assert isinstance(result, pd.DataFrame) and result.shape == (500, 101)
+    assert result['minimum'].unique().tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,65 @@
+import gc
+import mmap
+import multiprocessing
+import numpy as np
+import pandas as pd
+from src import transport
+from src.columnar import ColumnarFrame
+
+
+def send_result(queue):
+    array = transport.empty((1000, 10))
+    array[:] = np.arange(10)
+    df = pd.DataFrame({'a': np.arange(5.0), 'b': ['x', 'y', 'z', 't', 'u']}, index=np.arange(5) * 2)
+    descriptor, handles = transport.share({'array': array[10:], 'frame': df})
+    queue.put(descriptor)
+    queue.get()  # keep handles until the receiver attached them
+
+
+def test_transport():
+    context = multiprocessing.get_context()
+    queue = context.Queue()
+    process = context.Process(target=send_result, args=(queue,))
+    process.start()
+    result, handles = transport.attach(queue.get())
+    queue.put('attached')
+    process.join()
+
+    array = result['array']
+    assert array.shape == (990, 10)
+    assert array[0, 3] == 3
+    assert isinstance(array.base, mmap.mmap)
+    frame = result['frame']
+    assert frame['a'].tolist() == [0, 1, 2, 3, 4]
+    assert frame['b'].tolist() == ['x', 'y', 'z', 't', 'u']
+    assert frame.index.tolist() == [0, 2, 4, 6, 8]
+    assert not frame['a'].to_numpy().flags.owndata
+
+    transport.register('node', handles)
+    transport.rename('node', 'renamed')
+    transport.release('renamed')
+    assert 'renamed' not in transport.SHARED_BUFFERS
+    assert array[-1, 9] == 9
+
+
+def test_share_views_of_block():
+    array = transport.empty((100, 2))
+    array[:] = np.arange(2)
+    descriptor, handles = transport.share(ColumnarFrame({'x': array[:, 0], 'y': array[:, 1]}))
+    # both columns are described on the block, nothing is copied
+    assert len(handles) == 1
+    columns = descriptor[1]
+    assert [columns[name][4] for name in 'xy'] == [0, 8]
+    assert not transport._OWNED
+    result, attached = transport.attach(descriptor)
+    assert result.column('y').tolist() == [1] * 100
+    for shm in attached + handles:
+        shm.close()
+    attached[0].unlink()
+
+    # a block that is never shared is freed with its last view
+    column = transport.empty((100, 2))[:, 1]
+    assert len(transport._OWNED) == 1
+    del column
+    gc.collect()
+    assert not transport._OWNED
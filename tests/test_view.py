@@ -0,0 +1,255 @@
+# Test of view components
+import pytest
+import numpy as np
+import pandas as pd
+from src.view.profiler import SignalProfiler
+from src.view import ui, utils
+from src.view.arrayview import ArrayPyramid, QArrayViewer, downsample
+from src.view.plot import MinMaxPyramid, isSignal
+from src.view.stats import ColumnStatistics
+from src.view import themes
+from src.view.view import View
+from PyQt5 import QtCore, QtGui, QtWidgets
+from src import DEFAULT
+
+
+@pytest.fixture
+def widget(qtbot):
+    widget = ui.QViewWidget()
+    widget.name = 'node'
+    return widget
+
+
+def test_signal_profiler(widget):
+    profiler = SignalProfiler(enabled=True)
+    calls = []
+
+    def reentrant():
+        calls.append(1)
+        if len(calls) < 3:
+            profiler.emit(widget, 'sizeChanged')
+
+    profiler.connect(widget, 'sizeChanged', reentrant)
+    profiler.emit(widget, 'sizeChanged')
+
+    assert profiler.emissions[('node', 'sizeChanged')] == 3
+    assert profiler.slot_calls[('node', 'sizeChanged', 'test_signal_profiler.reentrant')] == 3
+    assert sum(profiler.cascades.values()) == 2
+    assert 'node.sizeChanged > test_signal_profiler.reentrant > node.sizeChanged' in profiler.report()
+
+
+def test_prepare_result():
+    df = pd.DataFrame({'a': [1.0, np.nan, 3.0], 'b': ['x', 'y', 'z']})
+    summary = utils.prepare_result(df)
+    assert summary.shape == (3, 2)
+    assert summary.headers == ['a', 'b']
+    assert summary.cell(1, 0) == ''
+    assert summary.cell(2, 1) == 'z'
+    assert summary.cell(3, 0) is None
+    assert utils.prepare_result(3) is None
+
+
+def test_array_pyramid():
+    volume = np.arange(2 * 1000 * 600, dtype=float).reshape(2, 1000, 600)
+    pyramid = ArrayPyramid(volume, tile_size=128, max_pixels=10000)
+    assert pyramid.n_levels == 4
+    assert not pyramid.isBuilt(1)
+    pyramid.build(1)
+    assert pyramid.isBuilt(1)
+    assert np.allclose(pyramid.tile(1, 3, 0, 0), downsample(volume[1], 8)[:128, :128])
+    # levels that are not averaged are read by strided slicing
+    assert np.array_equal(pyramid.tile(0, 1, 1, 0), volume[0, 256:512:2, 0:256:2])
+    assert pyramid.toImage(pyramid.tile(1, 3, 0, 0)).size() == QtCore.QSize(75, 125)
+
+    # averaged levels keep the remainder of odd sizes
+    odd = ArrayPyramid(np.ones((1025, 1025)), tile_size=256, max_pixels=2**18)
+    odd.build()
+    assert odd._levels[(0, 2)].shape == odd.levelShape(2) == (257, 257)
+    assert odd.tile(0, 2, 1, 1).shape == (1, 1) and odd.tile(0, 2, 1, 1)[0, 0] == 1
+
+
+def test_array_viewer(qtbot):
+    volume = np.random.rand(3, 1000, 600)
+    viewer = QArrayViewer(ArrayPyramid(volume, tile_size=128, max_pixels=10000))
+    qtbot.addWidget(viewer)
+    with qtbot.waitSignal(viewer.sliceBuilt, timeout=5000):
+        viewer.slider.setValue(1)
+        # slices are averaged by batch runs of the scheduler
+        assert viewer._building[1].batch
+    assert viewer.pyramid.isBuilt(1) and not viewer._building
+
+    # the builds of a replaced array are cancelled
+    viewer.slider.setValue(2)
+    runner = viewer._building[2]
+    viewer.setPyramid(ArrayPyramid(volume[:2], tile_size=128, max_pixels=10000))
+    assert runner.isInterruptionRequested()
+
+
+def test_min_max_pyramid():
+    y = np.random.default_rng(0).normal(size=10001)
+    pyramid = MinMaxPyramid(y, base=3).prepare()
+    assert isSignal(y) and isSignal(pd.Series(y)) and not isSignal(y.reshape(1, -1))
+    for L in (0, 1, 3, 5):
+        mins, maxs = pyramid.bins(L, 0, len(y))
+        assert len(mins) == -(-len(y) // 2**L)
+        assert mins[1] == y[2**L:2**(L + 1)].min() and maxs[-1] == y[(len(mins) - 1) * 2**L:].max()
+    assert pyramid.bins(pyramid.top, 0, 1)[0][0] == y.min()
+
+
+def test_themes(qtbot):
+    assert themes.parse_color("QtGui.QColor(77, 120, 204)") == QtGui.QColor(77, 120, 204)
+    assert themes.parse_color("rgba(1, 2, 3, 4)") == QtGui.QColor(1, 2, 3, 4)
+    brush = themes.parse_brush("QtGui.QBrush(QtGui.QColor(0, 0, 0, 10), QtCore.Qt.CrossPattern)")
+    assert brush.style() == QtCore.Qt.CrossPattern and brush.color().alpha() == 10
+    assert themes.compile_stylesheet('StyleTemplate', 'dark') is themes.compile_stylesheet('StyleTemplate', 'dark')
+
+    # the stylesheet is applied to nodes when they are visible
+    view = View()
+    qtbot.addWidget(view)
+    view.show()
+    near, far = view.graph.addNode('module1'), view.graph.addNode('module1')
+    far.moveBy(100000, 100000)
+    view.loadTheme('bright')
+    sheet = themes.compile_stylesheet(view.style, 'bright')
+    assert near.styleSheet() == sheet and far.styleSheet() != sheet
+    view.graph.centerOn(far._item)
+    assert far.styleSheet() == sheet
+
+
+def test_result_widget_recycling(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    node = view.graph.addNode('module1')
+    receivers = node.receivers(node.sizeChanged)
+
+    node.updateResult(pd.DataFrame({'a': [1, 2], 'b': [3, 4]}))
+    table = node.result
+    for i in range(200):
+        node.updateResult(pd.DataFrame({'a': np.arange(i + 1)}))
+    # the widget and its proxy model are reused, the source model is replaced
+    assert node.result is table and table.table.model() is table.proxy
+    assert table.sourceModel.rowCount() == 200 and table.Vheader.count() == 2
+
+    # widgets opened in docks leave the footer of the node unchanged
+    footer = node.leftfoot.text()
+    node.computePlotWidget(np.arange(10.), footer=False)
+    assert node.leftfoot.text() == footer
+
+    for i in range(200):
+        node.updateResult(i)
+        node.resize(node.width() + 1, node.height())
+    assert node.result.text() == '199'
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    n_widgets = len(node.findChildren(QtCore.QObject))
+    for i in range(50):
+        node.updateResult(np.random.rand(1000))
+        node.updateResult(np.random.rand(64, 64))
+    node.updateResult(ValueError())
+    node.updateResult(3)
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    # no connection nor widget left behind
+    assert node.receivers(node.sizeChanged) == receivers
+    assert len(node.findChildren(QtCore.QObject)) == n_widgets
+
+
+def test_offscreen_nodes(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    view.show()
+    graph = view.graph
+    anchor = graph.addNode('module1')
+    node = graph.addNode('module1')
+    node.updateResult(pd.DataFrame({'a': [1, 2]}))
+    table = node.result
+    assert node.inViewport
+
+    # off-screen nodes are paused and do not build their results
+    node.moveBy(100000, 100000)
+    qtbot.wait(10)
+    assert not node.inViewport and not node.updatesEnabled() and anchor.inViewport
+    node.updateResult(pd.DataFrame({'a': np.arange(10)}))
+    assert node.result.sourceModel.rowCount() == 2
+    node.releaseResult()
+    assert table.sourceModel is None and table.released
+
+    # results are shown when the node is scrolled into view
+    qtbot.wait(10)  # scene rect update
+    graph.centerOn(node._proxy)
+    assert node.inViewport and node.updatesEnabled()
+    assert node.result is table and table.sourceModel.rowCount() == 10
+
+    # released models are rebuilt
+    graph.centerOn(anchor._proxy)
+    assert not node.inViewport
+    node.releaseResult()
+    qtbot.wait(10)
+    graph.centerOn(node._proxy)
+    assert not table.released and table.sourceModel.rowCount() == 10
+
+
+def test_minimap_and_zoom(qtbot):
+    view = View()
+    qtbot.addWidget(view)
+    view.show()
+    graph = view.graph
+    first = graph.addNode('module1')
+    second = graph.addNode('module1', first)
+    minimap = graph.minimap
+    minimap.repaint()
+    assert set(minimap.thumbnails) == {first, second} and not minimap._dirty
+
+    # thumbnails are captured again only when their node changes
+    thumbnail = minimap.thumbnails[first]
+    second.updateResult(pd.DataFrame({'a': [1, 2]}))
+    assert minimap._dirty == {second}
+    minimap.repaint()
+    assert minimap.thumbnails[first] is thumbnail
+    graph.deleteBranch(second)
+    minimap.repaint()
+    assert set(minimap.thumbnails) == {first}
+
+    # widgets are drawn from a cache while zooming
+    graph.zoom(0.5)
+    assert first._proxy.cacheMode() == QtWidgets.QGraphicsItem.ItemCoordinateCache
+    qtbot.waitUntil(lambda: graph._zoomAnimation.state() == QtCore.QAbstractAnimation.Stopped, timeout=1000)
+    assert graph.transform().m11() == pytest.approx(0.5)
+    assert first._proxy.cacheMode() == QtWidgets.QGraphicsItem.NoCache
+    graph.zoom(1e-3)
+    assert graph._zoom == DEFAULT['zoom_range'][0]
+
+
+def test_column_statistics(qtbot):
+    n = 300000
+    df = pd.DataFrame({'a': np.arange(n, dtype=float), 'b': np.arange(n) % 10,
+                       'c': np.where(np.arange(n) % 4 == 0, None, 'x'),
+                       'd': pd.date_range('2020', periods=n, freq='s')})
+    df.loc[::2, 'a'] = np.nan
+    exact = ColumnStatistics(df, sample_size=None, bins=10)
+    a, b, c, d = exact.columns
+    assert (a['count'], a['nulls'], a['min'], a['max']) == (n // 2, n // 2, 1, n - 1)
+    assert a['quantiles'][0.5] == pytest.approx(n / 2) and a['histogram'].sum() == n // 2
+    assert b['distinct'] == 10 and c['distinct'] == 1 and c['nulls'] == n // 4 and c['histogram'] is None
+    assert a['distinct'] == pytest.approx(n // 2, rel=0.1) and d['min'] == df['d'].iloc[0]
+
+    # long tables are sampled, counts are scaled
+    sampled = ColumnStatistics(df, sample_size=10000, bins=10)
+    assert sampled.sampled and 'sample' in sampled.text(0)
+    assert sampled.columns[0]['nulls'] == pytest.approx(n // 2, rel=0.05)
+    assert sampled.columns[1]['distinct'] == 10
+    assert sampled.columns[0]['distinct'] == pytest.approx(n // 2, rel=0.2)
+
+    # the header bar shows the sampled statistics then the exact ones
+    view = View()
+    qtbot.addWidget(view)
+    node = view.graph.addNode('module1')
+    summary = utils.prepare_result(df)
+    summary.columnStats = sampled
+    node.updateResult(df, summary)
+    bar = node.result.statsBar
+    assert bar.stats is sampled and bar.positions == [0, 1, 2, 3]
+    # refined by a batch run of the scheduler
+    assert bar._refinement.batch and bar._refinement.module is None
+    qtbot.waitUntil(lambda: not bar.stats.sampled, timeout=10000)
+    assert node.result.summary.columnStats is bar.stats
+    node.result.Vheader.setCurrentIndex(2)
+    assert bar.positions == [0, 2, 3]